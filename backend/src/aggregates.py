@@ -0,0 +1,146 @@
+# aggregates.py
+import argparse
+import calendar
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+from artist_dictionary import DICTIONARY_NAME, ArtistDictionary
+from dates import run_clock
+from postprocess import DATA_DIR, dump_json, write_atomic
+from venues import VENUE_CONFIGS
+
+AGGREGATES_DIR = 'aggregates'
+MANIFEST_NAME = 'manifest.json'
+AGGREGATES_VERSION = 1
+# 同じ公演とみなすイベント（出演者ごとの行）の列
+SHOW_FIELDS = ['date', 'venue', 'title']
+
+# 集計の名前とファイル名（manifest.json の files のキー）
+AGGREGATE_FILES = {
+    'by_date': 'counts_by_date.json',
+    'by_venue': 'counts_by_venue.json',
+    'by_area': 'counts_by_area.json',
+    'artists': 'artist_next_show.json',
+    'months': 'month_density.json',
+}
+
+
+def _counts(events, shows, key):
+    """キーごとのイベント数（出演者単位）と公演数"""
+    event_counts = events.groupby(key, observed=True, sort=True).size()
+    show_counts = shows.groupby(key, observed=True).size()
+    return {str(value): {'events': int(count), 'shows': int(show_counts.get(value, 0))}
+            for value, count in event_counts.items()}
+
+
+def _next_shows(df, artists, today):
+    """今日以降に公演のあるアーティストごとの次の公演（公演の無いアーティストは含めない）"""
+    # df は日付順のため、アーティストごとの最初の行が次の公演になる
+    upcoming = df[df['date'] >= today].drop_duplicates('artist_id')
+    entries = [{'id': artist_id, 'name': artists.name(artist_id), 'next_date': date, 'next_venue': venue}
+               for artist_id, date, venue in zip(upcoming['artist_id'].tolist(), upcoming['date'].tolist(),
+                                                 upcoming['venue'].astype(object).tolist())]
+    return sorted(entries, key=lambda entry: entry['name'])
+
+
+def _month_density(events, shows):
+    """月ごとのイベント数・公演数・公演のある日数と、1日あたりの公演数・最も公演の多い日"""
+    months = {}
+    per_date = shows.groupby('date').size()
+    event_counts = events.groupby(events['date'].str[:7]).size()
+    for month, counts in per_date.groupby(per_date.index.str[:7]):
+        year, month_number = map(int, month.split('/'))
+        days = calendar.monthrange(year, month_number)[1]
+        months[month] = {
+            'events': int(event_counts.get(month, 0)),
+            'shows': int(counts.sum()),
+            'active_days': len(counts),
+            'shows_per_day': round(int(counts.sum()) / days, 2),
+            'peak_date': counts.idxmax(),
+            'peak_shows': int(counts.max()),
+        }
+    return months
+
+
+def build_aggregates(df, artists, today=None):
+    """保存するイベント（artist_id の列を含むDataFrame）から集計を作成し、({名前: 内容}, 基準日) を返す
+
+    today は次の公演を判定する基準日（'YYYY/MM/DD'、省略時は実行の基準日）。
+    """
+    today = today or run_clock.reference.strftime('%Y/%m/%d')
+    areas = {config['name']: config['area'] for config in VENUE_CONFIGS.values()}
+
+    events = df[['date', 'venue', 'title']].copy()
+    events['venue'] = events['venue'].astype(object)
+    events['area'] = events['venue'].map(areas)
+    shows = events.drop_duplicates(SHOW_FIELDS)
+    return {
+        'by_date': _counts(events, shows, 'date'),
+        'by_venue': _counts(events, shows, 'venue'),
+        # 設定に無い会場（エリアが分からない会場）はエリアの集計に含めない
+        'by_area': _counts(events.dropna(subset=['area']), shows.dropna(subset=['area']), 'area'),
+        'artists': _next_shows(df, artists, today),
+        'months': _month_density(events, shows),
+    }, today
+
+
+def write_aggregates(df, artists, data_dir=DATA_DIR, today=None):
+    """保存時に呼ばれ、集計のファイルと manifest.json を aggregates/ に書き出す
+
+    集計のファイルを全て書いてから manifest.json を置き換えるため、manifest.json に
+    載っているファイルは常にその時点の内容になっている。
+    """
+    aggregates, today = build_aggregates(df, artists, today)
+    out_dir = os.path.join(data_dir, AGGREGATES_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = {}
+    for name, payload in aggregates.items():
+        body = dump_json(payload, compact=True)
+        write_atomic(os.path.join(out_dir, AGGREGATE_FILES[name]), body)
+        files[name] = {'path': AGGREGATE_FILES[name], 'entries': len(payload), 'bytes': len(body)}
+
+    manifest = {
+        'version': AGGREGATES_VERSION,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'reference_date': today,
+        'events': len(df),
+        'shows': sum(counts['shows'] for counts in aggregates['by_date'].values()),
+        'files': files,
+    }
+    write_atomic(os.path.join(out_dir, MANIFEST_NAME), dump_json(manifest))
+    return manifest
+
+
+def load_aggregate(name, data_dir=DATA_DIR):
+    """manifest.json に載っている集計を読み込む"""
+    out_dir = os.path.join(data_dir, AGGREGATES_DIR)
+    with open(os.path.join(out_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != AGGREGATES_VERSION:
+        raise ValueError(f"Unsupported aggregates version: {manifest.get('version')}")
+    with open(os.path.join(out_dir, manifest['files'][name]['path']), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保存したイベントから集計を作り直す')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='events.json と artists.json のあるディレクトリ')
+    parser.add_argument('--today', help='次の公演を判定する基準日 (YYYY/MM/DD)')
+    args = parser.parse_args()
+
+    from postprocess import events_frame
+    with open(os.path.join(args.data_dir, 'events.json'), encoding='utf-8') as f:
+        records = json.load(f)
+    artists = ArtistDictionary.load(os.path.join(args.data_dir, DICTIONARY_NAME))
+    df = events_frame(records)
+    df['artist_id'] = [record.get('artist_id') or artists.resolve(record['artist']) for record in records]
+    manifest = write_aggregates(df, artists, args.data_dir, args.today)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# archive.py
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(__file__))
+from dates import run_clock
+from postprocess import DATA_DIR, dump_json, write_atomic, write_compressed
+from utils import normalize_artist
+
+HOT_NAME = 'events_hot.json'
+ARCHIVE_DIR = 'archive'
+ARCHIVE_INDEX = 'index.json'
+ARCHIVE_VERSION = 1
+HOT_PAST_DAYS = 7  # 基準日より前の何日分の公演を hot のファイルに残すか
+
+
+def _key(record):
+    """重複判定のキー（normalize_events と同じ (日付, 正規化したアーティスト名, 会場)）"""
+    return record['date'], normalize_artist(record['artist']), record['venue']
+
+
+def _merge(*groups):
+    """イベントをまとめて重複を除き、日付・会場の順に並べる（同じキーは後のものを残す）"""
+    merged = {}
+    for records in groups:
+        for record in records:
+            merged[_key(record)] = record
+    return sorted(merged.values(), key=lambda record: (record['date'], record['venue']))
+
+
+def _month_path(archive_dir, month):
+    return os.path.join(archive_dir, month.replace('/', '-') + '.json.gz')
+
+
+def _read_month(path):
+    try:
+        with gzip.open(path, 'rb') as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return []
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_archive(records, data_dir=DATA_DIR, today=None):
+    """保存時に呼ばれ、直近のイベントを hot のファイルに、それより前を月別のアーカイブに書き出す
+
+    hot のファイル（events_hot.json と圧縮済みのコピー）には基準日の HOT_PAST_DAYS 日前
+    以降のイベントを、それより前のイベントは月ごとの archive/YYYY-MM.json.gz に追加する。
+    サイトから消えた過去の公演も失わないように、前回の hot のファイルにあって今回の
+    取得に無い過去のイベントは引き継ぐ。archive/index.json は最後に置き換える。
+    """
+    today = today or run_clock.reference.date()
+    today_text = today.strftime('%Y/%m/%d')
+    hot_from = (today - timedelta(days=HOT_PAST_DAYS)).strftime('%Y/%m/%d')
+    hot_path = os.path.join(data_dir, HOT_NAME)
+    archive_dir = os.path.join(data_dir, ARCHIVE_DIR)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # 今後の公演は今回の取得結果を正とし（中止された公演は消える）、終わった公演は前回の結果も残す
+    current_keys = {_key(record) for record in records}
+    carried = [record for record in _read_json(hot_path, [])
+               if record['date'] < today_text and _key(record) not in current_keys]
+    events = _merge(carried, records)
+    hot = [record for record in events if record['date'] >= hot_from]
+
+    cold_by_month = {}
+    for record in events:
+        if record['date'] < hot_from:
+            cold_by_month.setdefault(record['date'][:7], []).append(record)
+
+    index_path = os.path.join(archive_dir, ARCHIVE_INDEX)
+    index = _read_json(index_path, {'version': ARCHIVE_VERSION, 'months': {}})
+    if index.get('version') != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported archive version: {index.get('version')}")
+    for month, cold in sorted(cold_by_month.items()):
+        path = _month_path(archive_dir, month)
+        merged = _merge(_read_month(path), cold)
+        body = gzip.compress(dump_json(merged, compact=True), compresslevel=9, mtime=0)
+        write_atomic(path, body)
+        index['months'][month] = {'path': os.path.basename(path), 'events': len(merged), 'bytes': len(body)}
+
+    body = dump_json(hot, compact=True)
+    write_atomic(hot_path, body)
+    write_compressed(hot_path, body)
+
+    index['hot_from'] = hot_from
+    index['hot'] = {'path': HOT_NAME, 'events': len(hot), 'bytes': len(body)}
+    index['months'] = dict(sorted(index['months'].items()))
+    write_atomic(index_path, dump_json(index))
+    return index
+
+
+class EventArchive:
+    """hot のファイルと月別のアーカイブをまたいでイベントを検索する
+
+    hot_from 以降は hot のファイル、それより前は期間に掛かる月のアーカイブだけを読む
+    （読み込んだ月はキャッシュする）。結果は日付順のイベントの辞書。
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        index = _read_json(os.path.join(data_dir, ARCHIVE_DIR, ARCHIVE_INDEX), None)
+        if index is None:
+            raise FileNotFoundError(f"No archive in {data_dir}")
+        if index.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {index.get('version')}")
+        self.hot_from = index['hot_from']
+        self._months = index['months']
+        self._loaded = {}
+
+    def months(self):
+        return list(self._months)
+
+    def _hot(self):
+        if None not in self._loaded:
+            self._loaded[None] = _read_json(os.path.join(self.data_dir, HOT_NAME), [])
+        return self._loaded[None]
+
+    def _month(self, month):
+        if month not in self._loaded:
+            path = os.path.join(self.data_dir, ARCHIVE_DIR, self._months[month]['path'])
+            self._loaded[month] = _read_month(path)
+        return self._loaded[month]
+
+    def _select(self, start, end, predicate=None):
+        parts = [self._month(month) for month in self._months
+                 if (start is None or month >= start[:7]) and (end is None or month <= end[:7])]
+        if end is None or end >= self.hot_from:
+            parts.append(self._hot())
+        return [record for records in parts for record in records
+                if (start is None or record['date'] >= start) and (end is None or record['date'] <= end)
+                and (predicate is None or predicate(record))]
+
+    def between(self, start=None, end=None):
+        """期間 [start, end] のイベント（'YYYY/MM/DD'、省略時は制限なし）"""
+        return self._select(start, end)
+
+    def by_artist(self, artist, start=None, end=None):
+        key = normalize_artist(artist)
+        return self._select(start, end, lambda record: normalize_artist(record['artist']) == key)
+
+    def by_venue(self, venue, start=None, end=None):
+        return self._select(start, end, lambda record: record['venue'] == venue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hot のファイルとアーカイブをまたいでイベントを検索する')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='events_hot.json と archive/ のあるディレクトリ')
+    parser.add_argument('--artist', help='アーティストのイベント')
+    parser.add_argument('--venue', help='会場のイベント')
+    parser.add_argument('--from', dest='start', help='開始日 (YYYY/MM/DD)')
+    parser.add_argument('--to', dest='end', help='終了日 (YYYY/MM/DD)')
+    args = parser.parse_args()
+
+    archive = EventArchive(args.data_dir)
+    if args.artist:
+        results = archive.by_artist(args.artist, args.start, args.end)
+    elif args.venue:
+        results = archive.by_venue(args.venue, args.start, args.end)
+    else:
+        results = archive.between(args.start, args.end)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# artist_dictionary.py
+import json
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from postprocess import DATA_DIR, write_atomic
+from utils import normalize_artist
+
+DICTIONARY_NAME = 'artists.json'
+DICTIONARY_VERSION = 1
+
+
+class ArtistDictionary:
+    """アーティストの辞書（整数ID・正式な表記・別表記）
+
+    normalize_artist で同じキーになる表記は同じアーティストとみなし、最初に見つかった
+    表記を正式な表記、それ以外を別表記として記録する。IDは一度割り当てたら変えず、
+    出演が無くなったアーティストも辞書に残すため、実行をまたいで同じIDを使える。
+    """
+
+    def __init__(self, entries=(), next_id=1):
+        self._names = {}
+        self._aliases = {}
+        self._ids = {}
+        self.next_id = next_id
+        self.added = 0
+        for entry in entries:
+            self._add_entry(entry['id'], entry['name'], entry.get('aliases', []))
+
+    def _add_entry(self, artist_id, name, aliases):
+        self._names[artist_id] = name
+        self._aliases[artist_id] = list(aliases)
+        for spelling in [name, *aliases]:
+            self._ids.setdefault(normalize_artist(spelling), artist_id)
+        self.next_id = max(self.next_id, artist_id + 1)
+
+    @classmethod
+    def load(cls, path=None):
+        """保存した辞書を読み込む（無い場合は空の辞書）"""
+        path = path or os.path.join(DATA_DIR, DICTIONARY_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        if payload.get('version') != DICTIONARY_VERSION:
+            raise ValueError(f"Unsupported artist dictionary version: {payload.get('version')}")
+        return cls(payload['artists'], payload.get('next_id', 1))
+
+    def save(self, path):
+        artists = [{'id': artist_id, 'name': self._names[artist_id], 'aliases': self._aliases[artist_id]}
+                   for artist_id in sorted(self._names)]
+        payload = {'version': DICTIONARY_VERSION, 'next_id': self.next_id, 'artists': artists}
+        write_atomic(path, json.dumps(payload, ensure_ascii=False, indent=1).encode('utf-8'))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, artist_id):
+        return artist_id in self._names
+
+    def ids(self):
+        return sorted(self._names)
+
+    def resolve(self, name):
+        """表記のIDを返す（未登録のアーティストには新しいIDを割り当て、新しい表記は別表記に追加）"""
+        key = normalize_artist(name)
+        artist_id = self._ids.get(key)
+        if artist_id is None:
+            artist_id = self.next_id
+            self._add_entry(artist_id, name, [])
+            self.added += 1
+        elif name != self._names[artist_id] and name not in self._aliases[artist_id]:
+            self._aliases[artist_id].append(name)
+        return artist_id
+
+    def id_of(self, name):
+        """表記のID（未登録の場合はNone）"""
+        return self._ids.get(normalize_artist(name))
+
+    def name(self, artist_id):
+        """正式な表記"""
+        return self._names[artist_id]
+
+    def aliases(self, artist_id):
+        return list(self._aliases[artist_id])
+
+
+def assign_ids(artists, data_dir=DATA_DIR):
+    """保存時に呼ばれ、アーティスト名の列に対応するIDの列を返す（辞書は更新して保存する）"""
+    path = os.path.join(data_dir, DICTIONARY_NAME)
+    dictionary = ArtistDictionary.load(path)
+    ids = {name: dictionary.resolve(name) for name in artists.unique()}
+    dictionary.save(path)
+    logging.getLogger(__name__).info(
+        "Artist dictionary: %s artists (%s new)", len(dictionary), dictionary.added)
+    return artists.map(ids).astype('uint32'), dictionary
@@ -0,0 +1,229 @@
+# artist_search.py
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from bisect import bisect_left
+from itertools import groupby
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+from artist_dictionary import DICTIONARY_NAME, ArtistDictionary
+from postprocess import DATA_DIR, write_atomic
+from utils import normalize_artist
+
+INDEX_NAME = 'artist_index.json'
+INDEX_VERSION = 2
+DEFAULT_THRESHOLD = 0.3  # 類似度（共通するトライグラムのJaccard係数）の下限
+PREFIX_SCAN = 200  # 前方一致の候補として調べる件数の上限
+CANDIDATE_FACTOR = 5  # limit の何倍の候補まで類似度を求めるか
+MAX_COUNTED_POSTINGS = 20000  # 1回の検索で数える転置リストの要素数の上限（出現数の少ないリストから数える）
+MIN_FUZZY_LENGTH = 3  # これより短い入力は前方一致のみで探す
+
+# カタカナをひらがなに揃える（NFKC では半角カナが全角になるだけなので別に変換する）
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def search_key(name):
+    """検索用のキー（normalize_artist に加えてカタカナとひらがなの違いも無視する）"""
+    return normalize_artist(name).translate(_KATAKANA_TO_HIRAGANA)
+
+
+def trigrams(key):
+    """前に2文字・後ろに1文字の空白を補ったキーの文字トライグラムの集合"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """2つの文字列のレーベンシュタイン距離
+
+    動的計画法の表の列を a の文字ごとのビットで表し、b の1文字ごとに整数の演算で
+    1列ずつ進める（Myers / Hyyrö のビット並列アルゴリズム）。
+    """
+    if not a:
+        return len(b)
+    masks = {}
+    for i, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | 1 << i
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    vp, vn, distance = full, 0, len(a)
+    for char in b:
+        eq = masks.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | (~(xh | vp) & full)
+        hn = vp & xh
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = (hp << 1 | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(xv | hp) & full)
+        vn = hp & xv
+    return distance
+
+
+class ArtistSearchIndex:
+    """アーティスト名のあいまい検索（トライグラムからアーティストIDへの転置索引）
+
+    入力と共通するトライグラムのうち出現数の少ないものの転置リストから候補を数え、
+    上位の候補だけ類似度（Jaccard係数）をトライグラムの集合から正確に求める。転置リストは
+    最初に使うときに numpy の配列にし、候補はまとめてソートして数える。キーの前方一致は
+    ソート済みのキーの二分探索で別に拾う（入力途中の補完用）。類似度が同じ候補は、キーが
+    入力と一致するもの、編集距離の小さいものの順に並べる（'kakaka' と 'kaka' はトライグラムの
+    集合が同じ）。アーティスト名は辞書の正式な表記を使う（別表記は normalize_artist で
+    同じキーになるため検索結果は同じ）。
+    """
+
+    def __init__(self, artist_ids, postings, artists):
+        self.artists = artists
+        self._postings = postings
+        self._keys = {artist_id: search_key(artists.name(artist_id)) for artist_id in artist_ids}
+        self._grams = {}
+        self._arrays = {}
+        self._sorted = sorted(self._keys, key=self._keys.__getitem__)
+        self._sorted_keys = [self._keys[artist_id] for artist_id in self._sorted]
+
+    @classmethod
+    def build(cls, artist_ids, artists):
+        """アーティストIDの一覧と辞書から作成"""
+        artist_ids = sorted(set(artist_ids))
+        postings = {}
+        for artist_id in artist_ids:
+            for gram in trigrams(search_key(artists.name(artist_id))):
+                postings.setdefault(gram, []).append(artist_id)
+        return cls(artist_ids, postings, artists)
+
+    @classmethod
+    def load(cls, path=None, artists=None):
+        """保存した索引を読み込む（artists を省略した場合は同じディレクトリの artists.json を使う）"""
+        path = path or os.path.join(DATA_DIR, INDEX_NAME)
+        artists = artists or ArtistDictionary.load(os.path.join(os.path.dirname(path), DICTIONARY_NAME))
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported artist index version: {payload.get('version')}")
+        return cls(payload['artist_ids'], payload['postings'], artists)
+
+    def save(self, path):
+        payload = {'version': INDEX_VERSION, 'artist_ids': sorted(self._keys), 'postings': self._postings}
+        write_atomic(path, json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _grams_of(self, artist_id):
+        grams = self._grams.get(artist_id)
+        if grams is None:
+            grams = self._grams[artist_id] = trigrams(self._keys[artist_id])
+        return grams
+
+    def _postings_array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            array = self._arrays[gram] = np.array(self._postings.get(gram, ()), dtype=np.int64)
+        return array
+
+    def _candidates(self, probes, count):
+        """転置リストに多く含まれるアーティストIDを最大 count 件（含む数が同じものはIDの小さい順）"""
+        arrays = []
+        counted = 0
+        for gram in probes:
+            array = self._postings_array(gram)
+            # 上限を超える分は数えない（頻出するトライグラムだけを含む候補は類似度が低い）
+            if arrays and counted + len(array) > MAX_COUNTED_POSTINGS:
+                break
+            if len(array):
+                arrays.append(array)
+                counted += len(array)
+        if not arrays:
+            return []
+        artist_ids, counts = np.unique(np.concatenate(arrays), return_counts=True)
+        if len(artist_ids) > count:
+            # 含む数の多い順に count 件目の含む数を求め、それより多いものと同数のものの先頭を残す
+            # （含む数は小さな整数で同数が多く、argpartition より速い）
+            histogram = np.bincount(counts)
+            cutoff = len(histogram) - 1 - np.searchsorted(np.cumsum(histogram[::-1]), count)
+            above = np.flatnonzero(counts > cutoff)
+            ties = np.flatnonzero(counts == cutoff)[:count - len(above)]
+            artist_ids = artist_ids[np.concatenate((above, ties))]
+        return artist_ids.tolist()
+
+    def _rank(self, key, scores, limit):
+        """類似度の高い順に並べ、同じ類似度の候補はキーの一致・編集距離・キーの順にする"""
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._keys[item[0]]))
+        results = []
+        for _, group in groupby(ranked, key=lambda item: item[1]):
+            group = list(group)
+            if len(group) > 1:
+                group.sort(key=lambda item: (self._keys[item[0]] != key,
+                                             edit_distance(key, self._keys[item[0]]), self._keys[item[0]]))
+            results.extend(group)
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def search(self, query, limit=10, threshold=DEFAULT_THRESHOLD):
+        """類似度の高い順に [(アーティストID, アーティスト名, 類似度), ...] を返す"""
+        key = search_key(query)
+        if not key:
+            return []
+        scores = {}
+
+        if len(key) >= MIN_FUZZY_LENGTH:
+            # 類似度が threshold 以上の名前は、入力のトライグラムのうち少なくとも min_overlap 個を含む。
+            # そのため出現数の少ない順に len(grams) - min_overlap + 1 個のどれかを必ず含み、
+            # 頻出するトライグラムの長い転置リストは数えなくてよい（prefix filtering）
+            grams = trigrams(key)
+            min_overlap = max(1, math.ceil(threshold * len(grams)))
+            probes = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+            # 含むトライグラムが多い候補について、類似度をトライグラムの集合で正確に求める
+            for artist_id in self._candidates(probes[:len(grams) - min_overlap + 1], limit * CANDIDATE_FACTOR):
+                other = self._grams_of(artist_id)
+                overlap = len(grams & other)
+                score = overlap / (len(grams) + len(other) - overlap)
+                if score >= threshold:
+                    scores[artist_id] = score
+
+        # 前方一致（入力途中の名前）は類似度が低くても候補にする
+        start = bisect_left(self._sorted_keys, key)
+        for position in range(start, min(start + PREFIX_SCAN, len(self._sorted_keys))):
+            if not self._sorted_keys[position].startswith(key):
+                break
+            artist_id = self._sorted[position]
+            scores[artist_id] = max(scores.get(artist_id, 0.0), len(key) / len(self._keys[artist_id]))
+
+        return [(artist_id, self.artists.name(artist_id), round(score, 3))
+                for artist_id, score in self._rank(key, scores, limit)]
+
+
+def write_index(artist_ids, artists, path):
+    """保存時に呼ばれ、イベントのあるアーティストのIDから索引を作成して書き出す"""
+    ArtistSearchIndex.build(artist_ids, artists).save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='アーティスト名をあいまい検索する')
+    parser.add_argument('query', help='検索する名前')
+    parser.add_argument('--index', help='索引ファイル（省略時は data/artist_index.json）')
+    parser.add_argument('--limit', type=int, default=10, help='表示する件数')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='類似度の下限')
+    args = parser.parse_args()
+
+    index = ArtistSearchIndex.load(args.index)
+    started = time.perf_counter()
+    results = index.search(args.query, args.limit, args.threshold)
+    elapsed = (time.perf_counter() - started) * 1000
+    for artist_id, name, score in results:
+        print(f"{score:.3f}  {artist_id:>6}  {name}")
+    print(f"{len(results)} results from {len(index)} artists in {elapsed:.2f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
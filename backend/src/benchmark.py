@@ -0,0 +1,114 @@
+# benchmark.py
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(__file__))
+from mock_venues import SiteGenerator, add_server_arguments, server_from_args
+
+
+def _serve(args, ready):
+    """別プロセスでモックサーバーを動かす（スクレイパーとGILを取り合わないようにする）"""
+    server = server_from_args(args)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+def _peak_rss_mb():
+    # Linux の ru_maxrss はKB単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(args, base_url):
+    """モックサーバーの全会場を収集し、所要時間・件数・リクエスト数・メモリを返す"""
+    from crawl_tasks import root_tasks, run_task_graph
+    from discovery import feed_discovery
+    from fetcher import Fetcher
+    from horizon import schedule_horizon
+    from http_policy import circuit_breaker, latency_tracker
+    from venues import VENUE_CONFIGS
+
+    # 実際の会場の設定は使わず、キャッシュ・前回の状態の影響も受けないようにする
+    configs = SiteGenerator(args.venues, args.shows_per_month, args.max_artists, args.seed).venue_configs(base_url)
+    VENUE_CONFIGS.clear()
+    VENUE_CONFIGS.update(configs)
+    schedule_horizon.enabled = False
+    feed_discovery.enabled = False
+
+    fetcher = Fetcher(pool_size=args.workers, hedge=args.hedge)
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    events, complete = run_task_graph(root_tasks(list(configs)), fetcher, args.workers)
+    crawl_seconds = time.perf_counter() - started
+    circuit_breaker.report()
+    latency_tracker.report()
+    fetcher.close()
+
+    counters = next(iter(fetcher.metrics.snapshot().values()), {})
+    result = {
+        'venues': len(configs),
+        'workers': args.workers,
+        'hedge': args.hedge,
+        'complete': complete,
+        'events': len(events),
+        'requests': counters.get('requests', 0),
+        'errors': counters.get('errors', 0),
+        'megabytes': round(counters.get('bytes', 0) / 1024 / 1024, 2),
+        'crawl_seconds': round(crawl_seconds, 3),
+        'events_per_second': round(len(events) / crawl_seconds, 1),
+        'requests_per_second': round(counters.get('requests', 0) / crawl_seconds, 1),
+        'peak_rss_mb_before': round(rss_before, 1),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+    if args.save:
+        from postprocess import events_frame, normalize_events, write_outputs
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_outputs(normalize_events(events_frame(events)), data_dir)
+        result['save_seconds'] = round(time.perf_counter() - started, 3)
+        result['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ローカルのモックサーバーに対してスクレイパーの処理性能とメモリを計測する')
+    add_server_arguments(parser)
+    parser.add_argument('--workers', type=int, default=8, help='同時に実行するタスク数')
+    parser.add_argument('--hedge', action='store_true', help='遅いリクエストをヘッジする')
+    parser.add_argument('--save', action='store_true', help='保存処理（JSON・CSV・ストア・索引）の時間も計測する')
+    parser.add_argument('--parse-cache', action='store_true', help='解析結果のキャッシュを使う（既定では使わない）')
+    parser.add_argument('--output', help='結果をJSONで書き出すファイル')
+    parser.add_argument('--verbose', action='store_true', help='スクレイパーのログを表示する')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.parse_cache:
+        # parse_cache は読み込み時に環境変数を見るため、スクレイパーを読み込む前に設定する
+        os.environ['SCRAPER_PARSE_CACHE'] = '0'
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(args, ready), daemon=True)
+    server.start()
+    try:
+        base_url = ready.get(timeout=30)
+        result = run_benchmark(args, base_url)
+    finally:
+        server.terminate()
+        server.join()
+
+    for key, value in result.items():
+        print(f"{key:>20}: {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# checkpoint.py
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+from crawl_tasks import Task, run_task, run_task_tree
+from postprocess import open_atomic
+from utils import event_to_dict
+from venues import VENUE_CONFIGS
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'checkpoints')
+WHOLE_VENUE = ''  # 月単位に分割しない会場のスライス
+
+
+class Checkpoint:
+    """会場・月単位の収集結果を完了ごとにファイルへ保存する
+
+    1スライス = 1ファイルで、一時ファイルへの書き込み後にリネームするため、
+    ファイルが存在するスライスは完了済みとみなせる。
+    """
+
+    def __init__(self, name='default', base_dir=CHECKPOINT_DIR):
+        self.dir = os.path.join(base_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, venue, month):
+        slice_name = month.replace('/', '') if month else 'all'
+        return os.path.join(self.dir, f"{venue}_{slice_name}.json")
+
+    def is_done(self, venue, month=WHOLE_VENUE):
+        return os.path.exists(self._path(venue, month))
+
+    def save(self, venue, month, events):
+        """スライスの結果を保存"""
+        record = {
+            'venue': venue,
+            'month': month,
+            'events': [event_to_dict(event) for event in events],
+        }
+        with open_atomic(self._path(venue, month), 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+
+    def load(self, venue_keys):
+        """指定した会場の保存済みスライスのイベントを返す"""
+        pattern = re.compile(r'^(.+)_(\d{6}|all)\.json$')
+        venue_keys = set(venue_keys)
+        events = []
+        for path in sorted(glob.glob(os.path.join(self.dir, '*.json'))):
+            match = pattern.match(os.path.basename(path))
+            if not match or match.group(1) not in venue_keys:
+                continue
+            with open(path, encoding='utf-8') as f:
+                events.extend(json.load(f)['events'])
+        return events
+
+    def clear(self):
+        """全てのスライスを削除"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+
+
+def _fetch_errors(fetcher):
+    """これまでに失敗したリクエストの数（パーサーが例外を握りつぶした失敗も数える）
+
+    フィードや公開範囲より先の月のプローブが404などで失敗したものは含めない。
+    """
+    return sum(counters['errors'] for counters in fetcher.metrics.snapshot().values())
+
+
+def crawl_venue(venue_key, fetcher, checkpoint):
+    """会場を月単位（分割できない会場は会場単位）で収集し、完了したスライスを保存する
+
+    保存済みのスライスは取得し直さない。戻り値は今回取得したイベント。
+    取得に失敗したリクエストがあったスライスは保存せず、再開時に取得し直す。
+    """
+    from scraper import get_venue_steps
+
+    logger = logging.getLogger(__name__)
+    root = Task(venue_key, '', '')
+    steps = get_venue_steps(venue_key, VENUE_CONFIGS[venue_key])
+
+    # 月単位に分割できない会場は会場全体を1スライスとする
+    if 'month' not in steps and 'month_links' not in steps:
+        if checkpoint.is_done(venue_key):
+            logger.info("Skipping %s (checkpoint)", venue_key)
+            return []
+        errors = _fetch_errors(fetcher)
+        events, complete = run_task_tree(root, fetcher)
+        if complete and _fetch_errors(fetcher) == errors:
+            checkpoint.save(venue_key, WHOLE_VENUE, events)
+        return events
+
+    events = []
+    _, month_tasks = run_task(root, fetcher)
+    for task in month_tasks:
+        if checkpoint.is_done(venue_key, task.month):
+            logger.info("Skipping %s %s (checkpoint)", venue_key, task.month)
+            continue
+        errors = _fetch_errors(fetcher)
+        try:
+            month_events, complete = run_task_tree(task, fetcher)
+        except Exception as e:
+            logger.error("Error scraping %s %s: %s", venue_key, task.month, e, exc_info=True)
+            continue
+        events.extend(month_events)
+        # 一部の詳細ページが失敗した月は保存せず、再開時に取得し直す
+        if complete and _fetch_errors(fetcher) == errors:
+            checkpoint.save(venue_key, task.month, month_events)
+
+    return events
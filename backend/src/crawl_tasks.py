@@ -0,0 +1,194 @@
+# crawl_tasks.py
+import logging
+import os
+import sys
+import threading
+from collections import deque, namedtuple
+
+sys.path.append(os.path.dirname(__file__))
+from discovery import feed_discovery
+from venues import VENUE_CONFIGS
+
+# 収集処理の最小単位
+#   venue:      会場キー
+#   month:      対象月（'YYYY/MM'、会場全体や月に依存しない場合は空文字）
+#   detail_url: 詳細ページのURL（一覧・カレンダーのタスクでは空文字）
+Task = namedtuple('Task', ['venue', 'month', 'detail_url'])
+
+# 一覧ページから取得した詳細ページ
+#   url:  詳細ページのURL
+#   date: 一覧ページやURLから安価に分かる公演日（'YYYY/MM/DD'、分からない場合はNone）
+DetailLink = namedtuple('DetailLink', ['url', 'date'])
+
+
+def root_tasks(venue_keys):
+    """会場ごとの起点となるタスクを作成"""
+    return [Task(key, '', '') for key in venue_keys]
+
+
+def format_month(year, month):
+    return f"{year}/{month:02d}"
+
+
+def parse_month(value):
+    year, month = value.split('/')
+    return int(year), int(month)
+
+
+def run_task(task, fetcher):
+    """タスクを1つ実行し、(イベント, 追加のタスク) を返す
+
+    会場のタスクは月単位または詳細ページ単位のタスクに分割され、
+    カレンダーのタスクは詳細ページのタスクに分割される。
+    取得に失敗した場合は例外を送出する（呼び出し側で再試行する）。
+    """
+    from scraper import get_next_n_months, get_venue_steps, links_in_window
+
+    logger = logging.getLogger(__name__)
+    config = VENUE_CONFIGS[task.venue]
+    steps = get_venue_steps(task.venue, config)
+    base_url = config['url']
+
+    if task.detail_url:
+        events = steps['detail'](fetcher, base_url, task.detail_url)
+        feed_discovery.record(task.venue, task.detail_url, events)
+        return events, []
+
+    if task.month:
+        year, month = parse_month(task.month)
+        if 'month_links' in steps:
+            detail_urls = links_in_window(steps['month_links'](fetcher, base_url, year, month), task.venue)
+            return [], [Task(task.venue, task.month, url) for url in detail_urls]
+        return steps['month'](fetcher, base_url, year, month), []
+
+    if 'page' in steps:
+        return steps['page'](fetcher, base_url), []
+
+    if 'links' in steps:
+        # 公演日が対象期間外の詳細ページは、一覧の段階で除く
+        def list_links(fetcher, base_url):
+            return links_in_window(steps['links'](fetcher, base_url), task.venue)
+
+        # フィードで変更を検出できる会場は、変更された詳細ページだけを取得する
+        discovered = None
+        if 'feed_links' in steps:
+            discovered = feed_discovery.discover(fetcher, task.venue, base_url, steps['feed_links'], list_links)
+        if discovered is not None:
+            detail_urls, events = discovered
+            return events, [Task(task.venue, '', url) for url in detail_urls]
+        return [], [Task(task.venue, '', url) for url in list_links(fetcher, base_url)]
+
+    children = [Task(task.venue, format_month(year, month), '') for year, month in get_next_n_months()]
+    logger.debug("Split %s into %s month tasks", task.venue, len(children))
+    return [], children
+
+
+def run_task_tree(task, fetcher):
+    """タスクとその子タスクを順に全て実行し、(イベント, 全て成功したか) を返す
+
+    子タスクの失敗はログに記録して残りの処理を続ける。
+    """
+    logger = logging.getLogger(__name__)
+    events, children = run_task(task, fetcher)
+    events = list(events)
+    complete = True
+
+    for child in children:
+        try:
+            child_events, child_complete = run_task_tree(child, fetcher)
+        except Exception as e:
+            logger.error("Error running task %s: %s", child, e, exc_info=True)
+            complete = False
+            continue
+        events.extend(child_events)
+        complete = complete and child_complete
+
+    return events, complete
+
+
+class WorkStealingScheduler:
+    """タスクグラフ（会場 → 月 → 詳細ページ）をワーカースレッドで実行する
+
+    各ワーカーは自分の両端キューを持ち、実行したタスクの子タスクを自分のキューに
+    積んで新しいものから処理する。自分のキューが空になったワーカーは、最も多く
+    タスクが残っている他のワーカーのキューから古いもの（大きな部分木）を盗む。
+    タスクには親からの位置を表すキーを付け、結果はキーの順に結合するため、
+    実行順によらず run_task_tree を順に実行した場合と同じ順序になる。
+    """
+
+    def __init__(self, fetcher, workers):
+        self.fetcher = fetcher
+        self.workers = max(1, workers)
+        self._queues = [deque() for _ in range(self.workers)]
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._results = {}
+        self._failed = 0
+        self._executed = [0] * self.workers
+        self._steals = [0] * self.workers
+
+    def run(self, roots):
+        """全てのタスクを実行し、(イベント, 全て成功したか) を返す"""
+        logger = logging.getLogger(__name__)
+        with self._cond:
+            for index, task in enumerate(roots):
+                self._queues[index % self.workers].append(((index,), task))
+            self._pending = len(roots)
+
+        threads = [threading.Thread(target=self._work, args=(worker,), name=f"crawl-{worker}")
+                   for worker in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        logger.info("Task graph finished: %s tasks executed per worker, %s steals, %s failed",
+                    self._executed, self._steals, self._failed)
+        events = [event for key in sorted(self._results) for event in self._results[key]]
+        return events, self._failed == 0
+
+    def _take(self, worker):
+        """自分のキューの新しいタスク、無ければ他のワーカーの古いタスクを取り出す"""
+        own = self._queues[worker]
+        if own:
+            return own.pop()
+        victim = max(range(self.workers), key=lambda other: len(self._queues[other]))
+        if self._queues[victim]:
+            self._steals[worker] += 1
+            return self._queues[victim].popleft()
+        return None
+
+    def _work(self, worker):
+        logger = logging.getLogger(__name__)
+        while True:
+            with self._cond:
+                item = self._take(worker)
+                while item is None:
+                    if self._pending == 0:
+                        return
+                    # 実行中のタスクが子タスクを追加するのを待つ
+                    self._cond.wait()
+                    item = self._take(worker)
+
+            key, task = item
+            try:
+                events, children = run_task(task, self.fetcher)
+            except Exception as e:
+                logger.error("Error running task %s: %s", task, e, exc_info=True)
+                events, children, failed = [], [], True
+            else:
+                failed = False
+
+            with self._cond:
+                self._executed[worker] += 1
+                self._failed += failed
+                self._results[key] = events
+                for index, child in enumerate(children):
+                    self._queues[worker].append((key + (index,), child))
+                self._pending += len(children) - 1
+                self._cond.notify_all()
+
+
+def run_task_graph(roots, fetcher, workers):
+    """タスクを子タスクに分割しながら並列に実行し、(イベント, 全て成功したか) を返す"""
+    return WorkStealingScheduler(fetcher, workers).run(roots)
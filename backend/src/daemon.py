@@ -0,0 +1,207 @@
+# daemon.py
+import heapq
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(__file__))
+from crawl_tasks import Task, run_task_tree
+from dates import run_clock
+from discovery import feed_discovery
+from fetcher import Fetcher, Validators
+from horizon import schedule_horizon
+from http_policy import circuit_breaker, latency_tracker
+from parse_cache import parse_cache
+from utils import event_to_dict
+from venues import VENUE_CONFIGS
+
+DEFAULT_POLL_INTERVAL = 3600  # 会場を取得し直す間隔（秒）。会場の設定の poll_interval で上書きできる
+DEFAULT_CONTROL_PORT = 8765
+CONTROL_HOST = '127.0.0.1'  # 制御用のエンドポイントはローカルからのみ受け付ける
+
+
+class ScraperDaemon:
+    """常駐して会場ごとの間隔でスケジュールを取得し直し、変更があれば保存する
+
+    Fetcher（接続プール・条件付きリクエストの検証子）と会場ごとの最新の結果を
+    メモリに保持するため、2回目以降の取得は変わったページの分だけで済む。
+    取得に失敗した会場は前回の結果を使い続ける。
+    """
+
+    def __init__(self, venue_keys, publish, poll_interval=DEFAULT_POLL_INTERVAL, fetcher=None):
+        self.venue_keys = list(venue_keys)
+        self.publish = publish
+        self.fetcher = fetcher or Fetcher(validators=Validators())
+        self.intervals = {key: VENUE_CONFIGS[key].get('poll_interval', poll_interval) for key in self.venue_keys}
+        self._events = {}
+        self._refreshed_at = {}
+        self._due = [(0.0, key) for key in self.venue_keys]  # (次に取得する時刻, 会場キー)
+        heapq.heapify(self._due)
+        self._requested = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+
+    def request_refresh(self, venue_keys=None):
+        """指定した会場（省略時は全て）をすぐに取得し直す。受け付けた会場キーを返す"""
+        keys = [key for key in (venue_keys or self.venue_keys) if key in self.intervals]
+        with self._cond:
+            self._requested.update(keys)
+            self._cond.notify_all()
+        return keys
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def status(self):
+        """会場ごとの件数・最終取得時刻・次の取得時刻と、ホストごとの計測"""
+        with self._cond:
+            due = {key: at for at, key in self._due}
+            venues = {
+                key: {
+                    'events': len(self._events.get(key, ())),
+                    'refreshed_at': self._refreshed_at.get(key),
+                    'next_refresh_in': max(0.0, round(due.get(key, 0.0) - time.monotonic(), 1)),
+                    'interval': self.intervals[key],
+                }
+                for key in self.venue_keys
+            }
+        return {'venues': venues, 'hosts': self.fetcher.metrics.snapshot()}
+
+    def _take_due(self):
+        """取得する時刻になった会場と要求された会場を取り出す（無ければ待機する）"""
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                keys = set(self._requested)
+                while self._due and self._due[0][0] <= now:
+                    keys.add(heapq.heappop(self._due)[1])
+                if keys:
+                    self._requested.clear()
+                    # 要求により前倒しした会場は、予定していた取得を取り消す
+                    self._due = [(at, key) for at, key in self._due if key not in keys]
+                    heapq.heapify(self._due)
+                    return sorted(keys)
+                timeout = self._due[0][0] - now if self._due else None
+                self._cond.wait(timeout)
+            return []
+
+    def refresh(self, venue_keys):
+        """会場を取得し直し、結果が変わっていれば保存する"""
+        logger = logging.getLogger(__name__)
+        # 1回の取得を1回の実行とみなし、基準日・ホストの打ち切り・全ての月を取得するかの判定をやり直す
+        run_clock.set_reference()
+        circuit_breaker.reset()
+        schedule_horizon.start_run()
+        started = time.monotonic()
+        changed = False
+
+        for venue_key in venue_keys:
+            try:
+                events, complete = run_task_tree(Task(venue_key, '', ''), self.fetcher)
+            except Exception as e:
+                logger.error("Error refreshing %s: %s", venue_key, e, exc_info=True)
+                complete = False
+            # 一部が失敗した会場は前回の結果を残す（ただし前回の結果が無ければ使う）
+            if complete or venue_key not in self._events:
+                events = [event_to_dict(event) for event in events]
+                changed = changed or events != self._events.get(venue_key)
+                with self._cond:
+                    self._events[venue_key] = events
+                    self._refreshed_at[venue_key] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            with self._cond:
+                heapq.heappush(self._due, (time.monotonic() + self.intervals[venue_key], venue_key))
+
+        circuit_breaker.report()
+        latency_tracker.report()
+        schedule_horizon.save()
+        feed_discovery.save()
+        logger.info("Refreshed %s in %.1f s (%s)", ', '.join(venue_keys), time.monotonic() - started,
+                    'changed' if changed else 'unchanged')
+        if changed:
+            with self._cond:
+                all_events = [event for key in self.venue_keys for event in self._events.get(key, ())]
+            self.publish(all_events)
+
+    def run(self):
+        """停止するまで取得を繰り返す"""
+        while True:
+            venue_keys = self._take_due()
+            if not venue_keys:
+                break
+            self.refresh(venue_keys)
+        self.fetcher.metrics.report()
+        parse_cache.report()
+        self.fetcher.close()
+
+
+def make_control_handler(daemon):
+    """制御用のHTTPハンドラー
+
+    GET  /status                  会場ごとの状態とホストごとの計測をJSONで返す
+    POST /refresh?venue=a&venue=b 指定した会場（省略時は全て）をすぐに取得し直す
+    """
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == '/status':
+                self._reply(200, daemon.status())
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path != '/refresh':
+                self._reply(404, {'error': 'not found'})
+                return
+            requested = parse_qs(url.query).get('venue')
+            unknown = sorted(set(requested or ()) - set(daemon.venue_keys))
+            if unknown:
+                self._reply(400, {'error': 'unknown venues', 'venues': unknown})
+                return
+            self._reply(202, {'refreshing': daemon.request_refresh(requested)})
+
+        def log_message(self, format, *args):
+            logging.getLogger(__name__).info("Control: " + format, *args)
+
+    return ControlHandler
+
+
+def run_daemon(venue_keys, publish, poll_interval=None, control_port=None):
+    """常駐モードで実行する（SIGINT・SIGTERMで停止。control_port が0の場合は制御用のエンドポイントを開かない）"""
+    logger = logging.getLogger(__name__)
+    daemon = ScraperDaemon(venue_keys, publish, poll_interval or DEFAULT_POLL_INTERVAL)
+    if control_port is None:
+        control_port = DEFAULT_CONTROL_PORT
+
+    server = None
+    if control_port:
+        server = ThreadingHTTPServer((CONTROL_HOST, control_port), make_control_handler(daemon))
+        threading.Thread(target=server.serve_forever, name='control', daemon=True).start()
+        logger.info("Control endpoint listening on http://%s:%s", CONTROL_HOST, server.server_address[1])
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+
+    try:
+        daemon.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    logger.info("Daemon stopped")
@@ -0,0 +1,137 @@
+# dates.py
+import logging
+import re
+import threading
+from datetime import date, datetime
+
+WEEKDAYS_JP = ('月', '火', '水', '木', '金', '土', '日')
+
+_NUMBER_PATTERN = re.compile(r'\d+')
+
+
+def add_months(year, month, offset):
+    """指定した年月から offset ヶ月後の (年, 月)"""
+    index = year * 12 + (month - 1) + offset
+    return index // 12, index % 12 + 1
+
+
+class RunClock:
+    """実行単位の基準日で日付文字列を正規化する
+
+    年の補完（年が書かれていない日付は、基準月より前の月なら翌年とする）は
+    実行開始時に固定した基準日で判定するため、実行中に月をまたいでも結果は
+    変わらない。同じ (形式, 文字列) の結果はメモ化する。
+    """
+
+    def __init__(self, reference=None):
+        self._lock = threading.Lock()
+        self.set_reference(reference)
+
+    def set_reference(self, reference=None):
+        """基準日を設定（省略時は現在時刻）し、メモ化した結果を破棄する"""
+        with self._lock:
+            self.reference = reference or datetime.now()
+            self._dates = {}
+            self._weekdays = {}
+
+    def normalize(self, date_text, format_type='default'):
+        """日付文字列を標準形式（YYYY/MM/DD）に変換（解析できない場合はValueError）
+
+        format_type:
+            'default': 標準的な日付形式（2025/02/01）
+            'dot': ドット区切り（2.1や2025.2.1）
+            'slash_short': スラッシュ区切り（2/1）
+            'mixed': 混合フォーマット
+        """
+        key = (format_type, date_text)
+        result = self._dates.get(key)
+        if result is None:
+            result = self._normalize(date_text, format_type)
+            self._dates[key] = result
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def _normalize(self, date_text, format_type):
+        year = None
+        try:
+            if format_type == 'dot':
+                # 2.1 や 2025.2.1 形式
+                parts = date_text.split('.')
+                if len(parts) == 2:
+                    month, day = map(int, parts)
+                elif len(parts) == 3:
+                    year, month, day = map(int, parts)
+                else:
+                    raise ValueError(f"Invalid dot format: {date_text}")
+
+            elif format_type == 'slash_short':
+                # 2/1 形式
+                month, day = map(int, date_text.split('/'))
+
+            elif format_type == 'mixed':
+                # 正規表現で数字を抽出
+                numbers = _NUMBER_PATTERN.findall(date_text)
+                if len(numbers) < 2:
+                    raise ValueError(f"Not enough numbers in date: {date_text}")
+                if len(numbers) == 2:
+                    month, day = map(int, numbers)
+                else:
+                    year, month, day = map(int, numbers[:3])
+
+            else:  # default
+                year, month, day = map(int, date_text.split('/'))
+
+            if year is None:
+                # 年が無い場合は基準月より前の月を翌年とみなす
+                year = self.reference.year
+                if month < self.reference.month:
+                    year += 1
+            elif year < 100:
+                year += 2000
+
+            # 日付の妥当性チェック（メモ化するため文字列ごとに1回のみ）
+            weekday = WEEKDAYS_JP[date(year, month, day).weekday()]
+        except Exception as e:
+            logging.getLogger(__name__).debug("Date parsing failed for %s: %s", date_text, e)
+            return ValueError(f"Invalid date format: {date_text}")
+
+        normalized = f"{year}/{month:02d}/{day:02d}"
+        self._weekdays[normalized] = weekday
+        return normalized
+
+    def weekday_jp(self, date_str):
+        """YYYY/MM/DD 形式の日付の日本語の曜日"""
+        weekday = self._weekdays.get(date_str)
+        if weekday is None:
+            year, month, day = map(int, date_str.split('/'))
+            weekday = self._weekdays[date_str] = WEEKDAYS_JP[date(year, month, day).weekday()]
+        return weekday
+
+    def normalize_column(self, texts, format_type='default'):
+        """日付文字列の列をまとめて正規化し、date・dayの2列のDataFrameを返す
+
+        異なる文字列ごとに1回だけ解析し、曜日は日付の列から一括で求める。
+        解析できない日付の行はどちらの列も欠損値になる。
+        """
+        import pandas as pd
+
+        column = pd.Series(texts, dtype='object')
+        normalized = {}
+        for text in column.dropna().unique():
+            try:
+                normalized[text] = self.normalize(text, format_type)
+            except ValueError:
+                pass
+        dates = column.map(normalized)
+        parsed = pd.to_datetime(dates, format='%Y/%m/%d')
+        days = parsed.dt.weekday.map(dict(enumerate(WEEKDAYS_JP)))
+        return pd.DataFrame({'date': dates, 'day': days})
+
+    def current_month(self):
+        """基準日の (年, 月)"""
+        return self.reference.year, self.reference.month
+
+
+# 実行全体で共有する基準日
+run_clock = RunClock()
@@ -0,0 +1,210 @@
+# discovery.py
+import logging
+import os
+import sys
+import threading
+from datetime import date, timedelta
+from urllib.parse import urljoin
+
+sys.path.append(os.path.dirname(__file__))
+from dates import run_clock
+from state_file import read_json, update_json
+
+DISCOVERY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'feeds.json')
+# WordPress系のサイトでよく使われるサイトマップ・フィードの場所（上から順に試す）
+FEED_CANDIDATES = ('sitemap_index.xml', 'wp-sitemap.xml', 'sitemap.xml', 'feed/')
+PROBE_DAYS = 7         # フィードが見つからなかった会場を再び探すまでの日数
+FULL_REFRESH_DAYS = 7  # この日数ごとに全ての詳細ページを取得し直す
+MAX_SITEMAPS = 20      # サイトマップの索引から読む子サイトマップの上限
+NOT_IN_FEED = '-'      # フィードに載っていない（更新日時が分からない）ページの更新日時
+
+_SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+# RSS・Atomで更新日時を表す要素（先に見つかったものを使う）
+_UPDATED_TAGS = ('{http://www.w3.org/2005/Atom}updated', '{http://purl.org/dc/elements/1.1/modified}',
+                 'pubDate', '{http://www.w3.org/2005/Atom}published')
+
+
+def parse_feed(body, base_url):
+    """サイトマップ・RSS・Atomを解析し、(種類, ページの [(URL, 更新日時)], 子サイトマップの [(URL, 更新日時)]) を返す
+
+    種類はサイトマップなら 'sitemap'、RSS・Atomなら 'feed'。更新日時が無い項目は空文字になる。
+    """
+    from xml.etree import ElementTree
+
+    root = ElementTree.fromstring(body)
+    pages, sitemaps = [], []
+    kind = 'sitemap'
+    if root.tag == f'{_SITEMAP_NS}sitemapindex':
+        for item in root.iter(f'{_SITEMAP_NS}sitemap'):
+            sitemaps.append((item.findtext(f'{_SITEMAP_NS}loc', '').strip(),
+                             item.findtext(f'{_SITEMAP_NS}lastmod', '').strip()))
+    elif root.tag == f'{_SITEMAP_NS}urlset':
+        for item in root.iter(f'{_SITEMAP_NS}url'):
+            pages.append((item.findtext(f'{_SITEMAP_NS}loc', '').strip(),
+                          item.findtext(f'{_SITEMAP_NS}lastmod', '').strip()))
+    elif root.tag in ('rss', '{http://www.w3.org/2005/Atom}feed'):
+        kind = 'feed'
+        for item in [*root.iter('item'), *root.iter('{http://www.w3.org/2005/Atom}entry')]:
+            link = item.findtext('link') or ''
+            atom_link = item.find('{http://www.w3.org/2005/Atom}link')
+            if not link.strip() and atom_link is not None:
+                link = atom_link.get('href', '')
+            updated = next((item.findtext(tag) for tag in _UPDATED_TAGS if item.findtext(tag)), '')
+            pages.append((urljoin(base_url, link.strip()), updated.strip()))
+    else:
+        raise ValueError(f"Not a sitemap or feed: {root.tag}")
+    return kind, [(url, lastmod) for url, lastmod in pages if url], [(url, lastmod) for url, lastmod in sitemaps if url]
+
+
+class FeedDiscovery:
+    """サイトマップ・フィードの更新日時（lastmod）から変更された詳細ページだけを取得する
+
+    会場ごとに見つかったフィードのURLと、詳細ページごとの更新日時・前回の解析結果を
+    保存する。更新日時が変わっていないページは取得せずに前回の結果を使い、
+    フィードが無い会場は一覧ページからの取得に戻る。FULL_REFRESH_DAYS ごとに
+    全ての詳細ページを取得し直し、フィードに出ない変更の取りこぼしを防ぐ。
+
+    詳細ページの一覧は一覧ページ（1リクエスト、収集対象の期間外の公演は除く）から作る。
+    サイトマップには終了した公演のページも残り、RSS・Atomには新しい記事しか無いため、
+    フィードは更新日時にのみ使い、フィードに無いページは前回の更新日時のまま
+    （変更なし）とみなす。
+    """
+
+    def __init__(self, path=DISCOVERY_PATH):
+        self.path = path
+        self._state = None  # 最初に使うときに読み込む
+        self._pending = {}  # (会場, URL) -> 取得中の詳細ページの更新日時
+        self._touched = set()
+        self._lock = threading.Lock()
+        self.enabled = True  # 無効の場合は常に一覧ページから取得し、結果も保存しない
+
+    def _entries(self):
+        if self._state is None:
+            self._state = read_json(self.path)
+        return self._state
+
+    def _find_feed(self, fetcher, venue, base_url, entry):
+        """フィードのURLを探す（見つからなければ PROBE_DAYS の間は探さない）"""
+        if entry.get('feed'):
+            return entry['feed']
+        today = run_clock.reference.date()
+        probed_at = entry.get('probed_at')
+        if probed_at and date.fromisoformat(probed_at) > today - timedelta(days=PROBE_DAYS):
+            return None
+        with self._lock:
+            entry['probed_at'] = today.isoformat()
+            self._touched.add(venue)
+        for candidate in FEED_CANDIDATES:
+            url = urljoin(base_url.rstrip('/') + '/', candidate)
+            try:
+                with fetcher.probing():
+                    response = fetcher.get(url)
+                kind, _, _ = parse_feed(response.content, url)
+            except Exception as e:
+                logging.getLogger(__name__).debug("No feed at %s: %s", url, e)
+                continue
+            entry['feed'] = url
+            entry['kind'] = kind
+            return url
+        logging.getLogger(__name__).info("No sitemap or feed found for %s", venue)
+        return None
+
+    def _read_feed(self, fetcher, feed_url):
+        """フィード（サイトマップの索引なら子サイトマップも）の全てのページと更新日時"""
+        _, pages, sitemaps = parse_feed(fetcher.get(feed_url).content, feed_url)
+        # 索引の lastmod はページの削除では変わらないことがあるため、子サイトマップは毎回読む
+        for sitemap_url, _ in sitemaps[:MAX_SITEMAPS]:
+            pages.extend(parse_feed(fetcher.get(sitemap_url).content, sitemap_url)[1])
+        return pages
+
+    def discover(self, fetcher, venue, base_url, is_detail, list_links):
+        """変更された詳細ページのURLと、変更されていないページの前回のイベントを返す
+
+        フィードが無い・読めない場合は None を返す（一覧ページから取得する）。
+        is_detail はフィードのURLのうち詳細ページとみなすものを判定する関数、
+        list_links は一覧ページから詳細ページのURLを取得する関数 (fetcher, base_url)。
+        """
+        if not self.enabled:
+            return None
+        logger = logging.getLogger(__name__)
+        today = run_clock.reference.date()
+        with self._lock:
+            entry = self._entries().setdefault(venue, {})
+        feed_url = self._find_feed(fetcher, venue, base_url, entry)
+        if feed_url is None:
+            return None
+        try:
+            lastmods = dict(self._read_feed(fetcher, feed_url))
+        except Exception as e:
+            logger.warning("Could not read feed %s, falling back to listing: %s", feed_url, e)
+            entry.pop('feed', None)
+            return None
+
+        if entry.get('kind') == 'sitemap' and not any(is_detail(url) for url in lastmods):
+            # 詳細ページを含まないサイトマップは使わない
+            logger.info("Sitemap %s has no detail pages for %s", feed_url, venue)
+            entry.pop('feed', None)
+            entry['probed_at'] = today.isoformat()
+            return None
+        urls = list_links(fetcher, base_url)
+
+        full_refresh_at = entry.get('full_refresh_at')
+        full = (not full_refresh_at
+                or date.fromisoformat(full_refresh_at) <= today - timedelta(days=FULL_REFRESH_DAYS))
+        known = entry.get('pages', {})
+        changed, unchanged_events, current = [], [], {}
+        for url in dict.fromkeys(urls):
+            previous = known.get(url)
+            if url in lastmods:
+                lastmod = lastmods[url]  # 空文字（更新日時が無い）の場合は毎回取得する
+            else:
+                # フィードに無いページ（RSSの古い記事など）は前回から変わっていないとみなす
+                lastmod = previous['lastmod'] if previous else NOT_IN_FEED
+            if not full and previous and lastmod and previous['lastmod'] == lastmod:
+                unchanged_events.extend(previous['events'])
+                current[url] = previous
+            else:
+                changed.append(url)
+                with self._lock:
+                    self._pending[(venue, url)] = lastmod
+
+        with self._lock:
+            # 一覧・サイトマップから消えたページ（終了した公演など）は保存しない
+            entry['pages'] = current
+            if full:
+                entry['full_refresh_at'] = today.isoformat()
+            self._touched.add(venue)
+        logger.info("%s: %s changed and %s unchanged pages via %s%s", venue, len(changed), len(current),
+                    feed_url, ' (full refresh)' if full else '')
+        return changed, unchanged_events
+
+    def record(self, venue, url, events):
+        """取得した詳細ページの結果を記録（discover で変更ありとしたページのみ）"""
+        with self._lock:
+            lastmod = self._pending.pop((venue, url), None)
+            if lastmod is None:
+                return
+            pages = self._entries().setdefault(venue, {}).setdefault('pages', {})
+            from utils import event_to_dict
+            pages[url] = {'lastmod': lastmod, 'events': [event_to_dict(event) for event in events]}
+
+    def save(self):
+        """今回フィードを読んだ会場の結果を保存（他の会場は他のプロセスが保存した内容を残す）
+
+        読み込みから置き換えまでをファイルのロックの中で行う。
+        """
+        if not self.enabled or not self._touched:
+            return
+
+        def merge(merged):
+            for venue in self._touched:
+                merged[venue] = self._entries()[venue]
+            return merged
+
+        with self._lock:
+            self._state = update_json(self.path, merge)
+            self._touched.clear()
+
+
+# 実行全体で共有するフィードの状態
+feed_discovery = FeedDiscovery()
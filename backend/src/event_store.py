@@ -0,0 +1,309 @@
+# event_store.py
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(__file__))
+from artist_dictionary import DICTIONARY_NAME, ArtistDictionary
+from postprocess import DATA_DIR, open_atomic
+from utils import EVENT_FIELDS
+from venues import VENUE_CONFIGS
+
+STORE_NAME = 'events.store'
+
+# コンパクト形式のファイル
+#   ヘッダー:   マジック, 行数, 文字列数, 文字列領域のバイト数
+#   文字列表:   各文字列の開始位置 (uint32 × (文字列数 + 1)) と UTF-8 の本文（4バイト境界まで詰める）
+#   列:         日付 (YYYYMMDD の uint32)、アーティストID (uint32)、それ以外の各列の文字列番号 (uint32)
+# 行は日付順に並んでいるため、日付の列をそのまま二分探索できる。数値はネイティブのバイト順。
+# アーティスト名は artists.json の辞書から引く。
+MAGIC = b'EVS2'
+HEADER = struct.Struct('<4sIII')
+STRING_FIELDS = tuple(field for field in EVENT_FIELDS if field not in ('date', 'artist'))
+OUTPUT_FIELDS = ('date', 'day', 'artist', 'artist_id', 'title', 'url', 'venue', 'note')  # events.json と同じ順序
+
+
+def date_key(value):
+    """'YYYY/MM/DD'・date・datetime を YYYYMMDD の整数に変換"""
+    if isinstance(value, (date, datetime)):
+        return value.year * 10000 + value.month * 100 + value.day
+    year, month, day = value.split('/')
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def _format_date(key):
+    return f"{key // 10000}/{key // 100 % 100:02d}/{key % 100:02d}"
+
+
+class _StringTable:
+    """文字列番号から文字列を引く（メモリマップしたファイルの文字列は使うときにデコードする）"""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        value = self._decoded.get(index)
+        if value is None:
+            value = bytes(self._data[self._offsets[index]:self._offsets[index + 1]]).decode('utf-8')
+            self._decoded[index] = value
+        return value
+
+
+class EventStore:
+    """保存したイベントを一度だけ読み込み、索引を使って検索する
+
+    行は日付順の配列で保持し、期間の検索は日付の列の二分探索で行う。会場・エリア・
+    アーティストIDごとの行番号の索引と、アーティストごとの次の公演を読み込み時に
+    作成する。結果はイベントの辞書（events.json と同じ形式）で返し、アーティスト名は
+    辞書の正式な表記になる。
+    """
+
+    def __init__(self, date_keys, artist_ids, columns, strings, artists, reference=None):
+        self._date_keys = date_keys
+        self._artist_ids = artist_ids
+        self._columns = columns
+        self._strings = strings
+        self.artists = artists
+        self._build_indexes()
+        self.set_reference(reference)
+
+    # ---- 読み込み ----
+
+    @classmethod
+    def from_records(cls, records, artists=None, reference=None):
+        """イベントの辞書のリストから作成（artist_id が無いイベントは辞書で引く）"""
+        artists = artists or ArtistDictionary.load()
+        date_keys, artist_ids, columns, strings = _encode(records, artists)
+        return cls(date_keys, artist_ids, columns, strings, artists, reference)
+
+    @classmethod
+    def from_json(cls, path=None, artists=None, reference=None):
+        path = path or os.path.join(DATA_DIR, 'events.json')
+        artists = artists or ArtistDictionary.load(os.path.join(os.path.dirname(path), DICTIONARY_NAME))
+        with open(path, encoding='utf-8') as f:
+            return cls.from_records(json.load(f), artists, reference)
+
+    @classmethod
+    def open(cls, path=None, artists=None, reference=None):
+        """コンパクト形式のファイルをメモリマップして読み込む（列はコピーしない）
+
+        artists を省略した場合は同じディレクトリの artists.json を使う。
+        """
+        path = path or os.path.join(DATA_DIR, STORE_NAME)
+        artists = artists or ArtistDictionary.load(os.path.join(os.path.dirname(path), DICTIONARY_NAME))
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        magic, rows, string_count, string_bytes = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an event store file")
+
+        position = HEADER.size
+        offsets = view[position:position + (string_count + 1) * 4].cast('I')
+        position += (string_count + 1) * 4
+        data = view[position:position + string_bytes]
+        position += _padded(string_bytes)
+
+        def column():
+            nonlocal position
+            values = view[position:position + rows * 4].cast('I')
+            position += rows * 4
+            return values
+
+        date_keys = column()
+        artist_ids = column()
+        columns = {field: column() for field in STRING_FIELDS}
+        store = cls(date_keys, artist_ids, columns, _StringTable(offsets, data), artists, reference)
+        store._mapped = mapped  # 参照を保持してマップを開いたままにする
+        return store
+
+    # ---- 索引 ----
+
+    def _build_indexes(self):
+        venue_rows = {}
+        for row, string_id in enumerate(self._columns['venue']):
+            venue_rows.setdefault(string_id, array('I')).append(row)
+        self._by_venue = {self._strings[string_id]: rows for string_id, rows in venue_rows.items()}
+
+        areas = {config['name']: config['area'] for config in VENUE_CONFIGS.values()}
+        self._by_area = {}
+        for venue, rows in self._by_venue.items():
+            area = areas.get(venue)
+            if area:
+                self._by_area.setdefault(area, []).append(rows)
+        self._by_area = {area: _merge(parts) for area, parts in self._by_area.items()}
+
+        self._by_artist = {}
+        for row, artist_id in enumerate(self._artist_ids):
+            self._by_artist.setdefault(artist_id, array('I')).append(row)
+
+    def set_reference(self, reference=None):
+        """「次の公演」の基準日を設定し、アーティストごとの次の公演を求め直す"""
+        self.reference = date_key(reference or datetime.now())
+        self._next_show = {}
+        for artist_id, rows in self._by_artist.items():
+            index = bisect_left(rows, self.reference, key=self._date_keys.__getitem__)
+            if index < len(rows):
+                self._next_show[artist_id] = rows[index]
+
+    # ---- 検索 ----
+
+    def __len__(self):
+        return len(self._date_keys)
+
+    def event(self, row):
+        """行番号のイベントを辞書で返す"""
+        artist_id = self._artist_ids[row]
+        record = {'date': _format_date(self._date_keys[row]), 'artist': self.artists.name(artist_id)}
+        for field in STRING_FIELDS:
+            record[field] = self._strings[self._columns[field][row]]
+        record['artist_id'] = artist_id
+        return {field: record[field] for field in OUTPUT_FIELDS}
+
+    def _rows_between(self, rows, start, end):
+        """行番号のリスト（日付順）から期間内の範囲を二分探索で切り出す"""
+        get_key = self._date_keys.__getitem__
+        low = 0 if start is None else bisect_left(rows, date_key(start), key=get_key)
+        high = len(rows) if end is None else bisect_right(rows, date_key(end), key=get_key)
+        return rows[low:high]
+
+    def between(self, start=None, end=None):
+        """期間内（両端を含む）のイベント"""
+        low = 0 if start is None else bisect_left(self._date_keys, date_key(start))
+        high = len(self) if end is None else bisect_right(self._date_keys, date_key(end))
+        return [self.event(row) for row in range(low, high)]
+
+    def on(self, day):
+        """指定した日のイベント"""
+        return self.between(day, day)
+
+    def by_venue(self, venue, start=None, end=None):
+        return [self.event(row) for row in self._rows_between(self._by_venue.get(venue, ()), start, end)]
+
+    def by_area(self, area, start=None, end=None):
+        return [self.event(row) for row in self._rows_between(self._by_area.get(area, ()), start, end)]
+
+    def _artist_id(self, artist):
+        """アーティストIDまたは表記（辞書の別表記も可）からIDを求める"""
+        return artist if isinstance(artist, int) else self.artists.id_of(artist)
+
+    def by_artist(self, artist, start=None, end=None):
+        """アーティスト（IDまたは表記）のイベント"""
+        rows = self._by_artist.get(self._artist_id(artist), ())
+        return [self.event(row) for row in self._rows_between(rows, start, end)]
+
+    def next_show(self, artist, after=None):
+        """基準日（after を指定した場合はその日）以降で最も早いアーティストの公演"""
+        artist_id = self._artist_id(artist)
+        if after is None:
+            row = self._next_show.get(artist_id)
+            return None if row is None else self.event(row)
+        rows = self._by_artist.get(artist_id, ())
+        index = bisect_left(rows, date_key(after), key=self._date_keys.__getitem__)
+        return self.event(rows[index]) if index < len(rows) else None
+
+    def venues(self):
+        return sorted(self._by_venue)
+
+    def areas(self):
+        return sorted(self._by_area)
+
+    def artist_ids(self):
+        """イベントのあるアーティストのID"""
+        return sorted(self._by_artist)
+
+
+def _merge(parts):
+    """日付順の行番号のリストを1つにまとめる（行番号の順＝日付順）"""
+    if len(parts) == 1:
+        return parts[0]
+    return array('I', sorted(row for rows in parts for row in rows))
+
+
+def _padded(size):
+    return (size + 3) & ~3
+
+
+def _encode(records, artists):
+    """イベントを日付順に並べ、日付・アーティストIDの列と文字列番号の列・文字列表に変換"""
+    order = sorted(range(len(records)), key=lambda index: records[index]['date'])
+    ids = {}
+    strings = []
+    date_keys = array('I')
+    artist_ids = array('I')
+    columns = {field: array('I') for field in STRING_FIELDS}
+    for index in order:
+        record = records[index]
+        date_keys.append(date_key(record['date']))
+        artist_id = record.get('artist_id')
+        artist_ids.append(artists.resolve(record['artist']) if artist_id is None else int(artist_id))
+        for field in STRING_FIELDS:
+            value = record[field] if isinstance(record[field], str) else ''
+            string_id = ids.get(value)
+            if string_id is None:
+                string_id = ids[value] = len(strings)
+                strings.append(value)
+            columns[field].append(string_id)
+    return date_keys, artist_ids, columns, strings
+
+
+def write_store(records, artists, path):
+    """イベントをコンパクト形式で書き出す（一時ファイルに書いてからリネーム）"""
+    date_keys, artist_ids, columns, strings = _encode(records, artists)
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = array('I', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    data = b''.join(encoded)
+
+    with open_atomic(path) as f:
+        f.write(HEADER.pack(MAGIC, len(date_keys), len(strings), len(data)))
+        f.write(offsets.tobytes())
+        f.write(data + b'\0' * (_padded(len(data)) - len(data)))
+        f.write(date_keys.tobytes())
+        f.write(artist_ids.tobytes())
+        for field in STRING_FIELDS:
+            f.write(columns[field].tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保存したイベントを検索する')
+    parser.add_argument('--store', help='コンパクト形式のファイル（省略時は data/events.store、無ければ events.json）')
+    parser.add_argument('--artist', help='アーティスト（IDまたは表記）のイベント')
+    parser.add_argument('--venue', help='会場のイベント')
+    parser.add_argument('--area', help='エリアのイベント')
+    parser.add_argument('--from', dest='start', help='開始日 (YYYY/MM/DD)')
+    parser.add_argument('--to', dest='end', help='終了日 (YYYY/MM/DD)')
+    parser.add_argument('--next', action='store_true', help='アーティストの次の公演のみ')
+    args = parser.parse_args()
+
+    path = args.store or os.path.join(DATA_DIR, STORE_NAME)
+    store = EventStore.open(path) if os.path.exists(path) else EventStore.from_json()
+
+    artist = int(args.artist) if args.artist and args.artist.isdigit() else args.artist
+    if artist and args.next:
+        results = [event for event in [store.next_show(artist, args.start)] if event]
+    elif artist:
+        results = store.by_artist(artist, args.start, args.end)
+    elif args.venue:
+        results = store.by_venue(args.venue, args.start, args.end)
+    elif args.area:
+        results = store.by_area(args.area, args.start, args.end)
+    else:
+        results = store.between(args.start, args.end)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
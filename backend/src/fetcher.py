@@ -0,0 +1,252 @@
+# fetcher.py
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_policy import PermanentHTTPError, fetch_with_policy, hedge_budget, host_of, latency_tracker
+import replay
+
+# 共通のリクエストヘッダー
+COMMON_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3'
+}
+
+REQUEST_TIMEOUT = 10  # タイムアウトの上限（ホストの所要時間が分かるまではこの値を使う）
+MAX_RETRIES = 3
+HEDGE_ENV = 'SCRAPER_HEDGE'  # '1' で遅いリクエストのヘッジ（重複送信）を行う
+POOL_SIZE = 10  # ホストごとに保持する接続数
+HTTP_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'http')
+
+
+def create_session(pool_size=POOL_SIZE):
+    """接続を使い回すセッションを作成（記録・再生モードの場合は差し替える）"""
+    session = requests.Session()
+    session.headers.update(COMMON_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return replay.wrap_session(session)
+
+
+class HostRateLimiter:
+    """同じホストへのリクエストの間隔を min_interval 秒以上（＋ジッター）空ける"""
+
+    def __init__(self, min_interval=0.0, jitter=0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if self.min_interval <= 0 and self.jitter <= 0:
+            return
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(host, now))
+            # 次のリクエストの開始時刻を先に予約し、待機はロックの外で行う
+            self._next_allowed[host] = start + self.min_interval + random.uniform(0, self.jitter)
+        if start > now:
+            time.sleep(start - now)
+
+
+class FetchMetrics:
+    """ホストごとのリクエスト数・キャッシュヒット数・失敗数・転送量・所要時間
+
+    存在確認（プローブ）のリクエストが404などで失敗したものは errors ではなく probe_misses に数える。
+    """
+
+    FIELDS = ('requests', 'cache_hits', 'not_modified', 'errors', 'probe_misses', 'bytes', 'seconds')
+
+    def __init__(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def add(self, url, **values):
+        with self._lock:
+            counters = self._hosts.setdefault(host_of(url), dict.fromkeys(self.FIELDS, 0))
+            for key, value in values.items():
+                counters[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {host: dict(counters) for host, counters in self._hosts.items()}
+
+    def report(self):
+        """ホストごとの集計をログに出力"""
+        logger = logging.getLogger(__name__)
+        for host, counters in sorted(self.snapshot().items()):
+            logger.info(
+                "%s: %s requests, %s cache hits, %s not modified, %s errors, %s probe misses, %.1f KB, %.1f s",
+                host, counters['requests'], counters['cache_hits'], counters['not_modified'], counters['errors'],
+                counters['probe_misses'], counters['bytes'] / 1024, counters['seconds'])
+
+
+class ResponseCache:
+    """取得したレスポンスをURLごとにファイルへ保存し、有効期間内は再利用する"""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl_seconds=6 * 3600):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.md5(url.encode()).hexdigest() + '.pkl')
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl_seconds:
+                return None
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return replay.ReplayResponse(url, entry['status'], entry['headers'], entry['content'])
+
+    def put(self, url, response):
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'content': response.content,
+        }
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+class Validators:
+    """ETag・Last-Modified とその本文をメモリに保持し、条件付きリクエストに使う
+
+    常駐モードのように同じプロセスで何度も取得する場合、変わっていないページは
+    304 の応答だけで済み、保持している本文を再利用できる。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def headers(self, url):
+        """条件付きリクエストのヘッダー（検証子が無ければNone）"""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def cached(self, url):
+        """保持している本文のレスポンス"""
+        entry = self._entries[url]
+        return replay.ReplayResponse(url, 200, entry['headers'], entry['content'])
+
+    def store(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            if not etag and not last_modified:
+                self._entries.pop(url, None)
+                return
+            self._entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'headers': dict(response.headers),
+                'content': response.content,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Fetcher:
+    """全ての会場のパーサーが使うHTTP取得の窓口
+
+    セッション（接続の再利用）、応答の種類に応じた再試行、ホストごとの間隔制御、
+    レスポンスのキャッシュ、条件付きリクエスト、ホストごとの計測、記録・再生を
+    まとめて提供する。タイムアウトはホストごとの所要時間から決め（timeout は上限）、
+    hedge が真（省略時は環境変数 SCRAPER_HEDGE が '1'）の場合は遅いリクエストをヘッジする。
+    パーサーは自分でセッションを作らず、受け取ったFetcherの get() を使う。
+    """
+
+    def __init__(self, session=None, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 rate_limiter=None, cache=None, pool_size=POOL_SIZE, validators=None, hedge=None):
+        self.session = session or create_session(pool_size)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        # 記録・再生中はキャッシュを使わない（記録の取りこぼしや再生結果の混在を防ぐ）
+        self.cache = cache if not replay.is_active() else None
+        self.validators = validators if not replay.is_active() else None
+        if hedge is None:
+            hedge = os.environ.get(HEDGE_ENV) == '1'
+        self.hedge = hedge_budget if hedge else None
+        self.metrics = FetchMetrics()
+        self._probing = threading.local()
+
+    @contextlib.contextmanager
+    def probing(self):
+        """この中のリクエストを存在確認（プローブ）として扱う（スレッドごと）
+
+        404などの恒久的な失敗は想定内のため失敗数に数えない（例外はそのまま送出する）。
+        """
+        previous = getattr(self._probing, 'active', False)
+        self._probing.active = True
+        try:
+            yield
+        finally:
+            self._probing.active = previous
+
+    @property
+    def offline(self):
+        return getattr(self.session, 'offline', False)
+
+    def get(self, url):
+        """URLを取得してレスポンスを返す（失敗した場合は例外を送出）"""
+        if self.cache is not None:
+            response = self.cache.get(url)
+            if response is not None:
+                self.metrics.add(url, cache_hits=1)
+                return response
+
+        if not self.offline:
+            self.rate_limiter.wait(url)
+        headers = self.validators.headers(url) if self.validators is not None else None
+        started = time.monotonic()
+        try:
+            response = fetch_with_policy(self.session, url, self.timeout, self.max_retries, headers=headers,
+                                         latency=latency_tracker, hedge=self.hedge)
+        except Exception as e:
+            if isinstance(e, PermanentHTTPError) and getattr(self._probing, 'active', False):
+                self.metrics.add(url, requests=1, probe_misses=1, seconds=time.monotonic() - started)
+            else:
+                self.metrics.add(url, requests=1, errors=1, seconds=time.monotonic() - started)
+            raise
+        if response.status_code == 304:
+            self.metrics.add(url, requests=1, not_modified=1, seconds=time.monotonic() - started)
+            return self.validators.cached(url)
+        self.metrics.add(url, requests=1, bytes=len(response.content), seconds=time.monotonic() - started)
+
+        if self.validators is not None:
+            self.validators.store(url, response)
+
+        if self.cache is not None:
+            self.cache.put(url, response)
+        return response
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,142 @@
+# horizon.py
+import functools
+import logging
+import os
+import sys
+import threading
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+from dates import run_clock
+from state_file import read_json, update_json
+
+HORIZON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'horizon.json')
+FULL_PROBE_DAYS = 7  # この日数ごとに全ての月を取得し直し、公開範囲を学習し直す
+
+
+def _month_index(year, month):
+    return year * 12 + (month - 1)
+
+
+def _parse_month(value):
+    year, month = value.split('/')
+    return int(year), int(month)
+
+
+class ScheduleHorizon:
+    """会場ごとにスケジュールが公開されている範囲（最も先のイベントがある月）を学習する
+
+    公開範囲内の月と、その1ヶ月先（プローブ）のみを取得し、それより先の月は
+    取得しない。プローブした月にイベントがあれば同じ実行中にさらに1ヶ月先へ進む。
+    FULL_PROBE_DAYS ごとに全ての月を取得して取りこぼしを防ぐ。
+    """
+
+    def __init__(self, path=HORIZON_PATH, full_probe_days=FULL_PROBE_DAYS):
+        self.path = path
+        self.full_probe_days = full_probe_days
+        self._state = None  # 最初に使うときに読み込む
+        self._full_probe = {}
+        self._lock = threading.Lock()
+        self.enabled = True  # 無効の場合は常に全ての月を取得し、学習結果も保存しない
+
+    def start_run(self):
+        """新しい実行を始める（全ての月を取得するかを、実行の基準日で会場ごとに判定し直す）"""
+        with self._lock:
+            self._full_probe.clear()
+
+    def _entries(self):
+        if self._state is None:
+            self._state = read_json(self.path)
+        return self._state
+
+    def _is_full_probe(self, venue):
+        """この実行で全ての月を取得するか（会場ごとに実行中の最初の判定結果を使う）"""
+        if venue not in self._full_probe:
+            # 日付は実行の基準日を使う（再生時は記録した実行と同じ月を取得する）
+            today = run_clock.reference.date()
+            entry = self._entries().get(venue)
+            last_probe = entry.get('last_full_probe') if entry else None
+            due = (
+                last_probe is None
+                or date.fromisoformat(last_probe) <= today - timedelta(days=self.full_probe_days)
+            )
+            self._full_probe[venue] = due
+            if due:
+                self._entries().setdefault(venue, {})['last_full_probe'] = today.isoformat()
+        return self._full_probe[venue]
+
+    def should_fetch(self, venue, year, month):
+        """指定した月を取得するか"""
+        with self._lock:
+            if not self.enabled or self._is_full_probe(venue):
+                return True
+            return _month_index(year, month) <= self._horizon(venue) + 1
+
+    def is_probe(self, venue, year, month):
+        """指定した月が学習済みの公開範囲より先か（まだページが無いことがある月）"""
+        with self._lock:
+            return _month_index(year, month) > self._horizon(venue)
+
+    def _horizon(self, venue):
+        current = _month_index(*run_clock.current_month())
+        last = self._entries().get(venue, {}).get('last_month')
+        return max(current, _month_index(*_parse_month(last))) if last else current
+
+    def record(self, venue, year, month, found):
+        """取得した月の結果件数を記録（イベントがあれば公開範囲を広げる）"""
+        if not found or not self.enabled:
+            return
+        with self._lock:
+            entry = self._entries().setdefault(venue, {})
+            value = f"{year}/{month:02d}"
+            # 'YYYY/MM' 形式のため文字列の比較で前後を判定できる
+            if entry.get('last_month') is None or value > entry['last_month']:
+                entry['last_month'] = value
+
+    def save(self):
+        """学習結果を保存（他のプロセスが保存した結果とは大きい方を採用して統合）
+
+        複数のワーカープロセスが同時に保存してもよいように、読み込みから置き換えまでを
+        ファイルのロックの中で行う。
+        """
+        if not self.enabled:
+            return
+
+        def merge(merged):
+            for venue, entry in self._entries().items():
+                current = merged.setdefault(venue, {})
+                for key in ('last_month', 'last_full_probe'):
+                    value = entry.get(key)
+                    if value is not None and (current.get(key) is None or value > current[key]):
+                        current[key] = value
+            return merged
+
+        with self._lock:
+            self._state = update_json(self.path, merge, indent=2)
+
+
+# 実行全体で共有する公開範囲の学習結果
+schedule_horizon = ScheduleHorizon()
+
+
+def horizon_tracked(func):
+    """月単位の取得関数 (fetcher, base_url, year, month) に公開範囲の判定を加えるデコレータ
+
+    公開範囲外の月はリクエストせずに空のリストを返し、取得した月は
+    結果の件数（イベントまたは詳細ページのURL数）を記録する。公開範囲より先の月の
+    リクエストはプローブとして扱う（ページが無くても取得の失敗に数えない）。
+    """
+    @functools.wraps(func)
+    def wrapper(fetcher, base_url, year, month):
+        if not schedule_horizon.should_fetch(base_url, year, month):
+            logging.getLogger(__name__).info(
+                "Skipping %s %s/%02d (beyond schedule horizon)", base_url, year, month)
+            return []
+        if schedule_horizon.is_probe(base_url, year, month):
+            with fetcher.probing():
+                results = func(fetcher, base_url, year, month)
+        else:
+            results = func(fetcher, base_url, year, month)
+        schedule_horizon.record(base_url, year, month, len(results))
+        return results
+    return wrapper
@@ -0,0 +1,378 @@
+# http_policy.py
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+# 応答の分類
+OK = 'ok'
+NOT_MODIFIED = 'not_modified'  # 304（条件付きリクエストで内容が変わっていない）
+FAIL_FAST = 'fail_fast'        # 再試行しても結果が変わらない（404, 410 など）
+RETRY = 'retry'                # 一時的な障害（5xx, タイムアウト, 接続エラー）
+RATE_LIMITED = 'rate_limited'  # 429（Retry-Afterに従って待機）
+
+FAIL_FAST_STATUSES = {400, 401, 403, 404, 405, 410, 451}
+
+BACKOFF_BASE = 1.0      # 再試行の待機時間の基準（秒）
+BACKOFF_CAP = 30.0      # 再試行の待機時間の上限（秒）
+RETRY_AFTER_CAP = 120   # Retry-Afterで待機する上限（秒）
+BREAKER_THRESHOLD = 5   # 連続失敗でホストを打ち切る回数
+RATE_LIMIT_BUDGET = 180  # 1回の実行でホストごとにRetry-Afterで待機してよい合計（秒）。超えたホストは打ち切る
+LATENCY_WINDOW = 200    # ホストごとに保持する直近の所要時間の件数
+LATENCY_MIN_SAMPLES = 20  # これより少ない間は既定のタイムアウトを使い、ヘッジもしない
+TIMEOUT_FACTOR = 3.0    # タイムアウトを所要時間の p99 の何倍にするか
+TIMEOUT_FLOOR = 2.0     # 所要時間から決めるタイムアウトの下限（秒）
+HEDGE_RATIO = 0.05      # ヘッジ（同じリクエストの重複送信）はリクエスト数のこの割合まで
+HEDGE_BURST = 10        # 貯めておけるヘッジの回数
+
+
+class PermanentHTTPError(requests.RequestException):
+    """再試行しても成功しない応答（404など）"""
+
+
+class HostUnavailable(requests.RequestException):
+    """サーキットブレーカーにより打ち切られたホストへのリクエスト"""
+
+
+def classify_response(response):
+    """応答のステータスコードを分類"""
+    status = response.status_code
+    if status == 200:
+        return OK
+    if status == 304:
+        return NOT_MODIFIED
+    if status == 429:
+        return RATE_LIMITED
+    if status in FAIL_FAST_STATUSES:
+        return FAIL_FAST
+    return RETRY
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """指数バックオフ＋ジッターの待機時間（各ワーカーの再試行が揃わないようにする）"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after_delay(response, default=BACKOFF_CAP, cap=RETRY_AFTER_CAP):
+    """Retry-Afterヘッダー（秒数またはHTTP日付）から待機時間を求める"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return min(default, cap)
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return min(default, cap)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0), cap)
+
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+
+class CircuitBreaker:
+    """ホストごとの連続失敗を数え、閾値を超えたホストをその実行中は打ち切る
+
+    429 の Retry-After で待機した合計も数え、wait_budget 秒を超えるホストも打ち切る
+    （レート制限を続けるホストの待機で実行全体が長引かないようにする）。
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, wait_budget=RATE_LIMIT_BUDGET):
+        self.threshold = threshold
+        self.wait_budget = wait_budget
+        self._failures = {}
+        self._waited = {}
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def check(self, url):
+        """打ち切り済みのホストであればHostUnavailableを送出"""
+        host = host_of(url)
+        if host in self._open:
+            raise HostUnavailable(f"Skipping {url}: circuit open for {host}")
+
+    def record_success(self, url):
+        with self._lock:
+            self._failures.pop(host_of(url), None)
+
+    def record_failure(self, url, reason):
+        host = host_of(url)
+        with self._lock:
+            count = self._failures.get(host, 0) + 1
+            self._failures[host] = count
+            if count >= self.threshold and host not in self._open:
+                self._open[host] = f"{count} consecutive failures (last: {reason})"
+                logging.getLogger(__name__).error(
+                    "Circuit opened for %s after %s consecutive failures: %s", host, count, reason)
+
+    def reserve_wait(self, url, seconds):
+        """Retry-Afterの待機をホストの予算から差し引く（予算を超える場合はホストを打ち切って False）"""
+        host = host_of(url)
+        with self._lock:
+            waited = self._waited.get(host, 0.0) + seconds
+            if waited <= self.wait_budget:
+                self._waited[host] = waited
+                return True
+            if host not in self._open:
+                self._open[host] = f"rate limited beyond {self.wait_budget} s of Retry-After waits"
+                logging.getLogger(__name__).error(
+                    "Circuit opened for %s: Retry-After waits exceed %s s", host, self.wait_budget)
+            return False
+
+    def open_hosts(self):
+        """打ち切ったホストとその理由"""
+        with self._lock:
+            return dict(self._open)
+
+    def reset(self):
+        with self._lock:
+            self._failures.clear()
+            self._waited.clear()
+            self._open.clear()
+
+    def report(self):
+        """打ち切ったホストをログに出力"""
+        logger = logging.getLogger(__name__)
+        for host, reason in self.open_hosts().items():
+            logger.warning("Host %s was skipped for the rest of the run: %s", host, reason)
+
+
+# 実行全体で共有するサーキットブレーカー
+circuit_breaker = CircuitBreaker()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LatencyTracker:
+    """ホストごとの直近の所要時間の分布から、タイムアウトとヘッジを始めるまでの時間を決める
+
+    タイムアウトは p99 の TIMEOUT_FACTOR 倍（TIMEOUT_FLOOR 以上、既定のタイムアウト以下）、
+    ヘッジは p95 を過ぎても応答が無い場合に行う。タイムアウトした試行はタイムアウトの
+    時間を所要時間として数えるため、遅くなったホストのタイムアウトは次第に延びる。
+    """
+
+    def __init__(self, window=LATENCY_WINDOW, min_samples=LATENCY_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._hedges = {}  # ホスト -> [ヘッジした回数, ヘッジが先に返った回数]
+        self._caps = {}  # ホスト -> 最後に使ったタイムアウトの上限（取得側の既定のタイムアウト）
+        self._lock = threading.Lock()
+
+    def record(self, url, seconds):
+        host = host_of(url)
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def record_hedge(self, url, won):
+        with self._lock:
+            counts = self._hedges.setdefault(host_of(url), [0, 0])
+            counts[0] += 1
+            counts[1] += won
+
+    def _quantiles(self, host):
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            values = sorted(samples)
+        return _percentile(values, 0.95), _percentile(values, 0.99)
+
+    def limits(self, url, default_timeout):
+        """(タイムアウト, ヘッジを始めるまでの秒数) を返す（計測が足りない間は (default_timeout, None)）"""
+        host = host_of(url)
+        with self._lock:
+            self._caps[host] = default_timeout
+        return self._limits(host, default_timeout)
+
+    def _limits(self, host, default_timeout):
+        quantiles = self._quantiles(host)
+        if quantiles is None:
+            return default_timeout, None
+        p95, p99 = quantiles
+        return min(default_timeout, max(TIMEOUT_FLOOR, p99 * TIMEOUT_FACTOR)), p95
+
+    def report(self):
+        """ホストごとの所要時間の分布と、実際に使うタイムアウト（上限で切った値）、ヘッジの回数をログに出力"""
+        logger = logging.getLogger(__name__)
+        with self._lock:
+            caps = dict(self._caps)
+        for host in sorted(caps):
+            quantiles = self._quantiles(host)
+            if quantiles is None:
+                continue
+            timeout, _ = self._limits(host, caps[host])
+            hedged, won = self._hedges.get(host, (0, 0))
+            logger.info("%s: p95 %.2f s, p99 %.2f s, timeout %.1f s, %s hedged (%s won)",
+                        host, quantiles[0], quantiles[1], timeout, hedged, won)
+
+
+class HedgeBudget:
+    """実行全体で共有するヘッジの予算
+
+    リクエスト1件ごとに ratio 回分が貯まり（上限 burst 回）、ヘッジ1回で1回分を使う。
+    そのため重複して送るリクエストは全体の ratio の割合を超えない。
+    """
+
+    def __init__(self, ratio=HEDGE_RATIO, burst=HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self):
+        """予算があれば1回分を使って True を返す"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+# 実行全体で共有する所要時間の計測とヘッジの予算
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+
+def _get_hedged(session, url, timeout, headers, delay, budget, latency):
+    """delay 秒以内に応答が無ければ予算の範囲で同じGETをもう1つ送り、先に成功した応答を返す
+
+    両方失敗した場合は最初のリクエストの例外を送出する。遅かった方のリクエストは
+    タイムアウトまで別のスレッドで続き、結果は捨てる。
+    """
+    results = queue.Queue()
+
+    def send(hedge):
+        try:
+            results.put((hedge, session.get(url, timeout=timeout, headers=headers), None))
+        except Exception as e:
+            results.put((hedge, None, e))
+
+    threading.Thread(target=send, args=(False,), daemon=True).start()
+    pending, hedged = 1, False
+    try:
+        result = results.get(timeout=delay)
+    except queue.Empty:
+        if budget.spend():
+            threading.Thread(target=send, args=(True,), daemon=True).start()
+            pending, hedged = 2, True
+        result = results.get()
+
+    errors = {}
+    while True:
+        pending -= 1
+        hedge, response, error = result
+        if error is None:
+            if hedged:
+                latency.record_hedge(url, hedge)
+            return response
+        errors[hedge] = error
+        if not pending:
+            raise errors.get(False, error)
+        result = results.get()
+
+
+def fetch_with_policy(session, url, timeout, max_retries, breaker=circuit_breaker, headers=None,
+                      latency=None, hedge=None):
+    """応答の種類に応じて再試行するGETリクエスト
+
+    404/410などは即座にPermanentHTTPError、5xxやタイムアウトはジッター付きの
+    バックオフで再試行、429はRetry-Afterに従って待機する。連続して失敗した
+    ホストと、Retry-Afterの待機の合計がホストごとの予算を超えたホストは、サーキット
+    ブレーカーにより以降のリクエストを行わない（HostUnavailable）。
+    headers に条件付きリクエストのヘッダーを指定した場合、304はそのまま返す。
+    latency（LatencyTracker）を指定した場合は所要時間を記録し、タイムアウトをホストの
+    p99 から決める（最後の試行は timeout のまま）。さらに hedge（HedgeBudget）を指定した
+    場合は、p95 を過ぎても応答が無いときに予算の範囲で同じリクエストをもう1つ送る。
+    """
+    logger = logging.getLogger(__name__)
+    offline = getattr(session, 'offline', False)
+    # 記録したレスポンスを再生している場合は待機しない
+    sleep = time.sleep if not offline else (lambda seconds: None)
+    if offline:
+        latency = None
+
+    for attempt in range(max_retries):
+        breaker.check(url)
+        attempt_timeout, hedge_delay = timeout, None
+        if latency is not None:
+            attempt_timeout, hedge_delay = latency.limits(url, timeout)
+            if attempt == max_retries - 1:
+                attempt_timeout = timeout
+        started = time.monotonic()
+        try:
+            if hedge is not None:
+                hedge.earn()
+            if hedge is not None and hedge_delay is not None:
+                response = _get_hedged(session, url, attempt_timeout, headers, hedge_delay, hedge, latency)
+            else:
+                response = session.get(url, timeout=attempt_timeout, headers=headers)
+        except requests.RequestException as e:
+            if latency is not None and isinstance(e, requests.Timeout):
+                # タイムアウトも所要時間として数え、遅くなったホストのタイムアウトを延ばす
+                latency.record(url, attempt_timeout)
+            breaker.record_failure(url, type(e).__name__)
+            if attempt == max_retries - 1:
+                logger.error("Failed all %s attempts to fetch %s: %s", max_retries, url, e)
+                raise
+            logger.warning("Attempt %s/%s failed: %s", attempt + 1, max_retries, e)
+            sleep(backoff_delay(attempt))
+            continue
+
+        if latency is not None:
+            latency.record(url, time.monotonic() - started)
+        outcome = classify_response(response)
+        if outcome == OK:
+            breaker.record_success(url)
+            response.encoding = 'utf-8'
+            return response
+
+        if outcome == NOT_MODIFIED:
+            breaker.record_success(url)
+            return response
+
+        if outcome == FAIL_FAST:
+            # ホスト自体は応答しているので連続失敗は数えない
+            breaker.record_success(url)
+            raise PermanentHTTPError(f"Status code {response.status_code} for {url}", response=response)
+
+        if outcome == RATE_LIMITED:
+            wait_time = retry_after_delay(response)
+            if attempt == max_retries - 1:
+                # 最後の試行では待機しない
+                logger.warning("Attempt %s/%s: Rate limited by %s", attempt + 1, max_retries, host_of(url))
+            elif not breaker.reserve_wait(url, wait_time):
+                raise HostUnavailable(f"Skipping {url}: Retry-After wait budget exhausted for {host_of(url)}")
+            else:
+                logger.warning("Rate limited by %s. Waiting %.1f seconds", host_of(url), wait_time)
+        else:
+            breaker.record_failure(url, f"status {response.status_code}")
+            wait_time = backoff_delay(attempt)
+            logger.warning("Attempt %s/%s: Status code %s for %s", attempt + 1, max_retries, response.status_code, url)
+
+        if attempt < max_retries - 1:
+            sleep(wait_time)
+
+    raise requests.RequestException(f"Failed to fetch {url} after {max_retries} attempts")
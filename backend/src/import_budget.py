@@ -0,0 +1,73 @@
+# import_budget.py
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# 起動時に読み込むモジュールと、その読み込みにかけてよい時間（ミリ秒）
+# 大半はrequests（urllib3・certifi）の読み込みで、これはリクエストに必須のため遅延させない
+BUDGETS_MS = {
+    'scraper': 250,
+    'work_queue': 250,
+    'scraper_parallel': 250,
+}
+# 起動時には読み込まず、使うときに読み込むモジュール
+LAZY_MODULES = ('pandas', 'numpy', 'bs4', 'dateutil')
+RUNS = 3  # 計測のばらつきを抑えるため、複数回計測した最小値を使う
+
+_LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module):
+    """-X importtime でモジュールを読み込み、(合計時間ms, {モジュール名: 累積時間ms}, 直接importしたモジュール) を返す"""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=src_dir, capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    depth = {}
+    total = None
+    for line in result.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        cumulative[name] = int(match.group(2)) / 1000
+        depth[name] = len(match.group(3))
+        if name == module:
+            total = cumulative[name]
+    direct = [name for name in cumulative if depth[name] == depth.get(module, 1) + 2]
+    return total, cumulative, direct
+
+
+def check(module, budget_ms, runs=RUNS, top=10):
+    """予算内に収まり、遅延読み込みするモジュールを読み込んでいなければTrue"""
+    measurements = [measure(module) for _ in range(runs)]
+    total, cumulative, direct = min(measurements, key=lambda measurement: measurement[0])
+    eager = sorted(name for name in cumulative if name.split('.')[0] in LAZY_MODULES)
+    ok = total <= budget_ms and not eager
+
+    print(f"{module}: {total:.1f} ms (budget {budget_ms} ms) {'OK' if ok else 'NG'}")
+    slowest = sorted(((cumulative[name], name) for name in direct), reverse=True)
+    for ms, name in slowest[:top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if eager:
+        print(f"  imported at startup (should be lazy): {', '.join(eager[:10])}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時のimportにかかる時間が予算内かを確認する')
+    parser.add_argument('modules', nargs='*', help='確認するモジュール（省略時は全て）')
+    parser.add_argument('--runs', type=int, default=RUNS, help='計測回数（最小値を使用）')
+    args = parser.parse_args()
+
+    modules = args.modules or list(BUDGETS_MS)
+    results = [check(module, BUDGETS_MS.get(module, 250), args.runs) for module in modules]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
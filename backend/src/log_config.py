@@ -0,0 +1,89 @@
+# log_config.py
+import atexit
+import itertools
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
+
+# イベント単位のデバッグログに付与する印（サンプリング対象）
+SAMPLED = {'sampled': True}
+
+_listener = None
+
+
+class SampleFilter(logging.Filter):
+    """SAMPLED付きのレコードをN件に1件だけ通すフィルタ
+
+    every が数値として読めない場合（環境変数の書き間違いなど）は全件を通す。
+    """
+
+    def __init__(self, every=1):
+        super().__init__()
+        try:
+            self.every = max(int(every), 1)
+        except (TypeError, ValueError):
+            self.every = 1
+        # 複数のワーカースレッドから呼ばれるため、next() が不可分な itertools.count で数える
+        self._count = itertools.count(1)
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or self.every == 1:
+            return True
+        return next(self._count) % self.every == 1
+
+
+def setup_logging(log_name='scraper.log', level=None, sample_every=None):
+    """ロギングを一度だけ設定する
+
+    ワーカースレッドはキューに積むだけで、ファイルと標準出力への書き込みは
+    QueueListenerのスレッドが行う。2回目以降の呼び出しは何もしない。
+
+    level: 省略時は環境変数 SCRAPER_LOG_LEVEL（既定 INFO）
+    sample_every: 省略時は環境変数 SCRAPER_LOG_SAMPLE（既定 1 = 全件）
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if level is None:
+        level = os.environ.get('SCRAPER_LOG_LEVEL', 'INFO').upper()
+    if sample_every is None:
+        sample_every = os.environ.get('SCRAPER_LOG_SAMPLE', 1)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.FileHandler(os.path.join(LOG_DIR, log_name), encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SampleFilter(sample_every))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """キューに残ったログを書き出してリスナーを停止する"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,271 @@
+# mock_venues.py
+import argparse
+import hashlib
+import logging
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 合成する会場の種類（VENUE_STEPS のキー）。各種類のページは対応するパーサーが読む構造で生成する
+SITE_KINDS = ('vijon_system', 'hatch', 'muse', 'pangea')
+WEEKDAYS_EN = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+WEEKDAYS_JP = ('月', '火', '水', '木', '金', '土', '日')
+MOCK_HOST = '127.0.0.1'
+
+
+def _add_months(year, month, offset):
+    index = year * 12 + (month - 1) + offset
+    return index // 12, index % 12 + 1
+
+
+class SiteGenerator:
+    """会場サイトのページを決定的に生成する
+
+    会場 i の種類は SITE_KINDS を順に割り当て、各月 shows_per_month 件の公演を持つ。
+    ページの内容は (seed, 会場, 年月) から決まるため、同じ引数なら何度でも同じページになる。
+    """
+
+    def __init__(self, venues=100, shows_per_month=20, max_artists=4, seed=0, today=None):
+        self.venues = venues
+        self.shows_per_month = min(shows_per_month, 28)
+        self.max_artists = max_artists
+        self.seed = seed
+        self.today = today or date.today()
+
+    def venue_configs(self, base_url):
+        """合成した会場の VENUE_CONFIGS 形式の設定"""
+        return {
+            f"mock{index}": {
+                'name': f"Mock Venue {index}",
+                'url': f"{base_url}/{SITE_KINDS[index % len(SITE_KINDS)]}/{index}",
+                'area': f"area{index % 8}",
+                'scraping_type': SITE_KINDS[index % len(SITE_KINDS)],
+            }
+            for index in range(self.venues)
+        }
+
+    def _random(self, *key):
+        digest = hashlib.blake2b(repr((self.seed, *key)).encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, 'big'))
+
+    def shows(self, venue, year, month):
+        """会場・月の公演 [(日, 番号, タイトル, [アーティスト])]"""
+        rng = self._random(venue, year, month)
+        days = sorted(rng.sample(range(1, 29), self.shows_per_month))
+        shows = []
+        for slot, day in enumerate(days):
+            artists = [f"Artist{rng.randrange(self.venues * 50):06d}" for _ in range(rng.randint(1, self.max_artists))]
+            shows.append((day, slot, f"Show {venue}-{year}{month:02d}-{slot}", artists))
+        return shows
+
+    def render(self, base_url, path, query):
+        """パスに対応するページの (ステータス, HTML)"""
+        parts = path.strip('/').split('/')
+        if len(parts) < 2 or parts[0] not in SITE_KINDS or not parts[1].isdigit():
+            return 404, 'not found'
+        kind, venue, rest = parts[0], int(parts[1]), parts[2:]
+        if venue >= self.venues:
+            return 404, 'not found'
+        venue_url = f"{base_url}/{kind}/{venue}"
+        try:
+            return 200, getattr(self, f"_render_{kind}")(venue_url, venue, rest, query)
+        except (LookupError, ValueError):
+            return 404, 'not found'
+
+    # ---- vijon系列: カレンダー（日付の枠に詳細ページへのリンク）と詳細ページ ----
+
+    def _render_vijon_system(self, venue_url, venue, rest, query):
+        if rest[:2] == ['schedule', 'calendar']:
+            year, month = int(rest[2]), int(rest[3])
+            cells = ''.join(
+                f'<td><span class="date">{day}</span>'
+                f'<a href="{venue_url}/schedule/detail/{year}{month:02d}{slot:02d}">{title}</a></td>'
+                for day, slot, title, _ in self.shows(venue, year, month))
+            return f'<html><body><table class="calendar"><tr>{cells}</tr></table></body></html>'
+        if rest[:2] == ['schedule', 'detail']:
+            key = rest[2]
+            year, month, slot = int(key[:4]), int(key[4:6]), int(key[6:])
+            day, _, title, artists = self.shows(venue, year, month)[slot]
+            weekday = WEEKDAYS_EN[date(year, month, day).weekday()]
+            return (f'<html><body><div class="scheduleCnt"><h1>{title}</h1></div>'
+                    f'<p class="day">{year}.{month}.{day:02d} ({weekday})</p>'
+                    f'<span class="artist">{" / ".join(artists)}</span></body></html>')
+        raise LookupError(rest)
+
+    # ---- なんばHatch: 当月からのオフセットで指定する月別の scheduleInfo テーブル ----
+
+    def _render_hatch(self, venue_url, venue, rest, query):
+        if rest != ['schedule.php']:
+            raise LookupError(rest)
+        year, month = _add_months(self.today.year, self.today.month, int(query.get('add', ['0'])[0]))
+        rows = ''.join(
+            f'<tr><th>{month}/{day}\n({WEEKDAYS_JP[date(year, month, day).weekday()]})</th>'
+            f'<td class="bgBlack"><div class="eventTitle">{title}</div>'
+            f'<div class="eventArtist">{" / ".join(artists)}</div></td></tr>'
+            for day, _, title, artists in self.shows(venue, year, month))
+        return f'<html><body><table class="scheduleInfo">{rows}</table></body></html>'
+
+    # ---- 心斎橋MUSE: 年月を指定する月別の記事一覧 ----
+
+    def _render_muse(self, venue_url, venue, rest, query):
+        if rest != ['schedule']:
+            raise LookupError(rest)
+        year, month = int(query['y'][0]), int(query['m'][0])
+        articles = ''.join(
+            f'<article class="media schedule"><div class="event_date">{year}.{month}.{day}</div>'
+            f'<h3 class="media-heading">{title}</h3>'
+            f'<div class="schedule_content"><p>{"/".join(artists)}</p></div></article>'
+            for day, _, title, artists in self.shows(venue, year, month))
+        return f'<html><body>{articles}</body></html>'
+
+    # ---- PANGEA: /schedule/ の一覧と /live/ の詳細ページ ----
+
+    def _render_pangea(self, venue_url, venue, rest, query):
+        if rest == ['schedule']:
+            links = []
+            for offset in range(6):
+                year, month = _add_months(self.today.year, self.today.month, offset)
+                links.extend(
+                    f'<a href="{venue_url}/live/{year}{month:02d}{slot:02d}/">{year}.{month:02d}.{day:02d} {title}</a>'
+                    for day, slot, title, _ in self.shows(venue, year, month))
+            return f'<html><body>{"".join(links)}</body></html>'
+        if rest[:1] == ['live']:
+            key = rest[1]
+            year, month, slot = int(key[:4]), int(key[4:6]), int(key[6:])
+            day, _, title, artists = self.shows(venue, year, month)[slot]
+            return (f'<html><body><p class="live_mom">{year}/{month:02d}</p><p class="live_day">{day}</p>'
+                    f'<span class="pangea-color" style="font-weight: 400">{title}</span>'
+                    f'<div class="hrbox"><span class="badge-info">出演</span>'
+                    f'<div><p>{" / ".join(artists)}</p></div></div></body></html>')
+        raise LookupError(rest)
+
+
+class MockVenueServer:
+    """合成した会場サイトを返すローカルのHTTPサーバー
+
+    latency 秒（±jitter の一様分布）の遅延、slow_rate の割合の slow_latency 秒の遅延（応答の裾）、
+    error_rate の割合の 503、rate_limit_rate の割合の 429（Retry-After: retry_after 秒）を注入できる。
+    """
+
+    def __init__(self, generator, port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, slow_rate=0.0, slow_latency=5.0):
+        self.generator = generator
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((MOCK_HOST, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{MOCK_HOST}:{self._server.server_address[1]}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 接続を使い回せるようにする
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                delay = server.latency + random.uniform(-server.jitter, server.jitter)
+                if random.random() < server.slow_rate:
+                    delay = server.slow_latency
+                if delay > 0:
+                    time.sleep(delay)
+
+                roll = random.random()
+                headers = {}
+                if roll < server.rate_limit_rate:
+                    status, body = 429, 'too many requests'
+                    headers['Retry-After'] = str(server.retry_after)
+                elif roll < server.rate_limit_rate + server.error_rate:
+                    status, body = 503, 'service unavailable'
+                else:
+                    url = urlsplit(self.path)
+                    status, body = server.generator.render(server.base_url, url.path, parse_qs(url.query))
+
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-venues', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_server_arguments(parser):
+    """サーバーと合成サイトの設定の引数（ベンチマークと共通）"""
+    parser.add_argument('--venues', type=int, default=100, help='合成する会場数')
+    parser.add_argument('--shows-per-month', type=int, default=20, help='会場・月ごとの公演数（最大28）')
+    parser.add_argument('--max-artists', type=int, default=4, help='公演ごとの最大出演者数')
+    parser.add_argument('--seed', type=int, default=0, help='ページの内容を決める乱数の種')
+    parser.add_argument('--latency', type=float, default=0.0, help='応答の遅延（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='遅延のばらつき（±秒）')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='大きく遅延させる割合')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='大きく遅延させる場合の遅延（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='503を返す割合')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429を返す割合')
+    parser.add_argument('--retry-after', type=int, default=1, help='429のRetry-After（秒）')
+
+
+def server_from_args(args, port=0):
+    generator = SiteGenerator(args.venues, args.shows_per_month, args.max_artists, args.seed)
+    return MockVenueServer(generator, port, args.latency, args.jitter, args.error_rate,
+                           args.rate_limit_rate, args.retry_after, args.slow_rate, args.slow_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='負荷試験用に合成した会場サイトを返すローカルサーバー')
+    parser.add_argument('--port', type=int, default=8800, help='待ち受けるポート')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = server_from_args(args, args.port)
+    logging.info("Serving %s mock venues on %s", args.venues, server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
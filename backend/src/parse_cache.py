@@ -0,0 +1,174 @@
+# parse_cache.py
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(__file__))
+from dates import run_clock
+from utils import create_show
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'parse_cache.db')
+PARSE_CACHE_ENV = 'SCRAPER_PARSE_CACHE'  # '0' でキャッシュを使わない
+MAX_AGE_DAYS = 30  # この日数使われなかったエントリは削除する
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    parser TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (parser, context, body_hash)
+);
+"""
+
+
+def _encode(events):
+    """イベントのリストを公演ごとにまとめた形式に変換（同じ公演の情報は1回だけ保存）"""
+    shows = []
+    index = {}
+    rows = []
+    for event in events:
+        show = event.show
+        position = index.get(id(show))
+        if position is None:
+            position = index[id(show)] = len(shows)
+            shows.append([show.date, show.day, show.title, show.url, show.venue, show.note])
+        rows.append([position, event.artist])
+    return json.dumps({'shows': shows, 'events': rows}, ensure_ascii=False)
+
+
+def _decode(result):
+    data = json.loads(result)
+    shows = [create_show(*fields) for fields in data['shows']]
+    return [shows[position].event(artist) for position, artist in data['events']]
+
+
+class ParseCache:
+    """ページ本文のハッシュから解析結果（イベントのリスト）を引く永続キャッシュ
+
+    キーは (パーサー名, 解析時の引数, 本文のSHA-256) で、パーサーのバージョンが
+    変わった場合はそのパーサーのエントリを全て破棄する。本文が前回と同じページは
+    BeautifulSoupによる解析を行わずに結果を返す。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_age_days=MAX_AGE_DAYS):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.enabled = os.environ.get(PARSE_CACHE_ENV, '1') != '0'
+        self._conn = None  # 最初に使うときに開く
+        self._pid = None
+        self._checked_versions = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        # forkしたプロセスでは接続を開き直す
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            conn.execute('DELETE FROM parsed WHERE used_at < ?',
+                         (time.time() - self.max_age_days * 86400,))
+            self._conn = conn
+            self._pid = os.getpid()
+            self._checked_versions = set()
+        return self._conn
+
+    def _invalidate_old_versions(self, conn, parser, version):
+        if (parser, version) not in self._checked_versions:
+            removed = conn.execute(
+                'DELETE FROM parsed WHERE parser = ? AND version != ?', (parser, version)
+            ).rowcount
+            if removed:
+                logging.getLogger(__name__).info(
+                    "Discarded %s cached results of %s (parser version changed to %s)", removed, parser, version)
+            self._checked_versions.add((parser, version))
+
+    def get(self, parser, version, context, body_hash):
+        """キャッシュ済みの解析結果（無ければNone）"""
+        with self._lock:
+            conn = self._connection()
+            self._invalidate_old_versions(conn, parser, version)
+            row = conn.execute(
+                'SELECT result FROM parsed WHERE parser = ? AND version = ? AND context = ? AND body_hash = ?',
+                (parser, version, context, body_hash)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                'UPDATE parsed SET used_at = ? WHERE parser = ? AND context = ? AND body_hash = ?',
+                (time.time(), parser, context, body_hash)
+            )
+            self.hits += 1
+        return _decode(row[0])
+
+    def put(self, parser, version, context, body_hash, events):
+        result = _encode(events)
+        with self._lock:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO parsed (parser, version, context, body_hash, result, used_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (parser, version, context, body_hash, result, time.time())
+            )
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute('DELETE FROM parsed')
+
+    def report(self):
+        """キャッシュの利用状況をログに出力"""
+        if self.hits or self.misses:
+            logging.getLogger(__name__).info(
+                "Parse cache: %s hits, %s misses", self.hits, self.misses)
+
+
+# 実行全体で共有する解析結果のキャッシュ
+parse_cache = ParseCache()
+
+
+def cached_parser(version):
+    """解析関数 (html, *args) の結果を本文のハッシュでキャッシュするデコレータ
+
+    パーサーの処理を変更した場合は version を上げると古い結果が使われなくなる。
+    年の補完は実行の基準月に依存するため、基準月もキーに含める。
+    """
+    def decorator(func):
+        parser = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(html, *args):
+            if not parse_cache.enabled:
+                return func(html, *args)
+            context = json.dumps([run_clock.reference.strftime('%Y%m'), *args], ensure_ascii=False)
+            body_hash = hashlib.sha256(html.encode('utf-8')).hexdigest()
+            try:
+                events = parse_cache.get(parser, version, context, body_hash)
+            except sqlite3.Error as e:
+                logging.getLogger(__name__).warning("Parse cache unavailable: %s", e)
+                return func(html, *args)
+            if events is not None:
+                logging.getLogger(__name__).debug("Parse cache hit: %s %s", parser, args)
+                return events
+
+            events = func(html, *args)
+            try:
+                parse_cache.put(parser, version, context, body_hash, events)
+            except sqlite3.Error as e:
+                logging.getLogger(__name__).warning("Could not store parse result: %s", e)
+            return events
+
+        wrapper.parser_version = version
+        return wrapper
+    return decorator
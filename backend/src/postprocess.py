@@ -0,0 +1,169 @@
+# postprocess.py
+import contextlib
+import gzip
+import json
+import logging
+import os
+import stat
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+sys.path.append(os.path.dirname(__file__))
+from dates import run_clock
+from utils import EVENT_FIELDS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# 値の種類が少ない列はカテゴリ型にしてメモリを抑える（pandasは保存時に読み込む）
+CATEGORY_FIELDS = ('venue', 'day', 'title')
+SORT_FIELDS = ['date', 'venue']
+COMPACT_JSON_ENV = 'SCRAPER_COMPACT_JSON'
+
+
+def events_frame(data):
+    """イベント（Eventまたは辞書）のリストを1つのDataFrameに変換する"""
+    import pandas as pd
+
+    columns = {field: [event[field] for event in data] for field in EVENT_FIELDS}
+    df = pd.DataFrame(columns, columns=list(EVENT_FIELDS))
+    for field in CATEGORY_FIELDS:
+        df[field] = df[field].astype('category')
+    return df
+
+
+def _artist_key(artists):
+    """重複判定用にアーティスト名の列を正規化（utils.normalize_artist と同じ規則）"""
+    return (artists.str.normalize('NFKC')
+            .str.casefold()
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip())
+
+
+def normalize_events(df):
+    """前後の空白を除去し、重複を除いて日付・会場の順に並べ替える
+
+    重複は (日付, 正規化したアーティスト名, 会場) が同じイベントで、最初のものを残す。
+    同じ日付・会場の中では取得した順序を保つ。曜日が取得できなかったイベントは
+    日付の列からまとめて補完する。
+    """
+    import pandas as pd
+
+    df['artist'] = df['artist'].str.strip()
+    df = df[df['artist'] != ''].copy()
+
+    missing_day = (df['day'].astype(object).fillna('') == '').to_numpy()
+    if missing_day.any():
+        filled = run_clock.normalize_column(df.loc[missing_day, 'date'].tolist())['day'].fillna('')
+        days = df['day'].astype(object).to_numpy(copy=True)
+        days[missing_day] = filled.to_numpy()
+        df['day'] = pd.Categorical(days)
+
+    key = _artist_key(df['artist'])
+    duplicated = pd.DataFrame({'date': df['date'], 'artist': key, 'venue': df['venue']}).duplicated()
+    df = df[~duplicated.to_numpy()]
+    return df.sort_values(SORT_FIELDS, kind='stable').reset_index(drop=True)
+
+
+def dump_json(records, compact=False):
+    """JSONをUTF-8のバイト列に変換（orjsonがあれば使用する）"""
+    if orjson is not None:
+        return orjson.dumps(records, option=0 if compact else orjson.OPT_INDENT_2)
+    if compact:
+        return json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(records, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+@contextlib.contextmanager
+def open_atomic(path, mode='wb', **kwargs):
+    """同じディレクトリの一時ファイルを開き、書き終えたら path に置き換える
+
+    一時ファイルは書き手ごとに別の名前にするため、複数のプロセス（常駐モードと定期実行など）が
+    同じファイルを書いても、他のプロセスの書きかけのファイルを置くことはない。
+    """
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        # mkstemp は所有者だけが読める権限で作るため、置き換えるファイル（無ければ 644）に揃える
+        try:
+            permissions = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            permissions = 0o644
+        os.chmod(tmp_path, permissions)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_atomic(path, body):
+    """一時ファイルに書き込んでからリネームする（読み手が書きかけのファイルを見ることはない）"""
+    with open_atomic(path) as f:
+        f.write(body)
+
+
+def write_compressed(path, body):
+    """配信用に圧縮済みの .gz（と brotli があれば .br）を書き出す"""
+    # mtimeを固定して、内容が同じなら圧縮結果も同じになるようにする
+    write_atomic(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(path + '.br', brotli.compress(body, quality=11))
+    elif os.path.exists(path + '.br'):
+        # 古い内容の .br が配信されないように削除する
+        os.remove(path + '.br')
+
+
+def write_outputs(df, data_dir=DATA_DIR, compact=None):
+    """1つのDataFrameからJSONとCSV（と圧縮済みのJSON、検索用のコンパクト形式・アーティスト名の索引・集計、
+    直近のイベントの hot のファイルと過去のイベントの月別のアーカイブ）を書き出す
+
+    各イベントには artists.json の辞書のアーティストIDを artist_id として付ける。
+    compact を指定しない場合は環境変数 SCRAPER_COMPACT_JSON が '1' のときに
+    インデントなしの配信用JSONを書き出す。
+    """
+    logger = logging.getLogger(__name__)
+    os.makedirs(data_dir, exist_ok=True)
+    if compact is None:
+        compact = os.environ.get(COMPACT_JSON_ENV) == '1'
+
+    # アーティストに辞書のIDを付け、検索用の形式はIDで参照する
+    from artist_dictionary import assign_ids
+    artist_ids, artists = assign_ids(df['artist'], data_dir)
+    df = df.copy(deep=False)
+    df.insert(df.columns.get_loc('artist') + 1, 'artist_id', artist_ids)
+
+    json_path = os.path.join(data_dir, 'events.json')
+    logger.info("Saving JSON to: %s", json_path)
+    records = df.astype(object).to_dict('records')
+    body = dump_json(records, compact)
+    write_atomic(json_path, body)
+    write_compressed(json_path, body)
+
+    csv_path = os.path.join(data_dir, 'events.csv')
+    logger.info("Saving CSV to: %s", csv_path)
+    write_atomic(csv_path, df.to_csv(index=False).encode('utf-8'))
+
+    from event_store import STORE_NAME, write_store
+    write_store(records, artists, os.path.join(data_dir, STORE_NAME))
+
+    from artist_search import INDEX_NAME, write_index
+    write_index(artist_ids.unique().tolist(), artists, os.path.join(data_dir, INDEX_NAME))
+
+    from aggregates import write_aggregates
+    write_aggregates(df, artists, data_dir)
+
+    from archive import write_archive
+    write_archive(records, data_dir)
@@ -0,0 +1,237 @@
+# replay.py
+import argparse
+import atexit
+import json
+import logging
+import os
+import threading
+import zipfile
+from datetime import datetime
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from dates import run_clock
+from http_policy import PermanentHTTPError
+from discovery import feed_discovery
+from horizon import schedule_horizon
+
+INDEX_NAME = 'index.json'
+
+# 記録・再生の設定（コマンドライン引数または環境変数で指定）
+RECORD_ENV = 'SCRAPER_RECORD'
+REPLAY_ENV = 'SCRAPER_REPLAY'
+
+_recorder = None
+_archive = None
+_configured = False
+_lock = threading.Lock()
+
+
+class ReplayMiss(PermanentHTTPError):
+    """アーカイブに記録されていないURLへのリクエスト（再試行しない）"""
+
+
+class ReplayResponse:
+    """アーカイブから復元したレスポンス（パーサーが使う属性のみ）"""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class Recorder:
+    """実行中の全てのレスポンスを1つの圧縮アーカイブ（zip）に記録する
+
+    本文はURLごとに個別のエントリとして保存し、終了時にURLの索引を書き込む。
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+        self._index = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+
+    def record(self, url, response=None, error=None):
+        with self._lock:
+            if self._zip is None:
+                return
+            entry = {}
+            if response is not None:
+                self._count += 1
+                name = f"bodies/{self._count:06d}"
+                self._zip.writestr(name, response.content)
+                entry = {
+                    'body': name,
+                    'status': response.status_code,
+                    'headers': {key: value for key, value in response.headers.items()
+                                if key.lower() in ('content-type', 'retry-after', 'last-modified', 'etag')},
+                }
+            else:
+                entry = {'error': type(error).__name__, 'message': str(error)}
+            # 同じURLを複数回取得した場合は最後の結果を再生する
+            self._index[url] = entry
+
+    def close(self):
+        with self._lock:
+            if self._zip is None:
+                return
+            index = {
+                'recorded_at': self.started_at,
+                'urls': self._index,
+            }
+            self._zip.writestr(INDEX_NAME, json.dumps(index, ensure_ascii=False, indent=2))
+            self._zip.close()
+            self._zip = None
+        logging.getLogger(__name__).info("Recorded %s responses to %s", len(self._index), self.path)
+
+
+class ReplayArchive:
+    """記録したアーカイブからレスポンスを返す（ネットワークには一切接続しない）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'r')
+        index = json.loads(self._zip.read(INDEX_NAME))
+        self.recorded_at = index.get('recorded_at')
+        self._index = index['urls']
+        self._lock = threading.Lock()
+
+    def urls(self):
+        return sorted(self._index)
+
+    def get(self, url):
+        entry = self._index.get(url)
+        if entry is None:
+            raise ReplayMiss(f"{url} is not in replay archive {self.path}")
+        if 'error' in entry:
+            raise requests.ConnectionError(f"Replayed {entry['error']}: {entry['message']}")
+        with self._lock:
+            content = self._zip.read(entry['body'])
+        return ReplayResponse(url, entry['status'], entry['headers'], content)
+
+
+class RecordingSession:
+    """requests.Sessionを包み、取得したレスポンスを記録する"""
+
+    offline = False
+
+    def __init__(self, session, recorder):
+        self._session = session
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def get(self, url, **kwargs):
+        try:
+            response = self._session.get(url, **kwargs)
+        except requests.RequestException as e:
+            self._recorder.record(url, error=e)
+            raise
+        self._recorder.record(url, response=response)
+        return response
+
+
+class ReplaySession:
+    """アーカイブのレスポンスを返すセッション"""
+
+    offline = True  # 再試行の待機を行わない
+
+    def __init__(self, archive):
+        self._archive = archive
+        self.headers = {}
+
+    def get(self, url, **kwargs):
+        return self._archive.get(url)
+
+    def close(self):
+        pass
+
+
+def configure(record=None, replay=None):
+    """記録または再生を有効にする（指定が無ければ環境変数を参照）"""
+    global _recorder, _archive, _configured
+    with _lock:
+        record = record or os.environ.get(RECORD_ENV)
+        replay = replay or os.environ.get(REPLAY_ENV)
+        if record and replay:
+            raise ValueError("record and replay cannot be used together")
+        if record and _recorder is None:
+            _recorder = Recorder(record)
+            atexit.register(_recorder.close)
+        if record or replay:
+            # 記録・再生するリクエストが前回の実行の状態によって変わらないよう、フィードによる変更検出と
+            # 公開範囲の学習は使わない（記録時に公開範囲外として飛ばした月を再生時に要求すると再現できない）
+            feed_discovery.enabled = False
+            schedule_horizon.enabled = False
+        if replay and _archive is None:
+            _archive = ReplayArchive(replay)
+            # 年の補完・対象月も記録時の日付を基準にする
+            if _archive.recorded_at:
+                run_clock.set_reference(datetime.fromisoformat(_archive.recorded_at))
+            logging.getLogger(__name__).info(
+                "Replaying %s recorded at %s", replay, _archive.recorded_at)
+        _configured = True
+
+
+def refuse_recording(mode):
+    """記録は1つのプロセスでのみ行える（複数のプロセスが同じアーカイブに書き込むと壊れる）"""
+    if os.environ.get(RECORD_ENV):
+        raise ValueError(f"{RECORD_ENV} cannot be used with {mode}; record with scraper.py --record instead")
+
+
+def replay_archive():
+    """再生中のアーカイブ（再生していなければNone）"""
+    if not _configured:
+        configure()
+    return _archive
+
+
+def is_active():
+    """記録または再生が有効か"""
+    if not _configured:
+        configure()
+    return _recorder is not None or _archive is not None
+
+
+def wrap_session(session):
+    """記録・再生の設定に応じてセッションを差し替える"""
+    if not _configured:
+        configure()
+    if _archive is not None:
+        return ReplaySession(_archive)
+    if _recorder is not None:
+        return RecordingSession(session, _recorder)
+    return session
+
+
+def finish():
+    """記録中のアーカイブを書き終える"""
+    if _recorder is not None:
+        _recorder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='記録したアーカイブのURL一覧を表示する')
+    parser.add_argument('archive')
+    args = parser.parse_args()
+
+    archive = ReplayArchive(args.archive)
+    print(f"recorded_at: {archive.recorded_at}")
+    for url in archive.urls():
+        print(url)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,146 +1,74 @@
-from dateutil.relativedelta import relativedelta
 import os
 import logging
 import sys
-from datetime import datetime
-import time  # 追加
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import json
 import re
+import argparse
+from datetime import date, timedelta
 sys.path.append(os.path.dirname(__file__))
-from utils import create_event
-
-# logsディレクトリが存在しない場合は作成
-log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-os.makedirs(log_dir, exist_ok=True)
-
-# ログファイルのパスを絶対パスで指定
-log_file = os.path.join(log_dir, 'scraper.log')
-
-# ロギングの設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# 共通のリクエストヘッダー
-COMMON_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3'
-}
+from utils import create_show
+from log_config import SAMPLED, setup_logging
+from sharding import select_venues, shard_name, write_shard
+from checkpoint import Checkpoint, crawl_venue
+from crawl_tasks import DetailLink
+from http_policy import circuit_breaker, latency_tracker
+from fetcher import Fetcher
+from horizon import horizon_tracked, schedule_horizon
+from discovery import feed_discovery
+from parse_cache import cached_parser, parse_cache
+from dates import add_months, run_clock
+from postprocess import DATA_DIR, events_frame, normalize_events, write_outputs
+import replay
 
-REQUEST_TIMEOUT = 10
-MAX_RETRIES = 3
 SCRAPING_MONTHS = 6
 
+# アーティスト名から除去するパターン（毎回コンパイルしないよう事前に用意）
+ARTIST_CLEAN_PATTERNS = [
+    re.compile(r'\([^)]+\)'),          # (文字列)
+    re.compile(r'（[^）]+）'),         # （文字列）
+    re.compile(r'【[^】]+】'),         # 【文字列】
+    re.compile(r'\[[^\]]+\]'),         # [文字列]
+    re.compile(r'［[^］]+］'),         # ［文字列］
+    re.compile(r'feat\.[^　]*'),       # feat.以降
+    re.compile(r'from\s+[^　]*'),      # fromの後の所属グループ名
+]
+
 def clean_artist_name(artist_name, debug=False):
     """アーティスト名から余分な情報を除去する共通関数"""
     if not artist_name:
         return ""
     
-    # デバッグログの制御
+    # デバッグログはロガーのレベルがDEBUGの場合のみ出力（レベルは変更しない）
     logger = logging.getLogger(__name__)
-    if debug:
-        logger.setLevel(logging.DEBUG)
-    else:
-        logger.setLevel(logging.INFO)
+    debug = debug and logger.isEnabledFor(logging.DEBUG)
     
     if debug:
-        logger.debug(f"Cleaning artist name: {artist_name}")
+        logger.debug("Cleaning artist name: %s", artist_name)
     
     name = artist_name.strip()
     
-    patterns = [
-        r'\([^)]+\)',          # (文字列)
-        r'（[^）]+）',         # （文字列）
-        r'【[^】]+】',         # 【文字列】
-        r'\[[^\]]+\]',         # [文字列]
-        r'［[^］]+］',         # ［文字列］
-        r'feat\.[^　]*',       # feat.以降
-        r'from\s+[^　]*',      # fromの後の所属グループ名
-    ]
-    
     # 各パターンを順番に適用
-    for pattern in patterns:
+    for pattern in ARTIST_CLEAN_PATTERNS:
         before = name
-        name = re.sub(pattern, '', name)
+        name = pattern.sub('', name)
         if debug and before != name:
-            logger.debug(f"Removed {pattern}: {before} -> {name}")
+            logger.debug("Removed %s: %s -> %s", pattern.pattern, before, name)
     
     result = name.strip()
     
     if debug:
-        logger.debug(f"Final result: {result}")
+        logger.debug("Final result: %s", result)
         
     return result
 
 def parse_date(date_text, format_type='default'):
-    """日付文字列を解析して標準形式（YYYY/MM/DD）に変換する共通関数
-    
-    format_type:
-        'default': 標準的な日付形式（2025/02/01）
-        'dot': ドット区切り（2.1や2025.2.1）
-        'slash_short': スラッシュ区切り（2/1）
-        'mixed': 混合フォーマット
-    """
-    try:
-        current_date = datetime.now()
-        
-        if format_type == 'dot':
-            # 2.1 や 2025.2.1 形式
-            parts = date_text.split('.')
-            if len(parts) == 2:
-                month, day = map(int, parts)
-                year = current_date.year
-            elif len(parts) == 3:
-                year, month, day = map(int, parts)
-            else:
-                raise ValueError(f"Invalid dot format: {date_text}")
-                
-        elif format_type == 'slash_short':
-            # 2/1 形式
-            month, day = map(int, date_text.split('/'))
-            year = current_date.year
-            
-        elif format_type == 'mixed':
-            # 正規表現で数字を抽出
-            numbers = re.findall(r'\d+', date_text)
-            if len(numbers) < 2:
-                raise ValueError(f"Not enough numbers in date: {date_text}")
-            
-            if len(numbers) == 2:
-                month, day = map(int, numbers)
-                year = current_date.year
-            else:
-                year = int(numbers[0])
-                month = int(numbers[1])
-                day = int(numbers[2])
-                
-        else:  # default
-            year, month, day = map(int, date_text.split('/'))
-        
-        # 年の調整（月が現在より小さい場合は来年）
-        if len(str(year)) == 2:
-            year += 2000
-        
-        if month < current_date.month and year == current_date.year:
-            year += 1
-            
-        # 日付の妥当性チェック
-        datetime(year, month, day)
-        
-        return f"{year}/{month:02d}/{day:02d}"
-        
-    except Exception as e:
-        logging.debug(f"Date parsing failed for {date_text}: {str(e)}")
-        raise ValueError(f"Invalid date format: {date_text}")
+    """日付文字列を解析して標準形式（YYYY/MM/DD）に変換する共通関数（実行単位の基準日で年を補完）"""
+    return run_clock.normalize(date_text, format_type)
+
+
+def make_soup(html):
+    """HTMLを解析する共通関数（bs4は最初に解析するときに読み込む）"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser')
 
 
 def get_venue_name(base_url):
@@ -158,458 +86,383 @@ def get_venue_name(base_url):
             return name
     return "Unknown Venue"
 
-def scrape_fireloop(url):
-    """寺田町Fireloopのスクレイピング"""
+def scrape_fireloop(fetcher, url):
+    """寺田町Fireloopのスクレイピング
+
+    取得に失敗した場合は例外を送出する（空のリストを返すと、タスクの実行やチェックポイントで
+    成功したとみなされてしまうため）。
+    """
     logger = logging.getLogger(__name__)
     logger.info("=== Fireloop Scraping Start ===")
+
+    response = fetcher.get(url)
+    events = parse_fireloop(response.text, url)
+    logger.info("Total events found: %s", len(events))
+    return events
+
+@cached_parser(version=1)
+def parse_fireloop(html, url):
+    """寺田町Fireloopのスケジュールページを解析"""
+    logger = logging.getLogger(__name__)
     events = []
+    soup = make_soup(html)
 
-    try:
-        session = init_session()
-        response = make_request(session, url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    schedule_divs = soup.find_all('div', class_='pager')
+    logger.info("Found %s schedule days", len(schedule_divs))
+
+    for schedule_div in schedule_divs:
+        try:
+            event_div = schedule_div.find('div', class_='half-page left')
+            if not event_div:
+                continue
+
+            # 日付の取得と解析
+            date_id = event_div.get('id', '')
+            date_elem = event_div.find('h2', class_='datef')
+            weekday_elem = date_elem.find('div', class_='weekday') if date_elem else None
 
-        schedule_divs = soup.find_all('div', class_='pager')
-        logger.info(f"Found {len(schedule_divs)} schedule days")
+            if not (date_id and date_elem):
+                continue
 
-        for schedule_div in schedule_divs:
             try:
-                event_div = schedule_div.find('div', class_='half-page left')
-                if not event_div:
-                    continue
+                month = date_id[:2]
+                day = date_id[2:]
+                date = parse_date(f"{month}/{day}", format_type='slash_short')
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                # 日付の取得と解析
-                date_id = event_div.get('id', '')
-                date_elem = event_div.find('h2', class_='datef')
-                weekday_elem = date_elem.find('div', class_='weekday') if date_elem else None
-                
-                if not (date_id and date_elem):
-                    continue
+            weekday_map = {'MON': '月', 'TUE': '火', 'WED': '水', 
+                        'THU': '木', 'FRI': '金', 'SAT': '土', 'SUN': '日'}
+            day_en = weekday_elem.text.strip() if weekday_elem else ''
+            day_jp = weekday_map.get(day_en, '')
 
-                try:
-                    month = date_id[:2]
-                    day = date_id[2:]
-                    date = parse_date(f"{month}/{day}", format_type='slash_short')
-                except ValueError as e:
-                    logger.debug(f"Date parsing failed: {str(e)}")
-                    continue
+            # イベント情報の取得
+            title_elem = event_div.find('div', class_='title')
+            title = title_elem.text.strip() if title_elem else ''
 
-                weekday_map = {'MON': '月', 'TUE': '火', 'WED': '水', 
-                            'THU': '木', 'FRI': '金', 'SAT': '土', 'SUN': '日'}
-                day_en = weekday_elem.text.strip() if weekday_elem else ''
-                day_jp = weekday_map.get(day_en, '')
+            cast_elem = event_div.find('div', class_='cast')
+            if not cast_elem:
+                continue
 
-                # イベント情報の取得
-                title_elem = event_div.find('div', class_='title')
-                title = title_elem.text.strip() if title_elem else ''
+            artists = [clean_artist_name(artist.strip(), debug=False) 
+                      for artist in cast_elem.stripped_strings]
+            artists = [a for a in artists if a]  # 空の要素を除去
 
-                cast_elem = event_div.find('div', class_='cast')
-                if not cast_elem:
-                    continue
+            # 公演区分の取得
+            date_text = date_elem.text.strip() if date_elem else ''
+            note = '昼公演' if '昼公演' in date_text else ''
+            if not note and '夜公演' in date_text:
+                note = '夜公演'
 
-                artists = [clean_artist_name(artist.strip(), debug=False) 
-                          for artist in cast_elem.stripped_strings]
-                artists = [a for a in artists if a]  # 空の要素を除去
-
-                # 公演区分の取得
-                date_text = date_elem.text.strip() if date_elem else ''
-                note = '昼公演' if '昼公演' in date_text else ''
-                if not note and '夜公演' in date_text:
-                    note = '夜公演'
-
-                # イベントの作成
-                for artist in artists:
-                    event = create_event(
-                        date=date,
-                        day_jp=day_jp,
-                        artist=artist,
-                        title=title,
-                        url=f"{url}#{date_id}",
-                        venue='寺田町Fireloop',
-                        note=''
-                    )
-                    events.append(event)
-                    logger.debug(f"Created event: {event}")
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=day_jp,
+                title=title,
+                url=f"{url}#{date_id}",
+                venue='寺田町Fireloop',
+                note=''
+            )
+            for artist in artists:
+                event = show.event(artist)
+                events.append(event)
+                logger.debug("Created event: %s", event, extra=SAMPLED)
 
-            except Exception as e:
-                logger.error(f"Error parsing schedule div: {str(e)}", exc_info=True)
-                continue
+        except Exception as e:
+            logger.error("Error parsing schedule div: %s", e, exc_info=True)
+            continue
 
-        logger.info(f"Total events found: {len(events)}")
-        return events
+    return events
 
-    except Exception as e:
-        logger.error(f"Error scraping Fireloop: {str(e)}", exc_info=True)
-        return []
+def scrape_paradice(fetcher, url):
+    """扇町para-diceのスクレイピング
 
-def scrape_paradice(url):
-    """扇町para-diceのスクレイピング"""
+    取得に失敗した場合は例外を送出する（空のリストを返すと、タスクの実行やチェックポイントで
+    成功したとみなされてしまうため）。
+    """
     logger = logging.getLogger(__name__)
     logger.info("=== Para-dice Scraping Start ===")
+
+    response = fetcher.get(url)
+    events = parse_paradice(response.text, url)
+    logger.info("Total events found: %s", len(events))
+    return events
+
+@cached_parser(version=1)
+def parse_paradice(html, url):
+    """扇町para-diceのスケジュールページを解析"""
+    logger = logging.getLogger(__name__)
     events = []
+    soup = make_soup(html)
+
+    schedule_rows = soup.find_all('tr')
+    logger.info("Found %s schedule rows", len(schedule_rows))
+
+    # 除外するパターン
+    exclude_patterns = [
+        r'^■',          # ■から始まる行
+        r'前売',
+        r'当日',
+        r'OPEN',
+        r'START',
+        r'\d+円',       # 料金表示
+        r'^\d+:\d+$',   # 時間のみの表示
+        r'問い合わせ',
+        r'チケット',
+    ]
+    exclude_regex = re.compile('|'.join(exclude_patterns))
+
+    for row in schedule_rows:
+        try:
+            date_th = row.find('th')
+            if not date_th or not date_th.find_all('p'):
+                continue
+
+            # 日付と曜日の取得
+            date_text = date_th.find_all('p')[0].text.strip()
+            weekday_text = date_th.find_all('p')[1].text.strip()
 
-    try:
-        session = init_session()
-        response = make_request(session, url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        schedule_rows = soup.find_all('tr')
-        logger.info(f"Found {len(schedule_rows)} schedule rows")
-
-        # 除外するパターン
-        exclude_patterns = [
-            r'^■',          # ■から始まる行
-            r'前売',
-            r'当日',
-            r'OPEN',
-            r'START',
-            r'\d+円',       # 料金表示
-            r'^\d+:\d+$',   # 時間のみの表示
-            r'問い合わせ',
-            r'チケット',
-        ]
-        exclude_regex = re.compile('|'.join(exclude_patterns))
-
-        for row in schedule_rows:
             try:
-                date_th = row.find('th')
-                if not date_th or not date_th.find_all('p'):
-                    continue
+                # 日付の解析
+                date = parse_date(date_text, format_type='slash_short')
+                day_jp = weekday_text.strip('()')
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                # 日付と曜日の取得
-                date_text = date_th.find_all('p')[0].text.strip()
-                weekday_text = date_th.find_all('p')[1].text.strip()
+            event_td = row.find('td')
+            if not event_td:
+                continue
 
-                try:
-                    # 日付の解析
-                    date = parse_date(date_text, format_type='slash_short')
-                    day_jp = weekday_text.strip('()')
-                except ValueError as e:
-                    logger.debug(f"Date parsing failed: {str(e)}")
+            # タイトルの取得
+            title_elem = event_td.find('strong')
+            title = title_elem.text.strip() if title_elem else ""
+
+            # アーティスト情報の取得と処理
+            artist_elements = event_td.find_all('p')
+            artists_found = False
+            show = create_show(
+                date=date,
+                day_jp=day_jp,
+                title=title,
+                url=url,
+                venue='扇町para-dice',
+                note=''
+            )
+
+            for elem in artist_elements:
+                text = elem.text.strip()
+
+                if exclude_regex.search(text):
                     continue
 
-                event_td = row.find('td')
-                if not event_td:
-                    continue
+                # 各パターンでアーティスト名を抽出
+                patterns = [
+                    (r'\d{2}:\d{2} 〜 \d{2}:\d{2} (.+)', 1),  # 時間パターン
+                    (r'出演：(.+)', 1),                        # 出演者パターン
+                ]
+
+                artist_names = []
+                for pattern, group in patterns:
+                    match = re.match(pattern, text)
+                    if match:
+                        artist_names.append(match.group(group))
+                        break
+
+                if '/' in text and not artist_names:
+                    artist_names.extend(text.split('/'))
+                elif not artist_names and not exclude_regex.search(text):
+                    artist_names.append(text)
+
+                # アーティスト名の処理とイベント作成
+                for artist_name in artist_names:
+                    artist = clean_artist_name(artist_name.strip(), debug=False)
+                    if artist:
+                        event = show.event(artist)
+                        events.append(event)
+                        artists_found = True
+                        logger.debug("Created event: %s", event, extra=SAMPLED)
+
+            if not artists_found:
+                logger.debug("No artists found in row with date %s", date)
 
-                # タイトルの取得
-                title_elem = event_td.find('strong')
-                title = title_elem.text.strip() if title_elem else ""
+        except Exception as e:
+            logger.error("Error parsing schedule row: %s", e, exc_info=True)
+            continue
 
-                # アーティスト情報の取得と処理
-                artist_elements = event_td.find_all('p')
-                artists_found = False
-                
-                for elem in artist_elements:
-                    text = elem.text.strip()
-                    
-                    if exclude_regex.search(text):
-                        continue
+    return events
 
-                    # 各パターンでアーティスト名を抽出
-                    patterns = [
-                        (r'\d{2}:\d{2} 〜 \d{2}:\d{2} (.+)', 1),  # 時間パターン
-                        (r'出演：(.+)', 1),                        # 出演者パターン
-                    ]
-
-                    artist_names = []
-                    for pattern, group in patterns:
-                        match = re.match(pattern, text)
-                        if match:
-                            artist_names.append(match.group(group))
-                            break
-                    
-                    if '/' in text and not artist_names:
-                        artist_names.extend(text.split('/'))
-                    elif not artist_names and not exclude_regex.search(text):
-                        artist_names.append(text)
-
-                    # アーティスト名の処理とイベント作成
-                    for artist_name in artist_names:
-                        artist = clean_artist_name(artist_name.strip(), debug=False)
-                        if artist:
-                            event = create_event(
-                                date=date,
-                                day_jp=day_jp,
-                                artist=artist,
-                                title=title,
-                                url=url,
-                                venue='扇町para-dice',
-                                note=''
-                            )
-                            events.append(event)
-                            artists_found = True
-                            logger.debug(f"Created event: {event}")
 
-                if not artists_found:
-                    logger.debug(f"No artists found in row with date {date}")
+def get_next_n_months(n: int = SCRAPING_MONTHS):
+    """今月から指定月数分の年月を生成する共通関数"""
+    year, month = run_clock.current_month()
+    return [add_months(year, month, i) for i in range(n)]
 
-            except Exception as e:
-                logger.error(f"Error parsing schedule row: {str(e)}", exc_info=True)
-                continue
 
-        logger.info(f"Total events found: {len(events)}")
-        return events
+def get_month_offset(year, month):
+    """今月から指定した年月までの月数を返す"""
+    current = run_clock.reference
+    return (year - current.year) * 12 + (month - current.month)
 
-    except Exception as e:
-        logger.error(f"Error scraping Para-dice: {str(e)}", exc_info=True)
-        return []
 
+def get_date_window(n: int = SCRAPING_MONTHS):
+    """収集対象の期間（基準日から、指定月数後の月の末日まで）を YYYY/MM/DD 形式の (開始, 終了) で返す"""
+    year, month = add_months(*run_clock.current_month(), n)
+    last_day = date(year, month, 1) - timedelta(days=1)
+    return run_clock.reference.strftime('%Y/%m/%d'), last_day.strftime('%Y/%m/%d')
 
-def parse_date(date_text, format_type='default'):
-    """日付文字列を解析して標準形式（YYYY/MM/DD）に変換する共通関数
-    
-    format_type:
-        'default': 標準的な日付形式（2025/02/01）
-        'dot': ドット区切り（2.1や2025.2.1）
-        'slash_short': スラッシュ区切り（2/1）
-        'mixed': 混合フォーマット
-    """
-    try:
-        current_date = datetime.now()
-        
-        if format_type == 'dot':
-            # 2.1 や 2025.2.1 形式
-            parts = date_text.split('.')
-            if len(parts) == 2:
-                month, day = map(int, parts)
-                year = current_date.year
-            elif len(parts) == 3:
-                year, month, day = map(int, parts)
-            else:
-                raise ValueError(f"Invalid dot format: {date_text}")
-                
-        elif format_type == 'slash_short':
-            # 2/1 形式
-            month, day = map(int, date_text.split('/'))
-            year = current_date.year
-            
-        elif format_type == 'mixed':
-            # 正規表現で数字を抽出
-            numbers = re.findall(r'\d+', date_text)
-            if len(numbers) < 2:
-                raise ValueError(f"Not enough numbers in date: {date_text}")
-            
-            if len(numbers) == 2:
-                month, day = map(int, numbers)
-                year = current_date.year
-            else:
-                year = int(numbers[0])
-                month = int(numbers[1])
-                day = int(numbers[2])
-                
-        else:  # default
-            year, month, day = map(int, date_text.split('/'))
-        
-        # 年の調整（月が現在より小さい場合は来年）
-        if len(str(year)) == 2:
-            year += 2000
-        
-        if month < current_date.month and year == current_date.year:
-            year += 1
-            
-        # 日付の妥当性チェック
-        datetime(year, month, day)
-        
-        return f"{year}/{month:02d}/{day:02d}"
-        
-    except Exception as e:
-        logging.debug(f"Date parsing failed for {date_text}: {str(e)}")
-        raise ValueError(f"Invalid date format: {date_text}")
 
+# 一覧ページのリンクやURLに含まれる日付（2025.02.01、2025/2/1、2025-02-01、2025年2月1日、20250201）
+LINK_DATE_PATTERN = re.compile(r'(20\d{2})(?:[./\-年](\d{1,2})[./\-月](\d{1,2})|(\d{2})(\d{2})(?!\d))')
 
-def make_request(session, url, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES):
-    """HTTPリクエストを実行する共通関数（リトライ機能付き）"""
-    logger = logging.getLogger(__name__)
-    
-    for attempt in range(max_retries):
-        try:
-            response = session.get(url, timeout=timeout)
-            response.encoding = 'utf-8'
-            
-            if response.status_code == 200:
-                return response
-                
-            logger.warning(f"Attempt {attempt + 1}/{max_retries}: Status code {response.status_code} for {url}")
-            
-        except requests.RequestException as e:
-            if attempt == max_retries - 1:
-                logger.error(f"Failed all {max_retries} attempts to fetch {url}: {str(e)}")
-                raise
-            logger.warning(f"Attempt {attempt + 1}/{max_retries} failed: {str(e)}")
-            
-        # 再試行前に少し待機（1秒、2秒、4秒...）
-        time.sleep(2 ** attempt)
-    
-    raise requests.RequestException(f"Failed to fetch {url} after {max_retries} attempts")
 
-def init_session():
-    """セッションを初期化する共通関数"""
-    session = requests.Session()
-    session.headers.update(COMMON_HEADERS)
-    return session
+def date_from_text(text):
+    """リンクの文字列やURLから公演日を安価に取り出す（見つからない・不正な日付の場合はNone）"""
+    match = LINK_DATE_PATTERN.search(text or '')
+    if not match:
+        return None
+    year, month, day = match.group(1), match.group(2) or match.group(4), match.group(3) or match.group(5)
+    try:
+        return parse_date(f"{year}/{month}/{day}")
+    except ValueError:
+        return None
 
-    
-def get_next_n_months(n: int = SCRAPING_MONTHS):
-    """今月から指定月数分の年月を生成する共通関数"""
-    current = datetime.now()
-    months = []
-    for i in range(n):
-        next_date = current.replace(day=1) + relativedelta(months=i)
-        months.append((next_date.year, next_date.month))
-    return months
+
+def links_in_window(links, label=''):
+    """公演日が収集対象の期間外の詳細ページを除き、URLのリストを返す（公演日が不明なものは残す）
+
+    links は URL または DetailLink のリスト。
+    """
+    start, end = get_date_window()
+    urls = []
+    skipped = 0
+    for link in links:
+        url, show_date = (link, None) if isinstance(link, str) else link
+        if show_date is not None and not start <= show_date <= end:
+            skipped += 1
+            continue
+        urls.append(url)
+    if skipped:
+        logging.getLogger(__name__).info(
+            "Skipped %s detail pages of %s outside %s - %s", skipped, label, start, end)
+    return urls
 
 
 def get_weekday_jp(date_str):
     """日付文字列から日本語の曜日を取得する共通関数"""
-    date = datetime.strptime(date_str, '%Y/%m/%d')
-    weekday_map = {
-        0: '月', 1: '火', 2: '水', 3: '木',
-        4: '金', 5: '土', 6: '日'
-    }
-    return weekday_map[date.weekday()]
+    return run_clock.weekday_jp(date_str)
 
 
-def scrape_vijon_system(base_url):
+def scrape_vijon_system(fetcher, base_url):
     """vijon系列のライブハウスのスクレイピング"""
     logger = logging.getLogger(__name__)
     venue_name = get_venue_name(base_url)
-    logger.info(f"=== {venue_name} ({base_url}) Scraping Start ===")
+    logger.info("=== %s (%s) Scraping Start ===", venue_name, base_url)
     events = []
 
     try:
-        session = init_session()
-        
         # 6ヶ月分のスケジュールを取得
         for year, month in get_next_n_months():
-            calendar_url = f"{base_url}/schedule/calendar/{year}/{month:02d}/"
-            logger.info(f"Scraping calendar: {calendar_url}")
-            
             try:
-                response = make_request(session, calendar_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # イベントリンクを取得
-                event_links = soup.select('a[href*="/schedule/detail/"]')
-                logger.info(f"Found {len(event_links)} events in {year}/{month:02d}")
-                
-                for link in event_links:
-                    try:
-                        detail_url = link.get('href')
-                        if not detail_url.startswith('http'):
-                            domain = base_url.split('://')[1]
-                            detail_url = f"https://{domain}{detail_url}"
-                            
-                        detail_events = scrape_vijon_detail(session, detail_url, venue_name)
-                        events.extend(detail_events)
-                        
-                    except Exception as e:
-                        logger.error(f"Error scraping detail page {detail_url}: {str(e)}", exc_info=True)
-                        continue
-                        
+                detail_urls = get_vijon_detail_urls(fetcher, base_url, year, month)
             except Exception as e:
-                logger.error(f"Error scraping calendar page {calendar_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping calendar page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
                 
-        logger.info(f"Total events found: {len(events)}")
+            for detail_url in links_in_window(detail_urls, venue_name):
+                try:
+                    detail_events = scrape_vijon_detail(fetcher, detail_url, venue_name)
+                    events.extend(detail_events)
+                    
+                except Exception as e:
+                    logger.error("Error scraping detail page %s: %s", detail_url, e, exc_info=True)
+                    continue
+                
+        logger.info("Total events found: %s", len(events))
         return events
         
     except Exception as e:
-        logger.error(f"Error scraping {venue_name}: {str(e)}", exc_info=True)
+        logger.error("Error scraping %s: %s", venue_name, e, exc_info=True)
         return []
 
-def scrape_vijon_detail(session, detail_url, venue_name):
-    """vijon系列の詳細ページから情報を取得"""
+@horizon_tracked
+def get_vijon_detail_urls(fetcher, base_url, year, month):
+    """vijon系列のカレンダーページから詳細ページのURLと公演日（リンクのある日付の枠の日）を取得"""
     logger = logging.getLogger(__name__)
-    events = []
+    calendar_url = f"{base_url}/schedule/calendar/{year}/{month:02d}/"
+    logger.info("Scraping calendar: %s", calendar_url)
     
-    try:
-        response = make_request(session, detail_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 日付情報の取得
-        date_elem = soup.select_one('p.day')
-        if not date_elem:
-            logger.debug(f"No date information found at {detail_url}")
-            return events
-
-        date_text = date_elem.text.strip()
-        try:
-            # 日付とフォーマットの解析
-            date_match = re.search(r'(\d{4})\.(\d{1,2})\.(\d{2})', date_text)
-            weekday_match = re.search(r'\((.*?)\)', date_text)
-            
-            if not date_match:
-                logger.debug(f"Invalid date format: {date_text}")
-                return events
+    response = fetcher.get(calendar_url)
+    soup = make_soup(response.text)
+    
+    # イベントリンクを取得
+    event_links = soup.select('a[href*="/schedule/detail/"]')
+    logger.info("Found %s events in %s/%02d", len(event_links), year, month)
+    
+    detail_urls = []
+    for link in event_links:
+        detail_url = link.get('href')
+        if not detail_url.startswith('http'):
+            domain = base_url.split('://')[1]
+            detail_url = f"https://{domain}{detail_url}"
+        detail_urls.append(DetailLink(detail_url, _calendar_cell_date(link, year, month)))
+    return detail_urls
 
-            date = parse_date(f"{date_match.group(1)}/{date_match.group(2)}/{date_match.group(3)}")
-            
-            # 曜日の変換
-            weekday_map = {
-                'Sun': '日', 'Mon': '月', 'Tue': '火', 
-                'Wed': '水', 'Thu': '木', 'Fri': '金', 'Sat': '土'
-            }
-            day_jp = weekday_map.get(weekday_match.group(1), '') if weekday_match else ''
-            
-            # タイトルとアーティスト情報の取得
-            title_elem = soup.select_one('div.scheduleCnt h1')
-            title = title_elem.text.strip() if title_elem else ''
-            
-            artists_elem = soup.select_one('span.artist')
-            if not artists_elem:
-                logger.debug(f"No artist information found at {detail_url}")
-                return events
+# カレンダーの日付の要素の内容（日の数字だけ。曜日の括弧書きは付いていてもよい）
+CALENDAR_DAY_PATTERN = re.compile(r'(\d{1,2})\s*(?:[(（][^)）]{1,4}[)）])?')
 
-            # アーティスト名の処理
-            artists = [clean_artist_name(artist.strip(), debug=False) 
-                      for artist in artists_elem.text.split('/')]
-            artists = [artist for artist in artists if artist]  # 空の要素を除去
-            
-            # イベントの作成
-            for artist in artists:
-                event = create_event(
-                    date=date,
-                    day_jp=day_jp,
-                    artist=artist,
-                    venue=venue_name,
-                    title=title,
-                    url=detail_url
-                )
-                events.append(event)
-                logger.debug(f"Created event: {event}")
 
-        except ValueError as e:
-            logger.debug(f"Date parsing error at {detail_url}: {str(e)}")
-            return events
-    
-    except Exception as e:
-        logger.error(f"Error processing detail page {detail_url}: {str(e)}", exc_info=True)
-        return events
-        
-    return events
+def _calendar_cell_date(link, year, month):
+    """カレンダーのリンクを含む日付の枠の、日付の要素から公演日を求める（確実に分からない場合はNone）
 
-def scrape_vijon_detail(session, detail_url, venue_name):
-    """vijon系列の詳細ページから情報を取得"""
+    リンクの外にある文字列のうち、内容が日の数字だけのものを日付の要素とみなす。
+    タイトルや開演時刻の数字（"2MANY"、"18:00" など）を日と取り違えないよう、
+    候補が無い・複数の日に分かれる場合はNoneを返す（詳細ページは取得する）。
+    """
+    cell = link.find_parent(['td', 'li'])
+    if cell is None:
+        return None
+    days = set()
+    for text in cell.find_all(string=True):
+        if text.find_parent('a') is not None:
+            continue
+        match = CALENDAR_DAY_PATTERN.fullmatch(text.strip())
+        if match:
+            days.add(match.group(1))
+    if len(days) != 1:
+        return None
+    try:
+        return parse_date(f"{year}/{month}/{days.pop()}")
+    except ValueError:
+        return None
+
+def scrape_vijon_detail(fetcher, detail_url, venue_name):
+    """vijon系列の詳細ページから情報を取得（取得に失敗した場合は例外を送出）"""
+    response = fetcher.get(detail_url)
+    return parse_vijon_detail(response.text, detail_url, venue_name)
+
+@cached_parser(version=1)
+def parse_vijon_detail(html, detail_url, venue_name):
+    """vijon系列の詳細ページを解析"""
     logger = logging.getLogger(__name__)
     events = []
-    
+
     try:
-        response = make_request(session, detail_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
+        soup = make_soup(html)
+
         # 日付情報の取得と解析
         date_elem = soup.select_one('p.day')
         if not date_elem:
-            logger.debug(f"No date information found at {detail_url}")
+            logger.debug("No date information found at %s", detail_url)
             return events
 
         date_text = date_elem.text.strip()
         date_match = re.search(r'(\d{4})\.(\d{1,2})\.(\d{2})', date_text)
         weekday_match = re.search(r'\((.*?)\)', date_text)
-        
+
         if not date_match:
-            logger.debug(f"Invalid date format: {date_text}")
+            logger.debug("Invalid date format: %s", date_text)
             return events
 
         # 日付と曜日の解析
@@ -619,61 +472,59 @@ def scrape_vijon_detail(session, detail_url, venue_name):
             'Wed': '水', 'Thu': '木', 'Fri': '金', 'Sat': '土'
         }
         day_jp = weekday_map.get(weekday_match.group(1), '') if weekday_match else ''
-        
+
         # タイトルとアーティスト情報の取得
         title_elem = soup.select_one('div.scheduleCnt h1')
         title = title_elem.text.strip() if title_elem else ''
-        
+
         artists_elem = soup.select_one('span.artist')
         if not artists_elem:
-            logger.debug(f"No artist information found at {detail_url}")
+            logger.debug("No artist information found at %s", detail_url)
             return events
 
         # アーティスト名の処理
+        show = create_show(
+            date=date,
+            day_jp=day_jp,
+            title=title,
+            url=detail_url,
+            venue=venue_name,
+            note=''
+        )
         for artist_name in artists_elem.text.split('/'):
             artist = clean_artist_name(artist_name.strip(), debug=False)
             if artist:
-                event = create_event(
-                    date=date,
-                    day_jp=day_jp,
-                    artist=artist,
-                    venue=venue_name,
-                    title=title,
-                    url=detail_url,
-                    note=''
-                )
+                event = show.event(artist)
                 events.append(event)
-                logger.debug(f"Created event: {event}")
-    
+                logger.debug("Created event: %s", event, extra=SAMPLED)
+
     except Exception as e:
-        logger.error(f"Error processing detail page {detail_url}: {str(e)}", exc_info=True)
-        
+        logger.error("Error processing detail page %s: %s", detail_url, e, exc_info=True)
+
     return events
     
-
-def scrape_bigcat(base_url):
+def scrape_bigcat(fetcher, base_url):
     """BIGCATのスケジュールをスクレイピング"""
     logger = logging.getLogger(__name__)
     logger.info("=== BIGCAT Scraping Start ===")
     events = []
 
     try:
-        session = init_session()
-        current = datetime.now()
+        current = run_clock.reference
         
         # 現在の月と次の月のスケジュールを取得
         for month_offset in range(2):  # BIGCATは2ヶ月分のみ
-            target_date = current.replace(day=1) + relativedelta(months=month_offset)
-            schedule_url = f"{base_url}/{target_date.year}/{target_date.month}"
-            logger.info(f"Scraping schedule: {schedule_url}")
+            target_year, target_month = add_months(current.year, current.month, month_offset)
+            schedule_url = f"{base_url}/{target_year}/{target_month}"
+            logger.info("Scraping schedule: %s", schedule_url)
 
             try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                response = fetcher.get(schedule_url)
+                soup = make_soup(response.text)
 
                 # イベントの取得
                 schedule_items = soup.select('div.archive_block')
-                logger.info(f"Found {len(schedule_items)} events")
+                logger.info("Found %s events", len(schedule_items))
                 
                 for item in schedule_items:
                     try:
@@ -686,7 +537,7 @@ def scrape_bigcat(base_url):
                         try:
                             date = parse_date(date_elem.text.strip(), format_type='dot')
                         except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
+                            logger.debug("Date parsing failed: %s", e)
                             continue
                         
                         # 曜日の取得
@@ -722,760 +573,890 @@ def scrape_bigcat(base_url):
                                         artists.append(artist)
 
                         # イベントの作成
+                        show = create_show(
+                            date=date,
+                            day_jp=day_jp,
+                            title=title,
+                            url=schedule_url,
+                            venue='BIGCAT',
+                            note=''
+                        )
                         for artist in artists:
-                            event = create_event(
-                                date=date,
-                                day_jp=day_jp,
-                                artist=artist,
-                                title=title,
-                                url=schedule_url,
-                                venue='BIGCAT',
-                                note=''
-                            )
+                            event = show.event(artist)
                             events.append(event)
-                            logger.debug(f"Created event: {event}")
+                            logger.debug("Created event: %s", event, extra=SAMPLED)
 
                     except Exception as e:
-                        logger.error(f"Error parsing event item: {str(e)}", exc_info=True)
+                        logger.error("Error parsing event item: %s", e, exc_info=True)
                         continue
 
             except Exception as e:
-                logger.error(f"Error scraping month page {schedule_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping month page %s: %s", schedule_url, e, exc_info=True)
                 continue
 
-        logger.info(f"Total events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping BIGCAT: {str(e)}", exc_info=True)
+        logger.error("Error scraping BIGCAT: %s", e, exc_info=True)
         return []
     
 
 
-def scrape_quattro(base_url):
+def scrape_quattro(fetcher, base_url):
     """梅田QUATTROのスケジュールをスクレイピング"""
     logger = logging.getLogger(__name__)
     logger.info("=== QUATTRO Scraping Start ===")
     events = []
     
     try:
-        session = init_session()
-        
         # 6ヶ月分のスケジュールを取得
         for year, month in get_next_n_months():
-            schedule_url = f"{base_url}/schedule/?ym={year}{month:02d}"
-            logger.info(f"Scraping schedule: {schedule_url}")
-
             try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                # schedule-boxクラスを持つdivを全て取得
-                schedule_items = soup.select('div.schedule-box')
-                logger.info(f"Found {len(schedule_items)} schedule items")
-                
-                for item_idx, item in enumerate(schedule_items, 1):
-                    try:
-                        # 日付の取得
-                        date_div = item.select_one('.event-date')
-                        if not date_div:
-                            continue
-                            
-                        date_text = date_div.select_one('.date').text.strip()
-                        
-                        # イベント日付の取得（クラス名から）
-                        date_class = date_div.get('class', [])
-                        date_info = next((c for c in date_class if c.startswith('date')), '')
-                        
-                        try:
-                            if date_info:
-                                full_date_match = re.search(r'date(\d{4})-(\d{2})-(\d{2})', date_info)
-                                if full_date_match:
-                                    year = int(full_date_match.group(1))
-                                    month = int(full_date_match.group(2))
-                                    day = int(date_text)
-                                    date = f"{year}/{month:02d}/{day:02d}"
-                                else:
-                                    continue
-                            else:
-                                continue
-                        except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
-                            continue
-                        
-                        # イベント情報の取得
-                        title_elem = item.select_one('.event-ttl')
-                        if not title_elem:
-                            continue
-
-                        # アーティスト情報の解析
-                        artists = []
-                        artist_lines = title_elem.text.strip().split('\n')
-                        
-                        for line in artist_lines:
-                            # 不要な文字列を削除
-                            line = re.sub(r'＜NEW＞|O\.A\s+', '', line)
-                            
-                            # スラッシュで区切られたアーティスト
-                            for artist_name in line.split('/'):
-                                artist = clean_artist_name(artist_name.strip(), debug=False)
-                                if artist:
-                                    artists.append(artist)
-
-                        # イベントの作成
-                        for artist in artists:
-                            event = create_event(
-                                date=date,
-                                day_jp=get_weekday_jp(date),
-                                artist=artist,
-                                title=title_elem.text.strip(),
-                                url=f"{base_url}{item.select_one('a')['href'][1:]}",
-                                venue='梅田QUATTRO',
-                                note=''
-                            )
-                            events.append(event)
-                            logger.debug(f"Created event: {event}")
-
-                    except Exception as e:
-                        logger.error(f"Error parsing item {item_idx}: {str(e)}", exc_info=True)
-                        continue
-
+                events.extend(scrape_quattro_month(fetcher, base_url, year, month))
             except Exception as e:
-                logger.error(f"Error scraping month page {schedule_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping month page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
 
-        logger.info(f"Total events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping QUATTRO: {str(e)}", exc_info=True)
+        logger.error("Error scraping QUATTRO: %s", e, exc_info=True)
         return []
-    
 
+@horizon_tracked
+def scrape_quattro_month(fetcher, base_url, year, month):
+    """梅田QUATTROの1ヶ月分のスケジュールを取得"""
+    logger = logging.getLogger(__name__)
 
-def scrape_rocktown(base_url):
-    """あべのROCKTOWNのスケジュールをスクレイピング"""
+    schedule_url = f"{base_url}/schedule/?ym={year}{month:02d}"
+    logger.info("Scraping schedule: %s", schedule_url)
+
+    response = fetcher.get(schedule_url)
+    return parse_quattro(response.text, base_url)
+
+@cached_parser(version=1)
+def parse_quattro(html, base_url):
+    """梅田QUATTROの月別スケジュールページを解析"""
     logger = logging.getLogger(__name__)
-    logger.info("=== ROCKTOWN Scraping Start ===")
     events = []
+    soup = make_soup(html)
 
-    try:
-        session = init_session()
-        
-        # 6ヶ月分のスケジュールを取得
-        for year, month in get_next_n_months():
-            # URLの生成（当月はindex.html、それ以外は年月.html）
-            current = datetime.now()
-            if year == current.year and month == current.month:
-                schedule_url = f"{base_url}/schedule/index.html"
-            else:
-                schedule_url = f"{base_url}/schedule/{year}{month:02d}.html"
+    # schedule-boxクラスを持つdivを全て取得
+    schedule_items = soup.select('div.schedule-box')
+    logger.info("Found %s schedule items", len(schedule_items))
 
-            logger.info(f"Scraping schedule: {schedule_url}")
+    for item_idx, item in enumerate(schedule_items, 1):
+        try:
+            # 日付の取得
+            date_div = item.select_one('.event-date')
+            if not date_div:
+                continue
+
+            date_text = date_div.select_one('.date').text.strip()
+
+            # イベント日付の取得（クラス名から）
+            date_class = date_div.get('class', [])
+            date_info = next((c for c in date_class if c.startswith('date')), '')
 
             try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                if date_info:
+                    full_date_match = re.search(r'date(\d{4})-(\d{2})-(\d{2})', date_info)
+                    if full_date_match:
+                        year = int(full_date_match.group(1))
+                        month = int(full_date_match.group(2))
+                        day = int(date_text)
+                        date = f"{year}/{month:02d}/{day:02d}"
+                    else:
+                        continue
+                else:
+                    continue
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                # イベントテーブルの取得
-                schedule_tables = soup.select('table.date')
-                logger.info(f"Found {len(schedule_tables)} schedule tables")
-                
-                for table_idx, table in enumerate(schedule_tables, 1):
-                    try:
-                        # 日付の取得（画像ファイル名から）
-                        day_img = table.select_one('th img[src*="images"]')
-                        if not day_img:
-                            continue
-                            
-                        day_match = re.search(r'(\d+)\.gif$', day_img['src'])
-                        if not day_match:
-                            continue
-                            
-                        try:
-                            day = int(day_match.group(1))
-                            date = f"{year}/{month:02d}/{day:02d}"
-                        except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
-                            continue
+            # イベント情報の取得
+            title_elem = item.select_one('.event-ttl')
+            if not title_elem:
+                continue
 
-                        # タイトル情報の取得
-                        title_cell = table.select_one('td.rocktown.title')
-                        title = title_cell.text.strip() if title_cell else ""
+            # アーティスト情報の解析
+            artists = []
+            artist_lines = title_elem.text.strip().split('\n')
 
-                        # アーティスト情報の取得
-                        artist_cell = table.select_one('tr:nth-child(2) td[colspan="3"]')
-                        if not artist_cell:
-                            continue
+            for line in artist_lines:
+                # 不要な文字列を削除
+                line = re.sub(r'＜NEW＞|O\.A\s+', '', line)
 
-                        # アーティスト名の処理
-                        artists = []
-                        artist_text = artist_cell.text.strip()
-                        
-                        # 改行とスラッシュで分割
-                        for line in artist_text.split('\n'):
-                            for artist_name in line.split('/'):
-                                artist = clean_artist_name(artist_name.strip(), debug=False)
-                                if artist:
-                                    artists.append(artist)
+                # スラッシュで区切られたアーティスト
+                for artist_name in line.split('/'):
+                    artist = clean_artist_name(artist_name.strip(), debug=False)
+                    if artist:
+                        artists.append(artist)
 
-                        # イベントの作成
-                        for artist in artists:
-                            event = create_event(
-                                date=date,
-                                day_jp=get_weekday_jp(date),
-                                artist=artist,
-                                title=title,
-                                url=schedule_url,
-                                venue='あべのROCKTOWN',
-                                note=''
-                            )
-                            events.append(event)
-                            logger.debug(f"Created event: {event}")
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title_elem.text.strip(),
+                url=f"{base_url}{item.select_one('a')['href'][1:]}",
+                venue='梅田QUATTRO',
+                note=''
+            )
+            for artist in artists:
+                event = show.event(artist)
+                events.append(event)
+                logger.debug("Created event: %s", event, extra=SAMPLED)
 
-                    except Exception as e:
-                        logger.error(f"Error parsing table {table_idx}: {str(e)}", exc_info=True)
-                        continue
+        except Exception as e:
+            logger.error("Error parsing item %s: %s", item_idx, e, exc_info=True)
+            continue
+
+    return events
+
+def scrape_rocktown(fetcher, base_url):
+    """あべのROCKTOWNのスケジュールをスクレイピング"""
+    logger = logging.getLogger(__name__)
+    logger.info("=== ROCKTOWN Scraping Start ===")
+    events = []
 
+    try:
+        # 6ヶ月分のスケジュールを取得
+        for year, month in get_next_n_months():
+            try:
+                events.extend(scrape_rocktown_month(fetcher, base_url, year, month))
             except Exception as e:
-                logger.error(f"Error scraping month page {schedule_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping month page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
 
-        logger.info(f"Total events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping ROCKTOWN: {str(e)}", exc_info=True)
+        logger.error("Error scraping ROCKTOWN: %s", e, exc_info=True)
         return []
 
+@horizon_tracked
+def scrape_rocktown_month(fetcher, base_url, year, month):
+    """あべのROCKTOWNの1ヶ月分のスケジュールを取得"""
+    logger = logging.getLogger(__name__)
 
-def scrape_knave(base_url):
-    """knaveのスケジュールをスクレイピング"""
+    # URLの生成（当月はindex.html、それ以外は年月.html）
+    current = run_clock.reference
+    if year == current.year and month == current.month:
+        schedule_url = f"{base_url}/schedule/index.html"
+    else:
+        schedule_url = f"{base_url}/schedule/{year}{month:02d}.html"
+
+    logger.info("Scraping schedule: %s", schedule_url)
+
+    response = fetcher.get(schedule_url)
+    return parse_rocktown(response.text, schedule_url, year, month)
+
+@cached_parser(version=1)
+def parse_rocktown(html, schedule_url, year, month):
+    """あべのROCKTOWNの月別スケジュールページを解析"""
     logger = logging.getLogger(__name__)
-    logger.info("=== knave Scraping Start ===")
     events = []
-    
-    try:
-        session = init_session()
-        
-        # 6ヶ月分のスケジュールを取得
-        for year, month in get_next_n_months():
-            schedule_url = f"{base_url}/schedule/s_{year}_{month:02d}.html"
-            logger.info(f"Scraping schedule: {schedule_url}")
+    soup = make_soup(html)
 
-            try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
+    # イベントテーブルの取得
+    schedule_tables = soup.select('table.date')
+    logger.info("Found %s schedule tables", len(schedule_tables))
 
-                # イベント情報の取得
-                event_divs = soup.select('div.event-details')
-                logger.info(f"Found {len(event_divs)} event details")
-                
-                for div_idx, event_div in enumerate(event_divs, 1):
-                    try:
-                        # 日付の取得
-                        date_elem = event_div.find_previous('h3', class_='f-22')
-                        if not date_elem:
-                            continue
+    for table_idx, table in enumerate(schedule_tables, 1):
+        try:
+            # 日付の取得（画像ファイル名から）
+            day_img = table.select_one('th img[src*="images"]')
+            if not day_img:
+                continue
 
-                        # 日付のパース (例: "25.2.8" → 2025/02/08)
-                        date_text = date_elem.text.strip()
-                        try:
-                            # 日付解析の共通関数を使用
-                            date = parse_date(date_text, format_type='mixed')
-                        except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
-                            continue
+            day_match = re.search(r'(\d+)\.gif$', day_img['src'])
+            if not day_match:
+                continue
 
-                        # イベント詳細の取得
-                        event_left = event_div.select_one('.event-details-left')
-                        if not event_left:
-                            continue
+            try:
+                day = int(day_match.group(1))
+                date = f"{year}/{month:02d}/{day:02d}"
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                        # タイトルと出演者情報の取得
-                        event_text = event_left.select_one('p.f-12')
-                        if not event_text:
-                            continue
+            # タイトル情報の取得
+            title_cell = table.select_one('td.rocktown.title')
+            title = title_cell.text.strip() if title_cell else ""
 
-                        # テキストの分割処理
-                        lines = [line.strip() for line in event_text.text.split('\n') if line.strip()]
-                        title = lines[0] if lines else ""
+            # アーティスト情報の取得
+            artist_cell = table.select_one('tr:nth-child(2) td[colspan="3"]')
+            if not artist_cell:
+                continue
 
-                        # アーティスト情報の抽出
-                        artists = []
-                        artist_lines = lines[1:] if len(lines) > 1 else []
-                        
-                        for line in artist_lines:
-                            # 複数の区切り文字でアーティストを分割
-                            if '/' in line:
-                                parts = line.split('/')
-                            elif ',' in line:
-                                parts = line.split(',')
-                            else:
-                                parts = [line]
-                                
-                            for part in parts:
-                                artist = clean_artist_name(part.strip(), debug=False)
-                                if artist:
-                                    artists.append(artist)
+            # アーティスト名の処理
+            artists = []
+            artist_text = artist_cell.text.strip()
 
-                        # イベントの作成
-                        for artist in artists:
-                            event = create_event(
-                                date=date,
-                                day_jp=get_weekday_jp(date),
-                                artist=artist,
-                                title=title,
-                                url=schedule_url,
-                                venue='knave',
-                                note=''
-                            )
-                            events.append(event)
-                            logger.debug(f"Created event: {event}")
+            # 改行とスラッシュで分割
+            for line in artist_text.split('\n'):
+                for artist_name in line.split('/'):
+                    artist = clean_artist_name(artist_name.strip(), debug=False)
+                    if artist:
+                        artists.append(artist)
 
-                    except Exception as e:
-                        logger.error(f"Error parsing event div {div_idx}: {str(e)}", exc_info=True)
-                        continue
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title,
+                url=schedule_url,
+                venue='あべのROCKTOWN',
+                note=''
+            )
+            for artist in artists:
+                event = show.event(artist)
+                events.append(event)
+                logger.debug("Created event: %s", event, extra=SAMPLED)
+
+        except Exception as e:
+            logger.error("Error parsing table %s: %s", table_idx, e, exc_info=True)
+            continue
+
+    return events
 
+def scrape_knave(fetcher, base_url):
+    """knaveのスケジュールをスクレイピング"""
+    logger = logging.getLogger(__name__)
+    logger.info("=== knave Scraping Start ===")
+    events = []
+    
+    try:
+        # 6ヶ月分のスケジュールを取得
+        for year, month in get_next_n_months():
+            try:
+                events.extend(scrape_knave_month(fetcher, base_url, year, month))
             except Exception as e:
-                logger.error(f"Error scraping month page {schedule_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping month page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
 
-        logger.info(f"Total events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping knave: {str(e)}", exc_info=True)
+        logger.error("Error scraping knave: %s", e, exc_info=True)
         return []
 
+@horizon_tracked
+def scrape_knave_month(fetcher, base_url, year, month):
+    """knaveの1ヶ月分のスケジュールを取得"""
+    logger = logging.getLogger(__name__)
+
+    schedule_url = f"{base_url}/schedule/s_{year}_{month:02d}.html"
+    logger.info("Scraping schedule: %s", schedule_url)
 
+    response = fetcher.get(schedule_url)
+    return parse_knave(response.text, schedule_url)
 
-def scrape_hatch(base_url):
-    """なんばHatchのスケジュールをスクレイピング"""
+@cached_parser(version=2)
+def parse_knave(html, schedule_url):
+    """knaveの月別スケジュールページを解析"""
     logger = logging.getLogger(__name__)
-    logger.info("=== Hatch Scraping Start ===")
     events = []
+    soup = make_soup(html)
 
-    try:
-        session = init_session()
+    # イベント情報の取得
+    event_divs = soup.select('div.event-details')
+    logger.info("Found %s event details", len(event_divs))
 
-        # 6ヶ月分のスケジュールを取得
-        for month_offset in range(SCRAPING_MONTHS):
-            schedule_url = f"{base_url}/schedule.php?add={month_offset}"
-            logger.info(f"Scraping schedule: {schedule_url}")
+    for div_idx, event_div in enumerate(event_divs, 1):
+        try:
+            # 日付の取得
+            date_elem = event_div.find_previous('h3', class_='f-22')
+            if not date_elem:
+                continue
 
+            # 日付のパース (例: "25.2.8" → 2025/02/08)
+            date_text = date_elem.text.strip()
             try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # 日付解析の共通関数を使用
+                date = parse_date(date_text, format_type='mixed')
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                # スケジュールテーブルの取得
-                schedule_table = soup.find('table', class_='scheduleInfo')
-                if not schedule_table:
-                    logger.warning(f"No schedule table found at {schedule_url}")
-                    continue
+            # イベント詳細の取得
+            event_left = event_div.select_one('.event-details-left')
+            if not event_left:
+                continue
 
-                schedule_rows = schedule_table.find_all('tr')
-                logger.info(f"Found {len(schedule_rows)} schedule rows")
-                
-                for row_idx, row in enumerate(schedule_rows, 1):
-                    try:
-                        # 日付情報の取得
-                        date_th = row.find('th')
-                        if not date_th:
-                            continue
+            # タイトルと出演者情報の取得
+            event_text = event_left.select_one('p.f-12')
+            if not event_text:
+                continue
 
-                        date_text = date_th.text.strip().split('\n')[0]
-                        try:
-                            # 日付解析の共通関数を使用
-                            date = parse_date(date_text, format_type='slash_short')
-                        except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
-                            continue
+            # テキストの分割処理
+            lines = [line.strip() for line in event_text.text.split('\n') if line.strip()]
+            title = lines[0] if lines else ""
 
-                        # イベント情報の取得
-                        event_td = row.find('td', class_='bgBlack')
-                        if not event_td:
-                            continue
+            # アーティスト情報の抽出
+            artists = []
+            artist_lines = lines[1:] if len(lines) > 1 else []
 
-                        # アーティストとタイトルの取得
-                        artist_div = event_td.find('div', class_='eventArtist')
-                        title_div = event_td.find('div', class_='eventTitle')
-                        
-                        if not artist_div:
-                            continue
+            for line in artist_lines:
+                # 複数の区切り文字でアーティストを分割
+                if '/' in line:
+                    parts = line.split('/')
+                elif ',' in line:
+                    parts = line.split(',')
+                else:
+                    parts = [line]
 
-                        title = title_div.text.strip() if title_div else ""
-                        
-                        # アーティストの処理
-                        artists = []
-                        artist_text = artist_div.text.strip()
-                        
-                        # ゲストアーティストの取得
-                        guest_artists = []
-                        if 'GUEST' in title:
-                            guest_match = re.search(r'GUEST\s*(?:ACT)?[：:]\s*([^<\n]+)', title)
-                            if guest_match:
-                                guest_text = guest_match.group(1).strip()
-                                guest_artists = [clean_artist_name(g.strip(), debug=False) 
-                                               for g in re.split(r'[/、]', guest_text)]
-
-                        # メインアーティストの処理
-                        for separator in [' / ', '/', '、', ' ']:
-                            if separator in artist_text:
-                                main_artists = [clean_artist_name(a.strip(), debug=False) 
-                                              for a in artist_text.split(separator)]
-                                artists.extend(a for a in main_artists if a)
-                                break
-                        
-                        if not artists:
-                            artist = clean_artist_name(artist_text, debug=False)
-                            if artist:
-                                artists.append(artist)
+                for part in parts:
+                    artist = clean_artist_name(part.strip(), debug=False)
+                    if artist:
+                        artists.append(artist)
 
-                        # ゲストアーティストを追加
-                        artists.extend(a for a in guest_artists if a)
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title,
+                url=schedule_url,
+                venue='knave',
+                note=''
+            )
+            for artist in artists:
+                event = show.event(artist)
+                events.append(event)
+                logger.debug("Created event: %s", event, extra=SAMPLED)
 
-                        # イベントの作成
-                        for artist in artists:
-                            if artist and len(artist) > 1:  # 空または1文字の名前は除外
-                                event = create_event(
-                                    date=date,
-                                    day_jp=get_weekday_jp(date),
-                                    artist=artist,
-                                    title=title,
-                                    url=schedule_url,
-                                    venue='なんばHatch',
-                                    note=''
-                                )
-                                events.append(event)
-                                logger.debug(f"Created event: {event}")
+        except Exception as e:
+            logger.error("Error parsing event div %s: %s", div_idx, e, exc_info=True)
+            continue
 
-                    except Exception as e:
-                        logger.error(f"Error parsing row {row_idx}: {str(e)}", exc_info=True)
-                        continue
+    return events
+
+def scrape_hatch(fetcher, base_url):
+    """なんばHatchのスケジュールをスクレイピング"""
+    logger = logging.getLogger(__name__)
+    logger.info("=== Hatch Scraping Start ===")
+    events = []
 
+    try:
+        # 6ヶ月分のスケジュールを取得
+        for year, month in get_next_n_months():
+            try:
+                events.extend(scrape_hatch_month(fetcher, base_url, year, month))
             except Exception as e:
-                logger.error(f"Error scraping month page {schedule_url}: {str(e)}", exc_info=True)
+                logger.error("Error scraping month page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
 
-        logger.info(f"Total events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping Hatch: {str(e)}", exc_info=True)
+        logger.error("Error scraping Hatch: %s", e, exc_info=True)
         return []
 
+@horizon_tracked
+def scrape_hatch_month(fetcher, base_url, year, month):
+    """なんばHatchの1ヶ月分のスケジュールを取得"""
+    logger = logging.getLogger(__name__)
 
+    # 月の指定は当月からのオフセット
+    schedule_url = f"{base_url}/schedule.php?add={get_month_offset(year, month)}"
+    logger.info("Scraping schedule: %s", schedule_url)
 
-def scrape_muse(base_url):
-    """心斎橋MUSEのスケジュールをスクレイピング"""
+    response = fetcher.get(schedule_url)
+    return parse_hatch(response.text, schedule_url)
+
+@cached_parser(version=1)
+def parse_hatch(html, schedule_url):
+    """なんばHatchの月別スケジュールページを解析"""
     logger = logging.getLogger(__name__)
-    logger.info("=== MUSE Scraping Start ===")
     events = []
+    soup = make_soup(html)
 
-    try:
-        session = init_session()
-        
-        # 6ヶ月分のスケジュールを取得
-        for month_offset in range(SCRAPING_MONTHS):
-            target_date = datetime.now() + relativedelta(months=month_offset)
-            schedule_url = f"{base_url}/schedule/?y={target_date.year}&m={target_date.month}"
-            logger.info(f"Scraping schedule: {schedule_url}")
+    # スケジュールテーブルの取得
+    schedule_table = soup.find('table', class_='scheduleInfo')
+    if not schedule_table:
+        logger.warning("No schedule table found at %s", schedule_url)
+        return events
+
+    schedule_rows = schedule_table.find_all('tr')
+    logger.info("Found %s schedule rows", len(schedule_rows))
 
+    for row_idx, row in enumerate(schedule_rows, 1):
+        try:
+            # 日付情報の取得
+            date_th = row.find('th')
+            if not date_th:
+                continue
+
+            date_text = date_th.text.strip().split('\n')[0]
             try:
-                response = make_request(session, schedule_url)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # 日付解析の共通関数を使用
+                date = parse_date(date_text, format_type='slash_short')
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                schedule_items = soup.find_all('article', class_='media schedule')
-                logger.info(f"Found {len(schedule_items)} schedule items")
-                
-                for item_idx, item in enumerate(schedule_items, 1):
-                    try:
-                        logger.debug(f"Processing item {item_idx}")
+            # イベント情報の取得
+            event_td = row.find('td', class_='bgBlack')
+            if not event_td:
+                continue
 
-                        date_div = item.find('div', class_='event_date')
-                        if not date_div:
-                            logger.debug("No event_date div found")
-                            continue
+            # アーティストとタイトルの取得
+            artist_div = event_td.find('div', class_='eventArtist')
+            title_div = event_td.find('div', class_='eventTitle')
 
-                        # 日付文字列を取得
-                        date_text = date_div.get_text(strip=True, separator=' ')
-                        logger.debug(f"Raw date text: {date_text}")
+            if not artist_div:
+                continue
 
-                        # 日付形式の変換（dot形式）
-                        try:
-                            date = parse_date(date_text, format_type='dot')
-                            logger.debug(f"Parsed date: {date}")
-                        except ValueError as e:
-                            logger.debug(f"Date parsing failed: {str(e)}")
-                            continue
+            title = title_div.text.strip() if title_div else ""
+
+            # アーティストの処理
+            artists = []
+            artist_text = artist_div.text.strip()
+
+            # ゲストアーティストの取得
+            guest_artists = []
+            if 'GUEST' in title:
+                guest_match = re.search(r'GUEST\s*(?:ACT)?[：:]\s*([^<\n]+)', title)
+                if guest_match:
+                    guest_text = guest_match.group(1).strip()
+                    guest_artists = [clean_artist_name(g.strip(), debug=False) 
+                                   for g in re.split(r'[/、]', guest_text)]
+
+            # メインアーティストの処理
+            for separator in [' / ', '/', '、', ' ']:
+                if separator in artist_text:
+                    main_artists = [clean_artist_name(a.strip(), debug=False) 
+                                  for a in artist_text.split(separator)]
+                    artists.extend(a for a in main_artists if a)
+                    break
+
+            if not artists:
+                artist = clean_artist_name(artist_text, debug=False)
+                if artist:
+                    artists.append(artist)
+
+            # ゲストアーティストを追加
+            artists.extend(a for a in guest_artists if a)
 
-                        # タイトルの取得
-                        title_elem = item.find('h3', class_='media-heading')
-                        title = title_elem.text.strip() if title_elem else ""
-                        print(f"Found title: {title}")
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title,
+                url=schedule_url,
+                venue='なんばHatch',
+                note=''
+            )
+            for artist in artists:
+                if artist and len(artist) > 1:  # 空または1文字の名前は除外
+                    event = show.event(artist)
+                    events.append(event)
+                    logger.debug("Created event: %s", event, extra=SAMPLED)
 
-                        # アーティスト情報の取得
-                        content_div = item.find('div', class_='schedule_content')
-                        if content_div and content_div.find('p'):
-                            artist_text = content_div.find('p').text.strip()
-                            print(f"Found artist text: {artist_text}")
-                            
-                            artists = []
-                            # スラッシュ、カンマ、スペースで分割
-                            for separator in ['/', '、', ' ']:
-                                if separator in artist_text:
-                                    parts = [part.strip() for part in artist_text.split(separator)]
-                                    artists = [clean_artist_name(part) for part in parts if part]
-                                    print(f"Split artists by '{separator}': {artists}")
-                                    break
-                            
-                            if not artists:  # 区切り文字がない場合
-                                artists = [clean_artist_name(artist_text)]
-                                print(f"Single artist: {artists}")
-                        else:
-                            print("No artist information found")
-                            continue
+        except Exception as e:
+            logger.error("Error parsing row %s: %s", row_idx, e, exc_info=True)
+            continue
 
-                        # イベントの作成
-                        events_created = 0
-                        for artist in artists:
-                            if artist and len(artist) > 1:  # 空または1文字の名前は除外
-                                event = {
-                                    'date': date,
-                                    'day': get_weekday_jp(date),
-                                    'note': '',
-                                    'artist': artist,
-                                    'venue': '心斎橋MUSE',
-                                    'title': title,
-                                    'url': schedule_url
-                                }
-                                events.append(event)
-                                events_created += 1
-                                print(f"Created event: {event}")
-                        
-                        print(f"Created {events_created} events from this item")
+    return events
 
-                    except Exception as e:
-                        print(f"Error parsing item {item_idx}: {str(e)}")
-                        import traceback
-                        print(traceback.format_exc())
-                        continue
+def scrape_muse(fetcher, base_url):
+    """心斎橋MUSEのスケジュールをスクレイピング"""
+    logger = logging.getLogger(__name__)
+    logger.info("=== MUSE Scraping Start ===")
+    events = []
 
+    try:
+        # 6ヶ月分のスケジュールを取得
+        for year, month in get_next_n_months():
+            try:
+                events.extend(scrape_muse_month(fetcher, base_url, year, month))
             except Exception as e:
-                print(f"Error scraping month page {schedule_url}: {str(e)}")
+                logger.error("Error scraping month page %s/%02d of %s: %s", year, month, base_url, e, exc_info=True)
                 continue
 
-        print(f"\nTotal events found: {len(events)}")
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        print(f"Error: {str(e)}")
-        logging.error(f"Error scraping MUSE: {str(e)}")
+        logger.error("Error scraping MUSE: %s", e, exc_info=True)
         return []
 
+@horizon_tracked
+def scrape_muse_month(fetcher, base_url, year, month):
+    """心斎橋MUSEの1ヶ月分のスケジュールを取得"""
+    logger = logging.getLogger(__name__)
 
-def scrape_pangea(base_url):
-    """PANGEAのスケジュールをスクレイピング"""
+    schedule_url = f"{base_url}/schedule/?y={year}&m={month}"
+    logger.info("Scraping schedule: %s", schedule_url)
+
+    response = fetcher.get(schedule_url)
+    return parse_muse(response.text, schedule_url)
+
+@cached_parser(version=2)
+def parse_muse(html, schedule_url):
+    """心斎橋MUSEの月別スケジュールページを解析"""
     logger = logging.getLogger(__name__)
-    logger.info("=== PANGEA Scraping Start ===")
     events = []
+    soup = make_soup(html)
 
-    try:
-        session = init_session()
-        schedule_url = f"{base_url}/schedule/"
-        logger.info(f"Fetching schedule page: {schedule_url}")
+    schedule_items = soup.find_all('article', class_='media schedule')
+    logger.info("Found %s schedule items", len(schedule_items))
 
+    for item_idx, item in enumerate(schedule_items, 1):
         try:
-            response = make_request(session, schedule_url)
-            schedule_soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # イベントリンクの収集
-            event_urls = set()  # 重複を避けるためにsetを使用
-            for link in schedule_soup.find_all('a', href=True):
-                href = link['href']
-                if '/live/' in href:
-                    # 相対パスを完全なURLに変換
-                    full_url = href if base_url in href else f"{base_url}{href.lstrip('/')}"
-                    event_urls.add(full_url)
-
-            logger.info(f"Found {len(event_urls)} unique event URLs")
-
-            # 各イベントページの処理
-            for event_url in event_urls:
-                try:
-                    logger.debug(f"Processing event URL: {event_url}")
-                    detail_response = make_request(session, event_url)
-                    detail_soup = BeautifulSoup(detail_response.text, 'html.parser')
+            logger.debug("Processing item %s", item_idx)
 
-                    # 日付情報の取得
-                    live_mom = detail_soup.find('p', class_='live_mom')
-                    live_day = detail_soup.find('p', class_='live_day')
-                    
-                    if not live_mom or not live_day:
-                        logger.debug("Date information not found")
-                        continue
+            date_div = item.find('div', class_='event_date')
+            if not date_div:
+                logger.debug("No event_date div found")
+                continue
 
-                    # 日付の解析
-                    date_text = f"{live_mom.text.strip()}/{live_day.text.strip()}"
-                    try:
-                        date = parse_date(date_text)
-                    except ValueError as e:
-                        logger.debug(f"Date parsing failed: {str(e)}")
-                        continue
+            # 日付文字列を取得
+            date_text = date_div.get_text(strip=True, separator=' ')
+            logger.debug("Raw date text: %s", date_text)
 
-                    # タイトル情報の取得
-                    title_span = detail_soup.find('span', class_='pangea-color', 
-                                                style=lambda x: x and 'font-weight: 400' in x)
-                    title = title_span.text.strip() if title_span else ""
-                    logger.debug(f"Found title: {title}")
-
-                    # アーティスト情報の取得と処理
-                    artist_div = detail_soup.find('div', class_='hrbox')
-                    if artist_div and artist_div.find('span', class_='badge-info'):
-                        artist_container = artist_div.find('div')
-                        if artist_container and artist_container.find('p'):
-                            artist_text = artist_container.find('p').text.strip()
-                            logger.debug(f"Found artist text: {artist_text}")
-                            
-                            # アーティスト名の分割と整形
-                            artists = []
-                            for line in artist_text.split('\n'):
-                                parts = re.split(r'[/、]', line)
-                                for part in parts:
-                                    artist_name = clean_artist_name(part.strip(), debug=False)
-                                    if artist_name and len(artist_name) > 1:  # 1文字以下は除外
-                                        artists.append(artist_name)
-                            
-                            # イベントの作成
-                            for artist in artists:
-                                event = create_event(
-                                    date=date,
-                                    day_jp=get_weekday_jp(date),
-                                    artist=artist,
-                                    title=title,
-                                    url=event_url,
-                                    venue='PANGEA',
-                                    note=''
-                                )
-                                events.append(event)
-                                logger.debug(f"Created event: {event}")
+            # 日付形式の変換（dot形式）
+            try:
+                date = parse_date(date_text, format_type='dot')
+                logger.debug("Parsed date: %s", date)
+            except ValueError as e:
+                logger.debug("Date parsing failed: %s", e)
+                continue
 
-                except Exception as e:
-                    logger.error(f"Error processing detail page {event_url}: {str(e)}", exc_info=True)
-                    continue
+            # タイトルの取得
+            title_elem = item.find('h3', class_='media-heading')
+            title = title_elem.text.strip() if title_elem else ""
+            logger.debug("Found title: %s", title)
+
+            # アーティスト情報の取得
+            content_div = item.find('div', class_='schedule_content')
+            if content_div and content_div.find('p'):
+                artist_text = content_div.find('p').text.strip()
+                logger.debug("Found artist text: %s", artist_text)
+
+                artists = []
+                # スラッシュ、カンマ、スペースで分割
+                for separator in ['/', '、', ' ']:
+                    if separator in artist_text:
+                        parts = [part.strip() for part in artist_text.split(separator)]
+                        artists = [clean_artist_name(part) for part in parts if part]
+                        logger.debug("Split artists by '%s': %s", separator, artists)
+                        break
+
+                if not artists:  # 区切り文字がない場合
+                    artists = [clean_artist_name(artist_text)]
+                    logger.debug("Single artist: %s", artists)
+            else:
+                logger.debug("No artist information found")
+                continue
+
+            # イベントの作成
+            events_created = 0
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title,
+                url=schedule_url,
+                venue='心斎橋MUSE',
+                note=''
+            )
+            for artist in artists:
+                if artist and len(artist) > 1:  # 空または1文字の名前は除外
+                    event = show.event(artist)
+                    events.append(event)
+                    events_created += 1
+                    logger.debug("Created event: %s", event, extra=SAMPLED)
+
+            logger.debug("Created %s events from this item", events_created)
+
+        except Exception as e:
+            logger.error("Error parsing item %s: %s", item_idx, e, exc_info=True)
+            continue
+
+    return events
 
+def scrape_pangea(fetcher, base_url):
+    """PANGEAのスケジュールをスクレイピング"""
+    logger = logging.getLogger(__name__)
+    logger.info("=== PANGEA Scraping Start ===")
+    events = []
+
+    try:
+        try:
+            event_urls = links_in_window(get_pangea_event_urls(fetcher, base_url), 'PANGEA')
         except Exception as e:
-            logger.error(f"Error accessing schedule page: {str(e)}", exc_info=True)
+            logger.error("Error accessing schedule page: %s", e, exc_info=True)
             return []
 
-        logger.info(f"Total events found: {len(events)}")
+        # 各イベントページの処理
+        for event_url in event_urls:
+            try:
+                events.extend(scrape_pangea_detail(fetcher, event_url))
+            except Exception as e:
+                logger.error("Error processing detail page %s: %s", event_url, e, exc_info=True)
+                continue
+
+        logger.info("Total events found: %s", len(events))
         return events
 
     except Exception as e:
-        logger.error(f"Error scraping PANGEA: {str(e)}", exc_info=True)
+        logger.error("Error scraping PANGEA: %s", e, exc_info=True)
         return []
 
+def get_pangea_event_urls(fetcher, base_url):
+    """PANGEAのスケジュールページからイベントページのURLと公演日（リンクの文字列・URLから分かる場合）を取得"""
+    logger = logging.getLogger(__name__)
+    schedule_url = f"{base_url}/schedule/"
+    logger.info("Fetching schedule page: %s", schedule_url)
+
+    response = fetcher.get(schedule_url)
+    schedule_soup = make_soup(response.text)
+    
+    # イベントリンクの収集（同じURLのリンクが複数ある場合は日付が分かるものを使う）
+    event_dates = {}
+    for link in schedule_soup.find_all('a', href=True):
+        href = link['href']
+        if '/live/' in href:
+            # 相対パスを完全なURLに変換
+            full_url = href if base_url in href else f"{base_url}{href.lstrip('/')}"
+            show_date = date_from_text(href) or date_from_text(link.get_text(' '))
+            if event_dates.get(full_url) is None:
+                event_dates[full_url] = show_date
+
+    logger.info("Found %s unique event URLs", len(event_dates))
+    return [DetailLink(url, event_dates[url]) for url in sorted(event_dates)]
+
+def scrape_pangea_detail(fetcher, event_url):
+    """PANGEAのイベントページから情報を取得"""
+    logger = logging.getLogger(__name__)
+    logger.debug("Processing event URL: %s", event_url)
+    detail_response = fetcher.get(event_url)
+    return parse_pangea_detail(detail_response.text, event_url)
+
+@cached_parser(version=2)
+def parse_pangea_detail(html, event_url):
+    """PANGEAのイベントページを解析"""
+    logger = logging.getLogger(__name__)
+    events = []
+    detail_soup = make_soup(html)
+
+    # 日付情報の取得
+    live_mom = detail_soup.find('p', class_='live_mom')
+    live_day = detail_soup.find('p', class_='live_day')
+    
+    if not live_mom or not live_day:
+        logger.debug("Date information not found")
+        return events
+
+    # 日付の解析
+    date_text = f"{live_mom.text.strip()}/{live_day.text.strip()}"
+    try:
+        date = parse_date(date_text)
+    except ValueError as e:
+        logger.debug("Date parsing failed: %s", e)
+        return events
 
+    # タイトル情報の取得
+    title_span = detail_soup.find('span', class_='pangea-color', 
+                                style=lambda x: x and 'font-weight: 400' in x)
+    title = title_span.text.strip() if title_span else ""
+    logger.debug("Found title: %s", title)
+
+    # アーティスト情報の取得と処理
+    artist_div = detail_soup.find('div', class_='hrbox')
+    if artist_div and artist_div.find('span', class_='badge-info'):
+        artist_container = artist_div.find('div')
+        if artist_container and artist_container.find('p'):
+            artist_text = artist_container.find('p').text.strip()
+            logger.debug("Found artist text: %s", artist_text)
+            
+            # アーティスト名の分割と整形
+            artists = []
+            for line in artist_text.split('\n'):
+                parts = re.split(r'[/、]', line)
+                for part in parts:
+                    artist_name = clean_artist_name(part.strip(), debug=False)
+                    if artist_name and len(artist_name) > 1:  # 1文字以下は除外
+                        artists.append(artist_name)
+            
+            # イベントの作成
+            show = create_show(
+                date=date,
+                day_jp=get_weekday_jp(date),
+                title=title,
+                url=event_url,
+                venue='PANGEA',
+                note=''
+            )
+            for artist in artists:
+                event = show.event(artist)
+                events.append(event)
+                logger.debug("Created event: %s", event, extra=SAMPLED)
 
-def scrape_venue(url):
+    return events
+
+
+
+def scrape_venue(url, fetcher=None):
+    """URLに対応する会場のスケジュールを取得（fetcherを省略した場合は新しく作成）"""
+    fetcher = fetcher or Fetcher()
     try:
         if 'fireloop.net' in url:
-            return scrape_fireloop(url)
+            return scrape_fireloop(fetcher, url)
         elif 'para-dice.net' in url:
-            return scrape_paradice(url)
+            return scrape_paradice(fetcher, url)
         elif any(domain in url for domain in ['vijon.jp', 'bangboo.jp', 'clubdrop.jp', 'osaka-varon.jp', 'osaka-zeela.jp']):
-            return scrape_vijon_system(url)
+            return scrape_vijon_system(fetcher, url)
         elif 'club-quattro.com' in url:
-            return scrape_quattro(url)
+            return scrape_quattro(fetcher, url)
         elif 'rocktown.jp' in url:
-            return scrape_rocktown(url)
+            return scrape_rocktown(fetcher, url)
         elif 'knave.co.jp' in url:
-            return scrape_knave(url)
+            return scrape_knave(fetcher, url)
         elif 'namba-hatch.com' in url:
-            return scrape_hatch(url)
+            return scrape_hatch(fetcher, url)
         elif 'muse-live.com' in url:
-            return scrape_muse(url)
+            return scrape_muse(fetcher, url)
         elif 'livepangea.com' in url:
-            return scrape_pangea(url)
+            return scrape_pangea(fetcher, url)
         return []
     except Exception as e:
-        logging.error(f"Error scraping {url}: {str(e)}")
+        logging.error("Error scraping %s: %s", url, e)
         return []
 
-def save_data(data):
+# 会場ごとの処理の分割方法（タスク単位の実行に使用）
+#   page:        1ページで完結する会場 (fetcher, url) -> イベント
+#   month:       月単位のページ (fetcher, base_url, year, month) -> イベント
+#   month_links: 月単位のページ (fetcher, base_url, year, month) -> 詳細ページのURL（またはDetailLink）
+#   links:       一覧ページ (fetcher, base_url) -> 詳細ページのURL（またはDetailLink）
+#                （DetailLinkで公演日が分かる詳細ページは、収集対象の期間外なら取得しない）
+#   detail:      詳細ページ (fetcher, base_url, detail_url) -> イベント
+#   feed_links:  サイトマップのURLのうち詳細ページとみなすもの (url) -> bool
+#                （指定した会場はサイトマップ・RSSの更新日時で変更された詳細ページのみ取得する）
+VENUE_STEPS = {
+    'fireloop': {'page': scrape_fireloop},
+    'paradice': {'page': scrape_paradice},
+    'vijon_system': {
+        'month_links': get_vijon_detail_urls,
+        'detail': lambda fetcher, base_url, detail_url: scrape_vijon_detail(fetcher, detail_url, get_venue_name(base_url)),
+    },
+    'quattro': {'month': scrape_quattro_month},
+    'rocktown': {'month': scrape_rocktown_month},
+    'knave': {'month': scrape_knave_month},
+    'hatch': {'month': scrape_hatch_month},
+    'muse': {'month': scrape_muse_month},
+    'pangea': {
+        'links': get_pangea_event_urls,
+        'detail': lambda fetcher, base_url, detail_url: scrape_pangea_detail(fetcher, detail_url),
+        'feed_links': lambda url: '/live/' in url,
+    },
+}
+
+def get_venue_steps(venue_key, config):
+    """会場キーに対応する処理の分割方法を返す"""
+    return VENUE_STEPS[config.get('scraping_type', venue_key)]
+
+def save_data(data, compact=None):
+    """重複を除去して日付・会場順に並べ、JSONとCSVに保存し、成功したかを返す"""
     try:
-        logging.info(f"Starting save_data with {len(data)} events")
+        logging.info("Starting save_data with %s events", len(data))
         
         if not data:
             logging.warning("No data to save")
-            return
-        
-        # データの重複を除去
-        unique_data = []
-        seen = set()
+            return False
         
-        for event in data:
-            event_key = (event['date'], event['artist'], event['venue'])
-            if event_key not in seen:
-                seen.add(event_key)
-                unique_data.append(event)
+        # 1つのDataFrameで正規化・重複除去・並べ替えを行い、全ての形式をそこから書き出す
+        df = normalize_events(events_frame(data))
+        logging.info("After deduplication: %s events", len(df))
         
-        logging.info(f"After deduplication: {len(unique_data)} events")
-        
-        # 現在のスクリプトのディレクトリを基準にパスを設定
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_dir = os.path.join(base_dir, 'data')
-        
-        logging.info(f"Saving to directory: {data_dir}")
-        
-        # ファイル保存
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # JSONファイルの保存
-        json_path = os.path.join(data_dir, 'events.json')
-        logging.info(f"Attempting to save JSON to: {json_path}")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(unique_data, f, ensure_ascii=False, indent=2)
-        logging.info("JSON file saved successfully")
-        
-        # CSVファイルの保存
-        csv_path = os.path.join(data_dir, 'events.csv')
-        logging.info(f"Attempting to save CSV to: {csv_path}")
-        df = pd.DataFrame(unique_data)
-        df.to_csv(csv_path, index=False, encoding='utf-8')
-        logging.info("CSV file saved successfully")
+        write_outputs(df, compact=compact)
+        logging.info("Saved %s events to %s", len(df), DATA_DIR)
+        return True
         
     except Exception as e:
-        logging.error(f"Error saving data: {str(e)}")
-        logging.error(f"Exception type: {type(e)}")
+        logging.error("Error saving data: %s", e)
+        logging.error("Exception type: %s", type(e))
         import traceback
-        logging.error(f"Traceback: {traceback.format_exc()}")
-
-def main():
+        logging.error("Traceback: %s", traceback.format_exc())
+        return False
+
+def parse_args(argv=None):
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description='ライブハウスのスケジュールを収集する')
+    parser.add_argument('--area', help='指定したエリアの会場のみ収集する（例: osaka）')
+    parser.add_argument('--shard-index', type=int, help='会場キーのハッシュで分割したときのシャード番号')
+    parser.add_argument('--shard-count', type=int, help='ハッシュ分割のシャード数')
+    parser.add_argument('--shard-dir', help='シャードの結果を書き出すディレクトリ（指定時はevents.jsonを更新しない）')
+    parser.add_argument('--resume', action='store_true', help='前回中断した実行の保存済みの会場・月を取得せずに続きから実行する')
+    parser.add_argument('--compact-json', action='store_true', default=None, help='events.jsonをインデントなしの配信用の形式で書き出す')
+    parser.add_argument('--daemon', action='store_true', help='常駐して会場ごとの間隔で取得し直し、変更があれば保存する')
+    parser.add_argument('--poll-interval', type=int, help='常駐モードで会場を取得し直す間隔（秒、省略時は3600）')
+    parser.add_argument('--control-port', type=int, help='常駐モードの制御用エンドポイントのポート（省略時は8765、0で無効）')
+    record_group = parser.add_mutually_exclusive_group()
+    record_group.add_argument('--record', metavar='ARCHIVE', help='全てのリクエストとレスポンスを圧縮アーカイブに記録する')
+    record_group.add_argument('--replay', metavar='ARCHIVE', help='記録したアーカイブからレスポンスを返し、ネットワークに接続しない')
+    args = parser.parse_args(argv)
+    if args.daemon and (args.shard_dir or args.resume):
+        parser.error('--daemon cannot be combined with --shard-dir or --resume')
+    return args
+
+def main(argv=None):
     """メイン実行関数"""
-    venues = [
-        "https://fireloop.net/schedule_now.shtml",
-        "https://para-dice.net/",
-        "https://vijon.jp",
-        "https://bangboo.jp",
-        "https://clubdrop.jp",
-        "https://osaka-varon.jp",
-        "https://osaka-zeela.jp",
-        "https://www.club-quattro.com/umeda",
-        "http://rocktown.jp",
-        "http://www.knave.co.jp",
-        "http://www.namba-hatch.com",
-        "http://osaka.muse-live.com",
-        "https://livepangea.com"
-    ]
-    
-    all_events = []
-    for url in venues:
-        events = scrape_venue(url)
-        all_events.extend(events)
-        
-    save_data(all_events)
+    args = parse_args(argv)
+    setup_logging('scraper.log')
+    replay.configure(record=args.record, replay=args.replay)
+
+    venues = select_venues(args.area, args.shard_index, args.shard_count)
+    logging.info("Selected %s venues: %s", len(venues), ', '.join(venues))
+
+    if args.daemon:
+        from daemon import run_daemon
+        run_daemon(venues, lambda events: save_data(events, compact=args.compact_json),
+                   args.poll_interval, args.control_port)
+        replay.finish()
+        return
+
+    # 会場・月ごとの結果を完了するたびに保存し、中断しても再開できるようにする
+    name = shard_name(args.area, args.shard_index, args.shard_count)
+    checkpoint = Checkpoint(name)
+    if args.resume:
+        all_events = checkpoint.load(venues)
+        logging.info("Resuming with %s events from checkpoint", len(all_events))
+    else:
+        checkpoint.clear()
+        all_events = []
+
+    circuit_breaker.reset()
+    schedule_horizon.start_run()
+    fetcher = Fetcher()
+    for venue_key in venues:
+        try:
+            events = crawl_venue(venue_key, fetcher, checkpoint)
+            all_events.extend(events)
+        except Exception as e:
+            logging.error("Error scraping %s: %s", venue_key, e, exc_info=True)
+
+    circuit_breaker.report()
+    latency_tracker.report()
+    fetcher.metrics.report()
+    parse_cache.report()
+    schedule_horizon.save()
+    feed_discovery.save()
+    replay.finish()
+
+    if args.shard_dir:
+        write_shard(all_events, args.shard_dir, name, venues)
+        saved = True
+    else:
+        saved = save_data(all_events, compact=args.compact_json)
+
+    if saved:
+        checkpoint.clear()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,134 @@
+# sharding.py
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+from postprocess import open_atomic
+from utils import event_to_dict
+from venues import VENUE_CONFIGS
+
+MANIFEST_SUFFIX = '.manifest.json'
+EVENTS_SUFFIX = '.events.json'
+
+
+def shard_of(venue_key, shard_count):
+    """会場キーのハッシュからシャード番号を求める（実行環境に依存しない）"""
+    digest = hashlib.sha1(venue_key.encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def select_venues(area=None, shard_index=None, shard_count=None, venue_configs=VENUE_CONFIGS):
+    """エリアまたはハッシュ分割の条件に合う会場の設定を返す"""
+    if (shard_index is None) != (shard_count is None):
+        raise ValueError("shard_index and shard_count must be given together")
+    if shard_count is not None and not 0 <= shard_index < shard_count:
+        raise ValueError(f"Invalid shard index {shard_index} for {shard_count} shards")
+
+    selected = {}
+    for key, config in venue_configs.items():
+        if area and config.get('area') != area:
+            continue
+        if shard_count is not None and shard_of(key, shard_count) != shard_index:
+            continue
+        selected[key] = config
+    return selected
+
+
+def shard_name(area=None, shard_index=None, shard_count=None):
+    """シャードの出力ファイル名に使う名前"""
+    parts = [area or 'all']
+    if shard_count is not None:
+        parts.append(f"{shard_index}of{shard_count}")
+    return '-'.join(parts)
+
+
+def write_shard(events, shard_dir, name, venue_keys):
+    """シャードの結果とマニフェストを書き出す
+
+    マニフェストはイベントファイルの書き込み後に作成するため、
+    マニフェストが存在するシャードは完了済みとみなせる。
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    records = [event_to_dict(event) for event in events]
+
+    events_path = os.path.join(shard_dir, name + EVENTS_SUFFIX)
+    body = json.dumps(records, ensure_ascii=False).encode('utf-8')
+    with open(events_path, 'wb') as f:
+        f.write(body)
+
+    manifest = {
+        'shard': name,
+        'venues': sorted(venue_keys),
+        'events_file': os.path.basename(events_path),
+        'event_count': len(records),
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    manifest_path = os.path.join(shard_dir, name + MANIFEST_SUFFIX)
+    with open_atomic(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logging.info("Wrote shard %s: %s events from %s venues", name, len(records), len(venue_keys))
+    return manifest_path
+
+
+def load_shards(shard_dir):
+    """マニフェストのある全シャードを読み込み、イベントを結合して返す"""
+    logger = logging.getLogger(__name__)
+    all_events = []
+    seen_venues = {}
+
+    for manifest_path in sorted(glob.glob(os.path.join(shard_dir, '*' + MANIFEST_SUFFIX))):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        events_path = os.path.join(shard_dir, manifest['events_file'])
+        with open(events_path, 'rb') as f:
+            body = f.read()
+        if hashlib.sha256(body).hexdigest() != manifest['sha256']:
+            raise ValueError(f"Checksum mismatch for shard {manifest['shard']}")
+
+        for venue in manifest['venues']:
+            if venue in seen_venues:
+                logger.warning("Venue %s appears in shards %s and %s", venue, seen_venues[venue], manifest['shard'])
+            seen_venues[venue] = manifest['shard']
+
+        events = json.loads(body)
+        all_events.extend(events)
+        logger.info("Loaded shard %s: %s events", manifest['shard'], len(events))
+
+    missing = sorted(set(VENUE_CONFIGS) - set(seen_venues))
+    if missing:
+        logger.warning("No shard covered venues: %s", ', '.join(missing))
+
+    return all_events
+
+
+def merge_shards(shard_dir):
+    """全シャードを結合し、重複を除去して最終データとして保存"""
+    from scraper import save_data
+
+    events = load_shards(shard_dir)
+    save_data(events)
+    return len(events)
+
+
+def main():
+    from log_config import setup_logging
+
+    parser = argparse.ArgumentParser(description='シャードごとの結果を結合して保存する')
+    parser.add_argument('shard_dir', help='シャードの出力ディレクトリ')
+    args = parser.parse_args()
+
+    setup_logging('scraper.log')
+    merge_shards(args.shard_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# state_file.py
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def read_json(path):
+    """状態のJSONファイルを読み込む（無い・壊れている場合は空の辞書）"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_json(path, merge, indent=None):
+    """複数のプロセスが共有する状態のJSONファイルを、ロックを取って読み込み・統合・置き換えする
+
+    merge は保存済みの内容を受け取り、書き込む内容を返す関数。ロックは path + '.lock' の
+    排他ロック（fcntl が無い環境ではロックしない）で、一時ファイルはプロセスごとに別の名前にする。
+    """
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        merged = merge(read_json(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=indent)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return merged
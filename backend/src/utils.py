@@ -1,11 +1,107 @@
+import re
+import sys
+import unicodedata
+from dataclasses import dataclass
+
+EVENT_FIELDS = ('date', 'day', 'artist', 'title', 'url', 'venue', 'note')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+@dataclass(slots=True)
+class Show:
+    """公演単位の情報（同じ公演の出演者全員で1つのオブジェクトを共有する）"""
+    date: str
+    day: str
+    title: str
+    url: str
+    venue: str
+    note: str = ''
+
+    def __post_init__(self):
+        # 繰り返し現れる値はインターンして同一の文字列オブジェクトを使う
+        self.date = sys.intern(self.date)
+        self.day = sys.intern(self.day)
+        self.url = sys.intern(self.url)
+        self.venue = sys.intern(self.venue)
+
+    def event(self, artist):
+        """この公演の出演者1組分のイベントを作成"""
+        return Event(self, artist)
+
+
+@dataclass(slots=True)
+class Event:
+    """出演者1組分のイベント（公演情報はShowを参照する）"""
+    show: Show
+    artist: str
+
+    @property
+    def date(self):
+        return self.show.date
+
+    @property
+    def day(self):
+        return self.show.day
+
+    @property
+    def title(self):
+        return self.show.title
+
+    @property
+    def url(self):
+        return self.show.url
+
+    @property
+    def venue(self):
+        return self.show.venue
+
+    @property
+    def note(self):
+        return self.show.note
+
+    @property
+    def key(self):
+        """重複判定用のキー（日付・アーティスト・会場）"""
+        return (self.show.date, self.artist, self.show.venue)
+
+    def __getitem__(self, field):
+        # 従来の辞書形式のイベントと同じように参照できるようにする
+        if field not in EVENT_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def to_dict(self):
+        """保存用の辞書に変換"""
+        show = self.show
+        return {
+            'date': show.date,
+            'day': show.day,
+            'artist': self.artist,
+            'title': show.title,
+            'url': show.url,
+            'venue': show.venue,
+            'note': show.note
+        }
+
+
+def create_show(date, day_jp, title, url, venue, note=''):
+    """公演オブジェクトを作成するヘルパー関数"""
+    return Show(date, day_jp, title, url, venue, note)
+
+
 def create_event(date, day_jp, artist, title, url, venue, note=''):
     """イベントオブジェクトを作成するヘルパー関数（共通化）"""
-    return {
-        'date': date,
-        'day': day_jp,
-        'artist': artist,
-        'title': title,
-        'url': url,
-        'venue': venue,
-        'note': note
-    }
\ No newline at end of file
+    return Show(date, day_jp, title, url, venue, note).event(artist)
+
+
+def event_to_dict(event):
+    """イベントを保存用の辞書に変換（辞書の場合はそのまま返す）"""
+    if isinstance(event, Event):
+        return event.to_dict()
+    return event
+
+
+def normalize_artist(name):
+    """検索・重複判定用にアーティスト名を正規化（全角・半角、大文字・小文字、空白の違いを無視）"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', name).casefold()).strip()
@@ -5,6 +5,11 @@ VENUE_CONFIGS = {
         'url': 'https://fireloop.net/schedule_now.shtml',
         'area': 'osaka',
     },
+    'paradice': {
+        'name': '扇町para-dice',
+        'url': 'https://para-dice.net/',
+        'area': 'osaka',
+    },
     'vijon': {
         'name': '北堀江club vijon',
         'url': 'https://vijon.jp',
@@ -34,5 +39,35 @@ VENUE_CONFIGS = {
         'url': 'https://osaka-zeela.jp',
         'area': 'osaka',
         'scraping_type': 'vijon_system'
+    },
+    'quattro': {
+        'name': '梅田QUATTRO',
+        'url': 'https://www.club-quattro.com/umeda',
+        'area': 'osaka',
+    },
+    'rocktown': {
+        'name': 'あべのROCKTOWN',
+        'url': 'http://rocktown.jp',
+        'area': 'osaka',
+    },
+    'knave': {
+        'name': 'knave',
+        'url': 'http://www.knave.co.jp',
+        'area': 'osaka',
+    },
+    'hatch': {
+        'name': 'なんばHatch',
+        'url': 'http://www.namba-hatch.com',
+        'area': 'osaka',
+    },
+    'muse': {
+        'name': '心斎橋MUSE',
+        'url': 'http://osaka.muse-live.com',
+        'area': 'osaka',
+    },
+    'pangea': {
+        'name': 'PANGEA',
+        'url': 'https://livepangea.com',
+        'area': 'osaka',
     }
-}
\ No newline at end of file
+}
@@ -0,0 +1,330 @@
+# work_queue.py
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(__file__))
+from crawl_tasks import Task, root_tasks, run_task
+from fetcher import Fetcher
+from http_policy import HostUnavailable, PermanentHTTPError, circuit_breaker, latency_tracker
+from discovery import feed_discovery
+from horizon import schedule_horizon
+from parse_cache import parse_cache
+from replay import refuse_recording
+from log_config import setup_logging
+from utils import event_to_dict
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'work_queue.db')
+LEASE_SECONDS = 300  # タスクの貸出期限（秒）。期限切れのタスクは他のワーカーが再実行する
+MAX_ATTEMPTS = 3
+IDLE_WAIT = 1.0  # 他のワーカーの処理待ちの間隔（秒）
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    venue TEXT NOT NULL,
+    month TEXT NOT NULL DEFAULT '',
+    detail_url TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    UNIQUE (venue, month, detail_url)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER PRIMARY KEY REFERENCES tasks (id),
+    events TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class WorkQueue:
+    """SQLiteに保存される永続的なタスクキュー
+
+    タスクは (会場, 月, 詳細ページURL) の組で、ワーカーは期限付きで借り受ける。
+    結果の保存・子タスクの追加・完了の記録は1トランザクションで行うため、
+    完了したタスクがプロセスの異常終了後に再実行されることはない。
+    結果を保存し終えたキューには保存済みの印を付け、印の無いキューは破棄しない。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def reset(self):
+        """全てのタスクと結果（と保存済みの印）を削除"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM results')
+            self.conn.execute('DELETE FROM tasks')
+            self.conn.execute("DELETE FROM meta WHERE key = 'saved'")
+
+    def mark_saved(self):
+        """全てのタスクの結果を保存し終えたことを記録する"""
+        with self._transaction():
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('saved', ?)",
+                              (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+
+    def is_saved(self):
+        """結果を保存し終えたキューか"""
+        return self.conn.execute("SELECT 1 FROM meta WHERE key = 'saved'").fetchone() is not None
+
+    def is_empty(self):
+        return self.conn.execute('SELECT 1 FROM tasks LIMIT 1').fetchone() is None
+
+    def enqueue(self, tasks):
+        """タスクを追加（登録済みのタスクは無視）し、追加した件数を返す"""
+        with self._transaction():
+            return self._insert_tasks(tasks)
+
+    def claim(self, owner):
+        """実行可能なタスクを1つ借り受ける。無ければNoneを返す"""
+        now = time.time()
+        with self._transaction():
+            # 再試行回数を使い切ったまま期限切れになったタスクは失敗扱いにする
+            self.conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired', lease_owner = NULL "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT id, venue, month, detail_url FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, row[0])
+            )
+        return row[0], Task(*row[1:])
+
+    def complete(self, task_id, owner, events, children=()):
+        """結果と子タスクを保存してタスクを完了にする
+
+        貸出期限が切れて他のワーカーに渡っていた場合は何もせずFalseを返す。
+        """
+        with self._transaction():
+            updated = self.conn.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, error = NULL "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (task_id, owner)
+            ).rowcount
+            if not updated:
+                return False
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (task_id, events) VALUES (?, ?)',
+                (task_id, json.dumps(events, ensure_ascii=False))
+            )
+            self._insert_tasks(children)
+        return True
+
+    def fail(self, task_id, owner, error, retry=True):
+        """タスクの失敗を記録（再試行回数が残っていれば再度実行待ちに戻す）"""
+        max_attempts = self.max_attempts if retry else 0
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, error = ? WHERE id = ? AND lease_owner = ?",
+                (max_attempts, str(error), task_id, owner)
+            )
+
+    def has_unfinished(self):
+        """実行待ちまたは実行中のタスクが残っているか"""
+        row = self.conn.execute(
+            "SELECT 1 FROM tasks WHERE status IN ('pending', 'leased') LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+    def status(self):
+        """状態ごとのタスク数"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+
+    def failed_tasks(self):
+        rows = self.conn.execute(
+            "SELECT venue, month, detail_url, error FROM tasks WHERE status = 'failed' ORDER BY id"
+        ).fetchall()
+        return [(Task(*row[:3]), row[3]) for row in rows]
+
+    def results(self):
+        """完了したタスクのイベントをタスクの登録順に返す"""
+        events = []
+        for (body,) in self.conn.execute('SELECT events FROM results ORDER BY task_id'):
+            events.extend(json.loads(body))
+        return events
+
+    def _insert_tasks(self, tasks):
+        before = self.conn.total_changes
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO tasks (venue, month, detail_url) VALUES (?, ?, ?)',
+            [tuple(task) for task in tasks]
+        )
+        return self.conn.total_changes - before
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATEで書き込みロックを取得するトランザクション"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+def run_worker(db_path, worker_name=None):
+    """キューが空になるまでタスクを実行するワーカー（記録はできない。再生はできる）"""
+    refuse_recording('queue workers')
+    setup_logging('scraper.log')
+    logger = logging.getLogger(__name__)
+    # フィードによる変更検出は使わない（詳細ページのタスクは別のワーカーで実行されることがあり、
+    # discover() が覚えた更新日時を record() で引き当てられないため、全ての詳細ページを取得する）
+    feed_discovery.enabled = False
+    owner = worker_name or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    queue = WorkQueue(db_path)
+    fetcher = Fetcher()
+    done = 0
+
+    try:
+        while True:
+            claimed = queue.claim(owner)
+            if claimed is None:
+                if not queue.has_unfinished():
+                    break
+                # 他のワーカーが実行中のタスクから子タスクが追加されるのを待つ
+                time.sleep(IDLE_WAIT)
+                continue
+
+            task_id, task = claimed
+            try:
+                events, children = run_task(task, fetcher)
+            except (PermanentHTTPError, HostUnavailable) as e:
+                # 再試行しても結果が変わらない失敗
+                logger.warning("Task %s %s failed permanently: %s", task_id, task, e)
+                queue.fail(task_id, owner, e, retry=False)
+                continue
+            except Exception as e:
+                logger.warning("Task %s %s failed: %s", task_id, task, e)
+                queue.fail(task_id, owner, e)
+                continue
+
+            records = [event_to_dict(event) for event in events]
+            if queue.complete(task_id, owner, records, children):
+                done += 1
+            else:
+                logger.warning("Lease on task %s was lost; result discarded", task_id)
+    finally:
+        queue.close()
+
+    circuit_breaker.report()
+    latency_tracker.report()
+    fetcher.metrics.report()
+    parse_cache.report()
+    schedule_horizon.save()
+    feed_discovery.save()
+    logger.info("Worker %s finished %s tasks", owner, done)
+    return done
+
+
+def run(db_path=DEFAULT_DB_PATH, workers=4, venue_keys=None, fresh=False):
+    """キューを準備し、複数のワーカープロセスで全タスクを実行して保存する
+
+    前回のキューの結果を保存し終えていない場合は続きから実行し（全てのタスクが完了
+    していれば保存だけを行う）、保存し終えている場合と fresh 指定時は最初から実行する。
+    """
+    from scraper import save_data
+    from venues import VENUE_CONFIGS
+
+    # ワーカーを起動する前に断る（各ワーカーが同じアーカイブを書き込むため）
+    refuse_recording('queue workers')
+    logger = logging.getLogger(__name__)
+    queue = WorkQueue(db_path)
+    try:
+        if fresh or queue.is_saved() or queue.is_empty():
+            queue.reset()
+            added = queue.enqueue(root_tasks(venue_keys or VENUE_CONFIGS))
+            logger.info("Enqueued %s venue tasks", added)
+        else:
+            # 保存に失敗した・保存の前に終了したキューは、取得し直さずに続きから実行する
+            logger.info("Resuming queue: %s", queue.status())
+
+        # ワーカーは独立したプロセスとして起動する（spawnでロギング等を初期化し直す）
+        ctx = multiprocessing.get_context('spawn')
+        processes = [ctx.Process(target=run_worker, args=(db_path,)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        if queue.has_unfinished():
+            logger.error("Queue still has unfinished tasks: %s", queue.status())
+            return
+        for task, error in queue.failed_tasks():
+            logger.error("Task failed permanently: %s (%s)", task, error)
+
+        if not save_data(queue.results()):
+            logger.error("Saving failed; the queue is kept and will be saved on the next run")
+            return
+        queue.mark_saved()
+        logger.info("Queue finished: %s", queue.status())
+    finally:
+        queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='永続タスクキューを使ってスケジュールを収集する')
+    parser.add_argument('command', choices=['run', 'work', 'status'],
+                        help='run: キューを準備して実行・保存 / work: ワーカーを1つ追加 / status: 状態表示')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='キューのSQLiteファイル')
+    parser.add_argument('--workers', type=int, default=4, help='ワーカープロセス数')
+    parser.add_argument('--fresh', action='store_true', help='未完了のキューを破棄して最初から実行')
+    args = parser.parse_args()
+
+    setup_logging('scraper.log')
+
+    if args.command == 'run':
+        run(args.db, args.workers, fresh=args.fresh)
+    elif args.command == 'work':
+        run_worker(args.db)
+    else:
+        queue = WorkQueue(args.db)
+        print(json.dumps(queue.status(), ensure_ascii=False))
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from discovery import feed_discovery
+from horizon import schedule_horizon
+from http_policy import circuit_breaker
+from mock_venues import MockVenueServer, SiteGenerator
+from parse_cache import parse_cache
+from venues import VENUE_CONFIGS
+
+
+@pytest.fixture
+def mock_venues(monkeypatch):
+    """モックサーバーを起動し、VENUE_CONFIGS をその会場（4種類のサイトを1つずつ）に置き換える
+
+    前回の実行の状態（キャッシュ・取得範囲の学習・フィード）の影響を受けず、何も保存しない。
+    """
+    monkeypatch.setattr(schedule_horizon, 'enabled', False)
+    monkeypatch.setattr(feed_discovery, 'enabled', False)
+    monkeypatch.setattr(parse_cache, 'enabled', False)
+    saved = dict(VENUE_CONFIGS)
+    generator = SiteGenerator(venues=4, shows_per_month=3, max_artists=2, seed=1)
+    with MockVenueServer(generator, latency=0.005, jitter=0.005) as server:
+        VENUE_CONFIGS.clear()
+        VENUE_CONFIGS.update(generator.venue_configs(server.base_url))
+        circuit_breaker.reset()
+        try:
+            yield server
+        finally:
+            VENUE_CONFIGS.clear()
+            VENUE_CONFIGS.update(saved)
+            circuit_breaker.reset()
@@ -0,0 +1,30 @@
+# test_crawl_tasks.py
+from crawl_tasks import WorkStealingScheduler, root_tasks, run_task_tree
+from fetcher import Fetcher
+from utils import event_to_dict
+from venues import VENUE_CONFIGS
+
+
+def _records(events):
+    return [event_to_dict(event) for event in events]
+
+
+def test_results_keep_sequential_order_under_stealing(mock_venues):
+    fetcher = Fetcher(pool_size=8)
+    expected = []
+    for root in root_tasks(VENUE_CONFIGS):
+        events, complete = run_task_tree(root, fetcher)
+        assert complete
+        expected.extend(_records(events))
+    assert expected
+
+    # 応答の遅延がばらつくため実行順は毎回変わるが、結果の順序は変わらない
+    for workers in (2, 8):
+        for _ in range(2):
+            scheduler = WorkStealingScheduler(fetcher, workers)
+            events, complete = scheduler.run(root_tasks(VENUE_CONFIGS))
+            assert complete
+            assert _records(events) == expected
+    # 会場数よりワーカーが多いため、8ワーカーでは必ずタスクが盗まれている
+    assert sum(scheduler._steals) > 0
+    fetcher.close()
@@ -0,0 +1,108 @@
+# test_work_queue.py
+import multiprocessing
+import os
+import sqlite3
+
+import scraper
+import work_queue
+from crawl_tasks import Task, root_tasks, run_task_tree
+from fetcher import Fetcher
+from utils import event_to_dict
+from venues import VENUE_CONFIGS
+from work_queue import WorkQueue
+
+LEASE_SECONDS = 0.5
+
+
+def _claim_and_die(db_path):
+    """タスクを借り受けたまま、完了も失敗も記録せずに異常終了するワーカー"""
+    queue = WorkQueue(db_path, lease_seconds=LEASE_SECONDS)
+    assert queue.claim('dead-worker') is not None
+    os._exit(1)
+
+
+def _attempts(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute('SELECT venue, attempts FROM tasks WHERE month = ""').fetchall())
+    finally:
+        conn.close()
+
+
+def test_expired_lease_is_reclaimed_and_late_completion_is_discarded(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=LEASE_SECONDS)
+    queue.enqueue([Task('a', '', '')])
+    task_id, task = queue.claim('slow')
+    assert queue.claim('other') is None
+
+    # 期限が切れると別のワーカーが同じタスクを借り受ける
+    queue.lease_seconds = 60
+    queue.conn.execute('UPDATE tasks SET lease_expires = 0 WHERE id = ?', (task_id,))
+    assert queue.claim('other') == (task_id, task)
+
+    # 遅れて終わった元のワーカーの結果は捨てられ、新しいワーカーの結果だけが残る
+    assert not queue.complete(task_id, 'slow', [{'title': 'stale'}])
+    assert queue.complete(task_id, 'other', [{'title': 'fresh'}])
+    assert queue.results() == [{'title': 'fresh'}]
+    assert queue.status() == {'done': 1}
+    queue.close()
+
+
+def test_worker_finishes_queue_after_another_worker_dies(tmp_path, mock_venues, monkeypatch):
+    monkeypatch.setattr(work_queue, 'setup_logging', lambda *args: None)
+    db_path = str(tmp_path / 'queue.db')
+    queue = WorkQueue(db_path)
+    queue.enqueue(root_tasks(VENUE_CONFIGS))
+
+    # 最初の会場のタスクを借り受けたワーカーが異常終了する
+    dead = multiprocessing.get_context('fork').Process(target=_claim_and_die, args=(db_path,))
+    dead.start()
+    dead.join()
+    assert dead.exitcode == 1
+    assert queue.status() == {'leased': 1, 'pending': len(VENUE_CONFIGS) - 1}
+
+    # 残ったワーカーが期限切れのタスクを引き継ぎ、全てのタスクを完了する
+    assert work_queue.run_worker(db_path, 'survivor') > len(VENUE_CONFIGS)
+    assert set(queue.status()) == {'done'}
+    attempts = _attempts(db_path)
+    assert attempts.pop(next(iter(VENUE_CONFIGS))) == 2
+    assert set(attempts.values()) == {1}
+
+    # 異常終了の影響を受けず、全てのタスクを順に実行した場合と同じ結果になる
+    fetcher = Fetcher()
+    expected = []
+    for root in root_tasks(VENUE_CONFIGS):
+        events, complete = run_task_tree(root, fetcher)
+        assert complete
+        expected.extend(event_to_dict(event) for event in events)
+    fetcher.close()
+    assert expected
+    assert sorted(queue.results(), key=repr) == sorted(expected, key=repr)
+    queue.close()
+
+
+def test_finished_queue_is_kept_until_its_results_are_saved(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'queue.db')
+    queue = WorkQueue(db_path)
+    queue.enqueue([Task('a', '', '')])
+    task_id, _ = queue.claim('worker')
+    assert queue.complete(task_id, 'worker', [{'title': 'show'}])
+
+    saved = []
+    results = [False, True]
+    monkeypatch.setattr(scraper, 'save_data', lambda events: saved.append(events) or results.pop(0))
+
+    # 保存に失敗したキューは破棄せず、次の実行で取得し直さずに保存する
+    work_queue.run(db_path, workers=0, venue_keys=['a'])
+    assert not queue.is_saved()
+    work_queue.run(db_path, workers=0, venue_keys=['a'])
+    assert saved == [[{'title': 'show'}], [{'title': 'show'}]]
+    assert queue.is_saved()
+    assert queue.status() == {'done': 1}
+
+    # 保存し終えたキューは次の実行で最初からやり直す
+    work_queue.run(db_path, workers=0, venue_keys=['a'])
+    assert len(saved) == 2
+    assert not queue.is_saved()
+    assert queue.status() == {'pending': 1}
+    queue.close()